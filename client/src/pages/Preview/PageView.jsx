@@ -2,6 +2,7 @@ import React, { useEffect, useState } from 'react';
 import { Container, Button } from 'react-bootstrap';
 import { useParams, useNavigate } from 'react-router-dom';
 import api from '../../services/api';
+import { getPageValues } from '../../services/pointService';
 import GraphicViewer from '../../components/GraphicViewer';
 
 const PageView = () => {
@@ -38,74 +39,98 @@ const PageView = () => {
 
     useEffect(() => {
         let interval;
-        const fetchPoints = async () => {
-            if (!page) return;
-            try {
-                console.log("Fetching points (single batch)...");
-                const res = await api.get('points/?page_size=1000');
-                const rawData = res.data;
-                const points = Array.isArray(rawData) ? rawData : (rawData?.results || []);
-
-                console.log(`Fetched ${points.length} points`);
-
-                const pointMap = {};
-                points.forEach(p => {
-                    if (p && p.id != null) {
-                        const val = p.live_value !== undefined ? p.live_value : p.current_value;
-                        pointMap[String(p.id)] = val;
-                        // Also store as number if possible
-                        if (!isNaN(p.id)) pointMap[Number(p.id)] = val;
-                    }
-                });
+        // Values are merged across polls; each poll only returns points changed since `version`
+        const pointMap = {};
+        let version = 0;
+
+        const mergeValues = (values) => {
+            Object.entries(values || {}).forEach(([id, entry]) => {
+                pointMap[String(id)] = entry.value;
+                pointMap[Number(id)] = entry.value;
+            });
+        };
 
-                setElements(prev => {
-                    if (!page.content || !page.content.elements) return prev;
-                    return page.content.elements.map(el => {
-                        const newEl = { ...el };
-
-                        // Helper to find value
-                        const getValue = (id) => {
-                            if (!id) return undefined;
-                            let rawId = id;
-                            if (typeof id === 'object') {
-                                rawId = id.id || id.value || JSON.stringify(id);
-                            }
-                            // Try multiple lookups
-                            let val = pointMap[rawId];
-                            if (val === undefined) val = pointMap[String(rawId).trim()];
-                            if (val === undefined && !isNaN(rawId)) val = pointMap[Number(rawId)];
-
-                            return val;
-                        };
-
-                        // 1. Data Binding Source (Dynamic Text, Images)
-                        if (newEl.data_binding_source) {
-                            let val = getValue(newEl.data_binding_source);
-                            // Fallback: If not found, try using current_value as ID (legacy/gauge style)
-                            if (val === undefined && newEl.current_value) {
-                                val = getValue(newEl.current_value);
-                            }
-
-                            if (val !== undefined) newEl.current_value = val;
+        const applyValues = () => {
+            setElements(prev => {
+                if (!page.content || !page.content.elements) return prev;
+                return page.content.elements.map(el => {
+                    const newEl = { ...el };
+
+                    // Helper to find value
+                    const getValue = (id) => {
+                        if (!id) return undefined;
+                        let rawId = id;
+                        if (typeof id === 'object') {
+                            rawId = id.id || id.value || JSON.stringify(id);
                         }
-                        // 2. Fallback for Gauge (current_value as ID)
-                        else if (newEl.type && newEl.type.includes('Gauge') && newEl.current_value) {
-                            const val = getValue(newEl.current_value);
-                            if (val !== undefined) newEl.current_value = val;
+                        // Try multiple lookups
+                        let val = pointMap[rawId];
+                        if (val === undefined) val = pointMap[String(rawId).trim()];
+                        if (val === undefined && !isNaN(rawId)) val = pointMap[Number(rawId)];
+
+                        return val;
+                    };
+
+                    // 1. Data Binding Source (Dynamic Text, Images)
+                    if (newEl.data_binding_source) {
+                        let val = getValue(newEl.data_binding_source);
+                        // Fallback: If not found, try using current_value as ID (legacy/gauge style)
+                        if (val === undefined && newEl.current_value) {
+                            val = getValue(newEl.current_value);
                         }
-                        return newEl;
-                    });
+
+                        if (val !== undefined) newEl.current_value = val;
+                    }
+                    // 2. Fallback for Gauge (current_value as ID)
+                    else if (newEl.type && newEl.type.includes('Gauge') && newEl.current_value) {
+                        const val = getValue(newEl.current_value);
+                        if (val !== undefined) newEl.current_value = val;
+                    }
+                    return newEl;
                 });
+            });
+        };
+
+        const fetchPoints = async () => {
+            if (!page) return;
+            try {
+                // Only the points bound on this page (indexed by the server when the page is saved)
+                const res = await getPageValues(page.id, version);
+                version = res.data.version;
+                mergeValues(res.data.values);
+                applyValues();
             } catch (err) {
                 console.error("Failed to fetch live data", err);
             }
         };
 
-        if (page) {
+        const startPolling = () => {
+            if (interval) return;
             fetchPoints();
             interval = setInterval(fetchPoints, 2000);
+        };
+
+        // Server push of the page's bound points; polling is the fallback
+        let source;
+        if (page && page.point_ids?.length > 0) {
+            if (window.EventSource) {
+                source = new EventSource(`${api.defaults.baseURL}points/stream/?page=${page.id}`);
+                source.addEventListener('values', (e) => {
+                    mergeValues(JSON.parse(e.data).values);
+                    applyValues();
+                });
+                source.onerror = () => {
+                    // The browser reconnects by itself unless the server refused the stream
+                    if (source.readyState === EventSource.CLOSED) startPolling();
+                };
+            } else {
+                startPolling();
+            }
         }
-        return () => clearInterval(interval);
+        return () => {
+            if (source) source.close();
+            clearInterval(interval);
+        };
     }, [page]);
 
     if (loading) return <div className="p-4">Loading preview...</div>;
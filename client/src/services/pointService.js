@@ -15,3 +15,7 @@ export const createPoint = (data) => api.post('points/', data);
 export const updatePoint = (id, data) => api.put(`points/${id}/`, data);
 export const deletePoint = (id) => api.delete(`points/${id}/`);
 export const duplicatePoint = (id, data) => api.post(`points/${id}/duplicate/`, data);
+
+// Live values: only ids/value/status/ts, and only points changed since `since` (a version from a previous call)
+export const getPointValues = (ids, since = 0) => api.get('points/values/', { params: { ids: ids.join(','), since } });
+export const getPageValues = (pageId, since = 0) => api.get(`pages/${pageId}/values/`, { params: { since } });
@@ -182,6 +182,21 @@ const EditorPage = () => {
         }
     };
 
+    // Blocks the engine skips: no path to an output/display, or constant inputs only
+    const planSummary = async (message) => {
+        try {
+            const res = await api.get(`fbd/programs/${programId}/plan/`);
+            const { pruned, folded } = res.data;
+            const foldedCount = Object.keys(folded).length;
+            if (pruned.length || foldedCount) {
+                return `${message} ${pruned.length} unused block(s) skipped, ${foldedCount} constant block(s) precomputed.`;
+            }
+        } catch (err) {
+            console.error("Failed to load execution plan", err);
+        }
+        return message;
+    };
+
     const saveProgram = async (silent = false) => {
         if (!programId) return;
         if (isSaving) return;
@@ -190,7 +205,7 @@ const EditorPage = () => {
         try {
             const diagram_json = { nodes, edges, layout: layoutSize };
             await api.patch(`fbd/programs/${programId}/`, { diagram_json });
-            if (!silent) showToast('Saved successfully!');
+            if (!silent) showToast(await planSummary('Saved successfully!'));
         } catch (err) {
             console.error("Failed to save", err);
             if (!silent) showToast('Failed to save', 'danger');
@@ -109,10 +109,16 @@ const Editor = () => {
     const handleSave = async () => {
         setSaving(true);
         try {
-            await updateScript(id, { code_text: code });
+            await updateScript(id, {
+                code_text: code,
+                trigger_type: script.trigger_type,
+                trigger_interval: script.trigger_interval,
+                trigger_cron: script.trigger_cron
+            });
             toast.success("Script saved");
         } catch (err) {
-            toast.error("Failed to save");
+            const cronError = err.response?.data?.trigger_cron;
+            toast.error(cronError ? `Invalid cron: ${cronError}` : "Failed to save");
         } finally {
             setSaving(false);
         }
@@ -232,6 +238,43 @@ const Editor = () => {
                             )}
                         </ListGroup>
                     </div>
+
+                    {/* Trigger: when the engine runs the script */}
+                    <div className="p-3">
+                        <h6>Trigger</h6>
+                        <Form.Select
+                            size="sm"
+                            className="mb-2"
+                            value={script.trigger_type || 'CYCLE'}
+                            onChange={(e) => setScript(prev => ({ ...prev, trigger_type: e.target.value }))}
+                        >
+                            <option value="CYCLE">Every cycle (100 ms)</option>
+                            <option value="PERIODIC">Periodic</option>
+                            <option value="ON_CHANGE">When an input changes</option>
+                            <option value="CRON">Cron schedule</option>
+                        </Form.Select>
+                        {script.trigger_type === 'PERIODIC' && (
+                            <Form.Select
+                                size="sm"
+                                value={script.trigger_interval}
+                                onChange={(e) => setScript(prev => ({ ...prev, trigger_interval: parseFloat(e.target.value) }))}
+                            >
+                                {[...new Set([0.1, 1, 10, 60, 300, 900, 3600, script.trigger_interval])].sort((a, b) => a - b).map(s => (
+                                    <option key={s} value={s}>{s < 1 ? `${s * 1000} ms` : s < 60 ? `${s} s` : `${s / 60} min`}</option>
+                                ))}
+                            </Form.Select>
+                        )}
+                        {script.trigger_type === 'CRON' && (
+                            <Form.Control
+                                size="sm"
+                                className="font-monospace"
+                                placeholder="*/15 * * * *"
+                                value={script.trigger_cron || ''}
+                                onChange={(e) => setScript(prev => ({ ...prev, trigger_cron: e.target.value }))}
+                            />
+                        )}
+                        <small className="text-muted d-block mt-1">Applied on Save</small>
+                    </div>
                 </Col>
 
                 {/* Main Workspace (Editor + Logs) */}
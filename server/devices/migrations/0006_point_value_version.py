@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0005_register_bacnet_instance_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='point',
+            name='value_version',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='point',
+            name='value_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,8 +1,22 @@
+import time
 from django.db import models
+from django.utils import timezone
 from helper.enums import *
 from django.utils.text import slugify
 from django.db.models import Max
 from helper.processors import PointProcessor
+from helper.live import notify_values_changed
+
+_last_value_version = 0
+
+def next_value_version():
+    """
+    Global, monotonic version stamped on a Point whenever its read_value is written.
+    Based on the clock (microseconds) so every process produces comparable values.
+    """
+    global _last_value_version
+    _last_value_version = max(_last_value_version + 1, time.time_ns() // 1000)
+    return _last_value_version
 # ================================================
 # Device Model
 # ================================================
@@ -157,6 +171,8 @@ class Point(models.Model):
     error_message = models.TextField(blank=True,null=True)
     last_updated = models.DateTimeField(auto_now=True)
     last_communication = models.DateTimeField(null=True, blank=True)
+    value_version = models.BigIntegerField(default=0, db_index=True)  # See next_value_version()
+    value_time = models.DateTimeField(null=True, blank=True)           # When the value/status last changed
 
     class Meta:
         verbose_name = "Point"
@@ -173,9 +189,37 @@ class Point(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        # Any write of read_value gets a new version so delta readers see it
+        update_fields = kwargs.get('update_fields')
+        stamped = update_fields is None or 'read_value' in update_fields
+        if stamped:
+            self.stamp_value()
+            if update_fields is not None:
+                kwargs['update_fields'] = list(update_fields) + ['value_version', 'value_time']
         super().save(*args, **kwargs)
+        if stamped:
+            notify_values_changed()
+
+    def stamp_value(self, version=None, when=None):
+        """Marks read_value as changed (used by save() and the engine's bulk updates)."""
+        self.value_version = version or next_value_version()
+        self.value_time = when or timezone.now()
+
+    @property
+    def live_status(self):
+        """'FORCED', the fault of the underlying register, or the point's own error_status."""
+        if self.is_forced:
+            return 'FORCED'
+        if self.point_type == 'REGISTER' and self.register and self.register.error_status != 'OK':
+            return self.register.error_status or 'ERROR'
+        return self.error_status or 'OK'
 
     @property
     def current_value(self):
         val = PointProcessor(self).process()
-        return val
\ No newline at end of file
+        return val
+
+    @property
+    def live_value(self):
+        """Read-only value for the API: never writes to the DB or raises alarms."""
+        return PointProcessor(self).peek()
\ No newline at end of file
@@ -20,7 +20,8 @@ class PointSerializer(serializers.ModelSerializer):
     live_value = serializers.SerializerMethodField()
     
     def get_live_value(self, obj):
-        return obj.current_value
+        # Served from the engine's last computed value; reads must not write
+        return obj.live_value
 
     def to_internal_value(self, data):
         # Convert empty strings to None for nullable float fields
@@ -40,6 +41,7 @@ class PointSerializer(serializers.ModelSerializer):
     class Meta:
         model = Point
         fields = '__all__'
+        read_only_fields = ['value_version', 'value_time']
         ref_name = 'IOPoint'
 
 class PointGroupSerializer(serializers.ModelSerializer):
@@ -0,0 +1,194 @@
+import json
+import queue
+import logging
+import threading
+import time
+import zlib
+from django.db import close_old_connections, connection
+from django.db.models import Max
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from helper.live import values_notice
+from .models import Point, next_value_version
+
+logger = logging.getLogger(__name__)
+
+# Value versions are clock based (microseconds). A write stamped just before a reader
+# looked can commit just after, so anything younger than this is checked again.
+VALUE_VERSION_SETTLE = 2_000_000
+
+
+def point_value_entry(point):
+    """The compact value record served to the HMIs."""
+    return {'value': point.live_value, 'status': point.live_status, 'ts': point.value_time}
+
+
+def point_values(ids=None, since=0):
+    """{point_id: entry} for `ids` (all points if None) changed after version `since`."""
+    queryset = Point.objects.select_related('register')
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    if since > 0:
+        queryset = queryset.filter(value_version__gt=since)
+    return {point.id: point_value_entry(point) for point in queryset}
+
+
+def point_values_response(request, ids, since):
+    """
+    {"version": V, "values": {id: entry}} for `ids` (all points if None) changed after
+    `since`, with an ETag so an unchanged poll costs one aggregate query and a 304.
+    """
+    ids = sorted(ids) if ids is not None else None
+    queryset = Point.objects.filter(id__in=ids) if ids is not None else Point.objects.all()
+
+    # 1. Cheap check first: nothing newer than the client's copy means 304
+    latest = queryset.aggregate(v=Max('value_version'))['v'] or 0
+    version = min(latest, next_value_version() - VALUE_VERSION_SETTLE)
+    key = ",".join(map(str, ids)) if ids is not None else "*"
+    etag = f'"{latest}-{version}-{since}-{zlib.crc32(key.encode()):x}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        # 2. Only rows changed since the client's version (everything on the first call)
+        response = Response({'version': version, 'values': point_values(ids, since)})
+
+    response['ETag'] = etag
+    # Browsers revalidate on every poll instead of serving a stale copy
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+class Subscription:
+    def __init__(self, ids):
+        self.ids = set(ids) if ids else None   # None: every point
+        self.queue = queue.Queue(maxsize=100)
+        self.overflowed = False
+
+
+class PointValueHub:
+    """
+    Fans point value changes out to the open push streams of this process.
+
+    A single background thread does the database work for all subscribers: it wakes
+    every `interval` seconds, checks the live-cache notice counter, and only when it
+    moved (or recent rows may still be committing) fetches the rows whose
+    value_version passed its cursor. Each subscriber receives the subset it asked for.
+    """
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self._cursor = 0
+        self._recent = {}     # point_id: value_version already sent, for rows above the cursor
+        self._notice = None
+
+    def subscribe(self, ids):
+        subscription = Subscription(ids)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._cursor = next_value_version() - VALUE_VERSION_SETTLE
+                self._recent = {}
+                self._notice = None
+                self._thread = threading.Thread(target=self._run, name='PointValueHub', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        return
+                try:
+                    close_old_connections()
+                    self._tick()
+                except Exception as e:
+                    logger.error(f"PointValueHub error: {e}")
+                time.sleep(self.interval)
+        finally:
+            connection.close()
+
+    def _tick(self):
+        notice = values_notice()
+        if notice is not None and notice == self._notice and not self._recent:
+            return
+        self._notice = notice
+
+        now_version = next_value_version()
+        changed = {}
+        for point in Point.objects.filter(value_version__gt=self._cursor).select_related('register'):
+            if self._recent.get(point.id) == point.value_version:
+                continue
+            self._recent[point.id] = point.value_version
+            changed[point.id] = point_value_entry(point)
+
+        # Rows older than the settle window are final; forget them
+        self._cursor = max(self._cursor, now_version - VALUE_VERSION_SETTLE)
+        self._recent = {pid: v for pid, v in self._recent.items() if v > self._cursor}
+
+        if changed:
+            self._publish(changed)
+
+    def _publish(self, changed):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.ids is None:
+                values = changed
+            else:
+                values = {pid: entry for pid, entry in changed.items() if pid in subscription.ids}
+            if not values:
+                continue
+            try:
+                subscription.queue.put_nowait(values)
+            except queue.Full:
+                # A stalled client only delays itself; it is sent a fresh snapshot instead
+                subscription.overflowed = True
+
+
+hub = PointValueHub()
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=JSONEncoder)}\n\n"
+
+
+def _snapshot(ids):
+    event = format_event('values', {'values': point_values(ids)})
+    # Streams stay open for hours; do not hold a database connection meanwhile
+    connection.close()
+    return event
+
+
+def value_event_stream(ids, heartbeat=15.0):
+    """
+    Server-sent events for the given point ids: one `values` snapshot, then a `values`
+    event per change batch, and a comment line as keep-alive.
+    """
+    subscription = hub.subscribe(ids)
+    try:
+        # Subscribed before the snapshot, so nothing written in between is missed
+        yield "retry: 2000\n\n"
+        yield _snapshot(ids)
+        while True:
+            if subscription.overflowed:
+                subscription.overflowed = False
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                yield _snapshot(ids)
+            try:
+                values = subscription.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event('values', {'values': values})
+    finally:
+        hub.unsubscribe(subscription)
@@ -1,3 +1,89 @@
+from unittest import mock
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+from .models import Point, PointGroup
+from .streams import PointValueHub, Subscription
+from .views import PointViewSet
 
-# Create your tests here.
+
+class PointValuesEndpointTests(TestCase):
+    def setUp(self):
+        group = PointGroup.objects.create(name='Plant')
+        self.pump = Point.objects.create(name='Pump', point_group=group, read_value='1')
+        self.valve = Point.objects.create(name='Valve', point_group=group, read_value='0')
+        # Versions well past the settle window, as written by the engine long ago
+        Point.objects.filter(pk=self.pump.pk).update(value_version=1000)
+        Point.objects.filter(pk=self.valve.pk).update(value_version=2000)
+        self.view = PointViewSet.as_view({'get': 'values'})
+
+    def _get(self, since=0, **headers):
+        ids = f'{self.pump.id},{self.valve.id}'
+        request = APIRequestFactory().get('/api/points/values/', {'ids': ids, 'since': since}, **headers)
+        return self.view(request)
+
+    def test_since_returns_only_points_changed_after_the_version(self):
+        response = self._get()
+        self.assertEqual(response.data['version'], 2000)
+        self.assertEqual(set(response.data['values']), {self.pump.id, self.valve.id})
+
+        Point.objects.filter(pk=self.pump.pk).update(read_value='0', value_version=3000)
+        response = self._get(since=2000)
+        self.assertEqual(response.data['version'], 3000)
+        self.assertEqual(list(response.data['values']), [self.pump.id])
+        self.assertEqual(response.data['values'][self.pump.id]['value'], 0.0)
+
+    def test_fresh_writes_are_served_again_until_they_settle(self):
+        self.pump.read_value = '5'
+        self.pump.save()
+        version = self._get(since=2000).data['version']
+        # A write committing late would have a version like this one, so it is not skipped
+        self.assertLess(version, self.pump.value_version)
+        self.assertIn(self.pump.id, self._get(since=version).data['values'])
+
+    def test_unchanged_values_answer_304(self):
+        etag = self._get(since=2000)['ETag']
+        with self.assertNumQueries(1):
+            response = self._get(since=2000, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Point.objects.filter(pk=self.valve.pk).update(value_version=3000)
+        self.assertEqual(self._get(since=2000, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_invalid_ids_are_rejected(self):
+        request = APIRequestFactory().get('/api/points/values/', {'ids': 'a,b'})
+        self.assertEqual(self.view(request).status_code, 400)
+
+
+class PointValueHubTests(TestCase):
+    def setUp(self):
+        group = PointGroup.objects.create(name='Plant')
+        self.pump = Point.objects.create(name='Pump', point_group=group, read_value='1')
+        self.valve = Point.objects.create(name='Valve', point_group=group, read_value='0')
+        # Driven tick by tick here instead of from its thread
+        self.hub = PointValueHub()
+        self.hub._cursor = self.valve.value_version
+        self.subscription = Subscription({self.pump.id})
+        self.hub._subscribers.add(self.subscription)
+        patcher = mock.patch('devices.streams.values_notice', return_value=1)
+        self.notice = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unchanged_notice_costs_no_query(self):
+        self.hub._tick()
+        with self.assertNumQueries(0):
+            self.hub._tick()
+
+    def test_changes_reach_the_subscribers_of_the_point_once(self):
+        self.hub._tick()
+        for point, value in ((self.pump, '7'), (self.valve, '3')):
+            point.read_value = value
+            point.save()
+        self.notice.return_value = 2
+        self.hub._tick()
+        values = self.subscription.queue.get_nowait()
+        self.assertEqual(list(values), [self.pump.id])
+        self.assertEqual(values[self.pump.id]['value'], 7.0)
+
+        # Rows still in the settle window are read again but not sent twice
+        self.hub._tick()
+        self.assertTrue(self.subscription.queue.empty())
@@ -7,8 +7,23 @@ from .serializers import (
     PointGroupSerializer, PointSerializer
 )
 from helper.viewsets import BaseDuplicateViewSet
+from .streams import point_values_response, value_event_stream
 from django.db import transaction
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from modules.models import Page
 import copy
+import json
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets EventSource clients (Accept: text/event-stream) through content negotiation."""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only error responses are rendered here; the stream itself is a StreamingHttpResponse
+        return f"event: error\ndata: {json.dumps(data)}\n\n".encode()
 
 class DeviceViewSet(BaseDuplicateViewSet):
     queryset = Device.objects.all()
@@ -48,7 +63,7 @@ class RegisterViewSet(BaseDuplicateViewSet):
         )
 
 class PointGroupViewSet(BaseDuplicateViewSet):
-    queryset = PointGroup.objects.all()
+    queryset = PointGroup.objects.prefetch_related('points__register')
     serializer_class = PointGroupSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name']
@@ -71,12 +86,54 @@ class PointViewSet(BaseDuplicateViewSet):
     search_fields = ['name']
 
     def get_queryset(self):
-        queryset = Point.objects.all()
+        queryset = Point.objects.select_related('register')
         group_id = self.request.query_params.get('point_group', None)
         if group_id is not None:
             queryset = queryset.filter(point_group_id=group_id)
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def values(self, request):
+        """
+        Compact live values: GET points/values/?ids=1,2,3&since=<version>
+        Returns {"version": V, "values": {id: {"value", "status", "ts"}}}. Pass V back as
+        `since` to only receive the points that changed. Honours If-None-Match.
+        """
+        try:
+            ids = {int(i) for i in request.query_params.get('ids', '').split(',') if i.strip()}
+            since = int(request.query_params.get('since') or 0)
+        except ValueError:
+            return Response({'error': 'ids must be a comma separated list of integers, since an integer'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return point_values_response(request, ids or None, since)
+
+    @action(detail=False, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def stream(self, request):
+        """
+        Server-sent events with live values: GET points/stream/?ids=1,2,3 or ?page=<page id>.
+        Sends a `values` snapshot, then a `values` event whenever subscribed points change.
+        """
+        try:
+            ids = {int(i) for i in request.query_params.get('ids', '').split(',') if i.strip()}
+            page_id = request.query_params.get('page')
+            if page_id:
+                page = Page.objects.filter(pk=int(page_id)).only('point_ids').first()
+                if page is None:
+                    return Response({'error': 'Page not found'}, status=status.HTTP_404_NOT_FOUND)
+                ids.update(page.point_ids)
+        except ValueError:
+            return Response({'error': 'ids must be a comma separated list of integers, page an integer'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({'error': 'Subscribe to at least one point (ids) or a page with bindings'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(value_event_stream(sorted(ids)), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
     def execute_duplication(self, instance, count, include_children, names):
         # Points don't have children to duplicate in this context
         return self.perform_duplication(
@@ -0,0 +1,329 @@
+import math
+
+# Block registry: type -> (evaluator, input kinds). An evaluator is called as
+# fn(executor, node, args) and returns the block's output list. The input kinds tell
+# the plan which casts to apply before the call:
+#   'bool' / 'float' - every input cast with cast_b / cast_f
+#   'raw'            - inputs passed as wired
+#   tuple            - one kind per port (ports beyond the tuple are passed raw)
+BLOCKS = {}
+
+
+def register(*types, inputs='raw'):
+    def decorator(fn):
+        for type_ in types:
+            BLOCKS[type_] = (fn, inputs)
+        return fn
+    return decorator
+
+
+# Safe casting helpers for the engine core
+def cast_f(v):
+    if v is None: return 0.0
+    try: return float(v)
+    except: return 0.0
+
+
+def cast_b(v):
+    if v is None: return False
+    if isinstance(v, bool): return v
+    if isinstance(v, (int, float)): return v > 0.5
+    if isinstance(v, str): return v.lower() in ['1', 'true', 'on', 'yes']
+    return False
+
+
+CASTS = {'bool': cast_b, 'float': cast_f}
+
+
+def _unknown(executor, node, args):
+    return []
+
+
+def make_caster(kinds, input_count):
+    """Returns a function args = caster(inputs), or None when inputs are used as wired."""
+    if kinds == 'raw' or input_count == 0:
+        return None
+    if isinstance(kinds, str):
+        cast = CASTS[kinds]
+        return lambda inputs: [cast(x) for x in inputs]
+    per_port = [CASTS.get(kinds[i]) if i < len(kinds) else None for i in range(input_count)]
+    if not any(per_port):
+        return None
+    per_port = [cast or (lambda x: x) for cast in per_port]
+    return lambda inputs: [cast(x) for cast, x in zip(per_port, inputs)]
+
+
+def resolve(type_, input_count):
+    """(evaluator, caster) for a block type; unknown types evaluate to no outputs."""
+    fn, kinds = BLOCKS.get(type_, (_unknown, 'raw'))
+    return fn, make_caster(kinds, input_count)
+
+
+def shape_outputs(type_, expected_outputs, res):
+    """Force result to list of expected length"""
+    if expected_outputs > 0:
+        if len(res) < expected_outputs:
+            res.extend([None] * (expected_outputs - len(res)))
+        else:
+            res = res[:expected_outputs]
+    elif not res and (type_.endswith('_IN') or type_.endswith('_OUT') or type_.endswith('_DISP') or type_.startswith('CONST_')):
+        # Fallback for IO/Display with 0 declared outputs but used in viewer
+        res = [0.0]
+    return res
+
+
+# Logic Gates
+@register('AND', inputs='bool')
+def _and(executor, node, b_vals): return [all(b_vals) if b_vals else False]
+
+@register('OR', inputs='bool')
+def _or(executor, node, b_vals): return [any(b_vals)]
+
+@register('XOR', inputs='bool')
+def _xor(executor, node, b_vals): return [sum(b_vals) % 2 == 1]
+
+@register('NOT', inputs='bool')
+def _not(executor, node, b_vals): return [not b_vals[0] if b_vals else True]
+
+@register('NAND', inputs='bool')
+def _nand(executor, node, b_vals): return [not all(b_vals) if b_vals else True]
+
+@register('NOR', inputs='bool')
+def _nor(executor, node, b_vals): return [not any(b_vals)]
+
+@register('XNOR', inputs='bool')
+def _xnor(executor, node, b_vals): return [sum(b_vals) % 2 == 0]
+
+
+# Arithmetic
+@register('ADD', inputs='float')
+def _add(executor, node, f_vals): return [sum(f_vals)]
+
+@register('SUB', inputs='float')
+def _sub(executor, node, f_vals): return [f_vals[0] - sum(f_vals[1:])] if f_vals else [0.0]
+
+@register('MUL', inputs='float')
+def _mul(executor, node, f_vals):
+    m = 1.0
+    for v in f_vals: m *= v
+    return [m]
+
+@register('DIV', inputs='float')
+def _div(executor, node, f_vals):
+    d = f_vals[0] if f_vals else 0.0
+    for v in f_vals[1:]:
+        if v != 0: d /= v
+        else: d = 0.0; break
+    return [d]
+
+@register('MOD', inputs='float')
+def _mod(executor, node, f_vals): return [f_vals[0] % f_vals[1] if len(f_vals) > 1 and f_vals[1] != 0 else 0.0]
+
+@register('ABS', inputs='float')
+def _abs(executor, node, f_vals): return [abs(f_vals[0]) if f_vals else 0.0]
+
+@register('NEG', inputs='float')
+def _neg(executor, node, f_vals): return [-f_vals[0] if f_vals else 0.0]
+
+@register('SQRT', inputs='float')
+def _sqrt(executor, node, f_vals): return [math.sqrt(f_vals[0]) if f_vals and f_vals[0] >= 0 else 0.0]
+
+@register('POW', inputs='float')
+def _pow(executor, node, f_vals): return [math.pow(f_vals[0], f_vals[1]) if len(f_vals) > 1 else 0.0]
+
+
+# Comparison
+@register('EQ', inputs='float')
+def _eq(executor, node, f_vals): return [f_vals[0] == f_vals[1] if len(f_vals) > 1 else False]
+
+@register('NE', inputs='float')
+def _ne(executor, node, f_vals): return [f_vals[0] != f_vals[1] if len(f_vals) > 1 else True]
+
+@register('GT', inputs='float')
+def _gt(executor, node, f_vals): return [f_vals[0] > f_vals[1] if len(f_vals) > 1 else False]
+
+@register('GE', inputs='float')
+def _ge(executor, node, f_vals): return [f_vals[0] >= f_vals[1] if len(f_vals) > 1 else False]
+
+@register('LT', inputs='float')
+def _lt(executor, node, f_vals): return [f_vals[0] < f_vals[1] if len(f_vals) > 1 else False]
+
+@register('LE', inputs='float')
+def _le(executor, node, f_vals): return [f_vals[0] <= f_vals[1] if len(f_vals) > 1 else False]
+
+
+# Selection
+@register('SEL', inputs=('bool', 'float', 'float'))
+def _sel(executor, node, args): return [args[2] if args[0] else args[1]] if len(args) >= 3 else [0.0]
+
+@register('MAX', inputs='float')
+def _max(executor, node, f_vals): return [max(f_vals) if f_vals else 0.0]
+
+@register('MIN', inputs='float')
+def _min(executor, node, f_vals): return [min(f_vals) if f_vals else 0.0]
+
+@register('LIMIT', inputs='float')
+def _limit(executor, node, f_vals):
+    if len(f_vals) >= 3:
+        mn, val, mx = f_vals[0], f_vals[1], f_vals[2]
+        return [max(mn, min(val, mx))]
+    return [0.0]
+
+
+# IO
+@register('DIGITAL_IN')
+def _digital_in(executor, node, inputs):
+    return [cast_b(executor._get_binding_value(node.get('params', {}).get('pointId')))]
+
+@register('ANALOG_IN')
+def _analog_in(executor, node, inputs):
+    return [cast_f(executor._get_binding_value(node.get('params', {}).get('pointId')))]
+
+@register('DIGITAL_OUT', inputs='bool')
+@register('ANALOG_OUT', inputs='float')
+def _output(executor, node, args):
+    v = args[0]
+    executor._set_binding_value(node.get('params', {}).get('pointId'), v)
+    return [v]
+
+
+# Constants
+@register('CONST_DIG')
+def _const_dig(executor, node, inputs): return [cast_b(node.get('params', {}).get('value', False))]
+
+@register('CONST_ANA')
+def _const_ana(executor, node, inputs): return [cast_f(node.get('params', {}).get('value', 0.0))]
+
+
+# Timers
+@register('TON', 'TOF', 'TP', inputs=('bool', 'float'))
+def _timer(executor, node, args):
+    # Inputs: IN, PT (Preset Time in ms) | Outputs: Q, ET (Elapsed Time)
+    type_ = node.get('type')
+    in_val = args[0]
+    pt = args[1] if len(args) > 1 else cast_f(node.get('params', {}).get('pt', 1000))
+
+    # Node-specific state
+    state = executor.runtime_state.setdefault(node.get('id'), {'accum': 0, 'last_in': False, 'active': False})
+    delta = executor.runtime_state.get('_delta_ms', 0)
+
+    q = False
+    et = state['accum']
+
+    if type_ == 'TON':
+        if in_val:
+            state['accum'] = min(pt, state['accum'] + delta)
+            if state['accum'] >= pt: q = True
+        else:
+            state['accum'] = 0
+        et = state['accum']
+
+    elif type_ == 'TOF':
+        if in_val:
+            state['accum'] = 0
+            q = True
+        else:
+            state['accum'] = min(pt, state['accum'] + delta)
+            if state['accum'] < pt: q = True
+            else: q = False
+        et = state['accum']
+
+    elif type_ == 'TP':
+        # Rising edge detection for TP
+        if in_val and not state['last_in'] and not state['active']:
+            state['active'] = True
+            state['accum'] = 0
+
+        if state['active']:
+            state['accum'] += delta
+            if state['accum'] >= pt:
+                state['active'] = False
+                state['accum'] = pt
+                q = False
+            else:
+                q = True
+        et = state['accum']
+
+    state['last_in'] = in_val
+    return [q, et]
+
+
+# Multiplexing
+@register('MUX')
+def _mux(executor, node, inputs):
+    # Inputs: IN0, IN1, ..., SEL (last input is selector)
+    if len(inputs) >= 2:
+        sel = int(cast_f(inputs[-1]))
+        data_inputs = inputs[:-1]
+        if 0 <= sel < len(data_inputs):
+            return [data_inputs[sel]]
+        return [data_inputs[0]] if data_inputs else [0.0]
+    return [0.0]
+
+@register('DEMUX')
+def _demux(executor, node, inputs):
+    # Inputs: IN, SEL
+    expected_outputs = node.get('outputs', 0)
+    res = [0.0] * expected_outputs
+    if len(inputs) >= 2:
+        val = inputs[0]
+        sel = int(cast_f(inputs[1]))
+        if 0 <= sel < expected_outputs:
+            res[sel] = val
+    return res
+
+
+# Encoders/Decoders
+@register('ENCODER', inputs='bool')
+def _encoder(executor, node, b_vals):
+    # Inputs: D0, D1, ... -> Output: Index of first active input
+    idx = 0
+    for i, v in enumerate(b_vals):
+        if v:
+            idx = i
+            break
+    return [float(idx)]
+
+@register('DECODER')
+def _decoder(executor, node, inputs):
+    # Input: Binary Index -> Outputs: One-hot (selected pin is 1, others 0)
+    expected_outputs = node.get('outputs', 0)
+    idx = int(cast_f(inputs[0])) if inputs else 0
+    res = [False] * expected_outputs
+    if 0 <= idx < expected_outputs:
+        res[idx] = True
+    return res
+
+@register('BIN_TO_DIG')
+def _bin_to_dig(executor, node, inputs):
+    # Input: Integer -> Outputs: Individual bits
+    val = int(cast_f(inputs[0])) if inputs else 0
+    return [(val >> i) & 1 == 1 for i in range(node.get('outputs', 0))]
+
+@register('DIG_TO_BIN', inputs='bool')
+def _dig_to_bin(executor, node, b_vals):
+    # Inputs: Individual bits -> Output: Integer
+    val = 0
+    for i, v in enumerate(b_vals):
+        if v:
+            val |= (1 << i)
+    return [float(val)]
+
+
+# Utils
+@register('SPLITTER')
+def _splitter(executor, node, inputs):
+    # Input: 1 -> Outputs: Many (all same as input)
+    val = inputs[0] if inputs else 0.0
+    return [val] * node.get('outputs', 0)
+
+@register('TERMINAL')
+def _terminal(executor, node, inputs): return [inputs[0] if inputs else 0.0]
+
+
+# Displays
+@register('ANA_DISP', inputs='float')
+def _ana_disp(executor, node, f_vals): return [f_vals[0] if f_vals else 0.0]
+
+@register('DIG_DISP', inputs='bool')
+def _dig_disp(executor, node, b_vals): return [b_vals[0] if b_vals else False]
@@ -0,0 +1,174 @@
+import logging
+from . import blocks
+
+logger = logging.getLogger(__name__)
+
+# Blocks emitted as inline expressions: pure, cannot raise once their inputs are cast.
+# Each entry: (input kind, output type, builder(args) -> expression). `args` are the
+# expressions of the cast inputs; builders mirror the evaluators in fbd/blocks.py.
+INLINE = {
+    'AND': ('bool', 'bool', lambda a: f"({' and '.join(a)})" if a else "False"),
+    'OR': ('bool', 'bool', lambda a: f"({' or '.join(a)})" if a else "False"),
+    'NOT': ('bool', 'bool', lambda a: f"(not {a[0]})" if a else "True"),
+    'NAND': ('bool', 'bool', lambda a: f"(not ({' and '.join(a)}))" if a else "True"),
+    'NOR': ('bool', 'bool', lambda a: f"(not ({' or '.join(a)}))" if a else "True"),
+    'XOR': ('bool', 'bool', lambda a: f"(({' + '.join(a)}) % 2 == 1)" if a else "False"),
+    'XNOR': ('bool', 'bool', lambda a: f"(({' + '.join(a)}) % 2 == 0)" if a else "True"),
+    'ADD': ('float', 'float', lambda a: f"sum(({', '.join(a)},))" if a else None),
+    'SUB': ('float', 'float', lambda a: f"({a[0]} - sum(({''.join(x + ', ' for x in a[1:])})))" if a else "0.0"),
+    'MUL': ('float', 'float', lambda a: "(1.0" + "".join(f" * {x}" for x in a) + ")"),
+    'ABS': ('float', 'float', lambda a: f"abs({a[0]})" if a else "0.0"),
+    'NEG': ('float', 'float', lambda a: f"(-{a[0]})" if a else "0.0"),
+    'EQ': ('float', 'bool', lambda a: f"({a[0]} == {a[1]})" if len(a) > 1 else "False"),
+    'NE': ('float', 'bool', lambda a: f"({a[0]} != {a[1]})" if len(a) > 1 else "True"),
+    'GT': ('float', 'bool', lambda a: f"({a[0]} > {a[1]})" if len(a) > 1 else "False"),
+    'GE': ('float', 'bool', lambda a: f"({a[0]} >= {a[1]})" if len(a) > 1 else "False"),
+    'LT': ('float', 'bool', lambda a: f"({a[0]} < {a[1]})" if len(a) > 1 else "False"),
+    'LE': ('float', 'bool', lambda a: f"({a[0]} <= {a[1]})" if len(a) > 1 else "False"),
+    'MAX': ('float', 'float', lambda a: f"max(({', '.join(a)},))" if a else "0.0"),
+    'MIN': ('float', 'float', lambda a: f"min(({', '.join(a)},))" if a else "0.0"),
+    'LIMIT': ('float', 'float', lambda a: f"max({a[0]}, min({a[1]}, {a[2]}))" if len(a) >= 3 else "0.0"),
+    'SEL': (('bool', 'float', 'float'), 'float', lambda a: f"({a[2]} if {a[0]} else {a[1]})" if len(a) >= 3 else "0.0"),
+}
+
+
+def _cast(expr, value_type, kind):
+    """Expression casting `expr` (statically of `value_type`, None if unknown) to `kind`."""
+    if kind == 'raw':
+        return expr
+    if expr == 'None':
+        return '0.0' if kind == 'float' else 'False'
+    if kind == value_type:
+        # cast_f(float) / cast_b(bool) return the value unchanged
+        return expr
+    if kind == 'float' and value_type == 'bool':
+        return f"float({expr})"
+    if kind == 'bool' and value_type == 'float':
+        return f"({expr} > 0.5)"
+    return f"{'cast_f' if kind == 'float' else 'cast_b'}({expr})"
+
+
+class CompiledPlan:
+    """
+    An ExecutionPlan turned into one generated, straight-line Python function.
+
+    Every block becomes a few statements with a local variable per output, wires become
+    plain variable references (port bounds are checked at compile time), simple pure
+    blocks are inlined as expressions and only the casts a value actually needs are
+    emitted. Other blocks (timers, IO, MUX, ...) call their registry evaluator, wrapped in
+    the same error handling as FBDExecutor. The result is identical to the interpreter.
+    """
+    def __init__(self, plan):
+        self.source = self._generate(plan)
+        self._namespace = {
+            'cast_f': blocks.cast_f,
+            'cast_b': blocks.cast_b,
+            'shape_outputs': blocks.shape_outputs,
+            'logger': logger,
+        }
+        self._namespace.update(self._constants)
+        code = compile(self.source, f"<fbd plan {plan.name}>", 'exec')
+        exec(code, self._namespace)
+        self.run = self._namespace['run']
+
+    def _generate(self, plan):
+        self._constants = {}
+        lines = ["def run(executor):"]
+        position = {node_id: i for i, (node_id, *_rest) in enumerate(plan.steps)}
+        ports = {}   # node index: (expression per output port, static type per port) or None if dynamic
+
+        for index, (node_id, node, input_count, wires, evaluate, caster, type_, expected) in enumerate(plan.steps):
+            self._constants[f"N{index}"] = node
+            # Wired value expressions per input port. Like the interpreter, a wire only
+            # overrides earlier wires to the same port if its source value exists
+            raw = ['None'] * input_count
+            raw_types = [None] * input_count
+            for u, f_port, t_port in wires:
+                u_index = position[u]
+                if u_index >= index:
+                    # Not evaluated yet this cycle (only possible for cycles)
+                    continue
+                out = ports[u_index]
+                if out is None:
+                    # Output count only known at run time
+                    raw[t_port] = f"(v{u_index}[{f_port}] if {f_port} < len(v{u_index}) else {raw[t_port]})"
+                    raw_types[t_port] = None
+                elif f_port < len(out[0]):
+                    raw[t_port], raw_types[t_port] = out[0][f_port], out[1][f_port]
+
+            lines.append(f"    # {node_id!r} {type_}")
+            declared = 'outputs' in node
+            if node_id in plan.folded:
+                # Value computed when the plan was built (ExecutionPlan._fold)
+                exprs, types = [], []
+                for i, value in enumerate(plan.folded[node_id]):
+                    if value is None:
+                        exprs.append('None')
+                    else:
+                        self._constants[f"C{index}_{i}"] = value
+                        exprs.append(f"C{index}_{i}")
+                    types.append({bool: 'bool', float: 'float'}.get(type(value)))
+                lines.append(f"    v{index} = [{', '.join(exprs)}]")
+                ports[index] = (exprs, types)
+                continue
+
+            inline = INLINE.get(type_)
+            if inline is not None and (inline[2]([]) is not None or input_count > 0):
+                kinds, out_type, build = inline
+                args = []
+                for i in range(input_count):
+                    kind = kinds[i] if isinstance(kinds, tuple) and i < len(kinds) else (
+                        'raw' if isinstance(kinds, tuple) else kinds)
+                    args.append(_cast(raw[i], raw_types[i], kind))
+                lines.append(f"    x{index} = {build(args)}")
+                width = max(expected, 1)
+                lines.append(f"    v{index} = [x{index}{', None' * (width - 1)}]")
+                ports[index] = ([f"x{index}"] + ['None'] * (width - 1), [out_type] + [None] * (width - 1))
+                continue
+
+            if type_ in ('CONST_ANA', 'CONST_DIG'):
+                outputs = blocks.shape_outputs(type_, expected, evaluate(None, node, []))
+                value_type = 'float' if type_ == 'CONST_ANA' else 'bool'
+                self._constants[f"C{index}"] = outputs[0] if outputs else None
+                lines.append(f"    v{index} = [{', '.join([f'C{index}'] + ['None'] * (len(outputs) - 1))}]")
+                ports[index] = ([f"C{index}"] + ['None'] * (len(outputs) - 1),
+                                [value_type] + [None] * (len(outputs) - 1))
+                continue
+
+            # Registry evaluator with the interpreter's error handling
+            self._constants[f"E{index}"] = evaluate
+            args = self._args(caster, blocks.BLOCKS.get(type_, (None, 'raw'))[1], raw, raw_types)
+            lines.append("    try:")
+            lines.append(f"        v{index} = shape_outputs({type_!r}, {expected}, E{index}(executor, N{index}, {args}))")
+            lines.append("    except Exception as e:")
+            lines.append(f"        logger.error(f\"Error executing block {{N{index}.get('type')}} ({{N{index}['id']}}): {{e}}\")")
+            lines.append(f"        v{index} = [None] * N{index}.get('outputs', 1)")
+            if declared and expected > 0:
+                # Both the shaped result and the error fallback have exactly `expected` entries
+                ports[index] = ([f"v{index}[{i}]" for i in range(expected)], [None] * expected)
+            else:
+                ports[index] = None
+
+        entries = ', '.join(f"{node_id!r}: v{i}" for i, (node_id, *_rest) in enumerate(plan.steps))
+        lines.append(f"    return {{{entries}}}")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _args(caster, kinds, raw, raw_types):
+        if caster is None:
+            return f"[{', '.join(raw)}]"
+        args = []
+        for i, expr in enumerate(raw):
+            kind = kinds[i] if isinstance(kinds, tuple) and i < len(kinds) else (
+                'raw' if isinstance(kinds, tuple) else kinds)
+            args.append(_cast(expr, raw_types[i], kind))
+        return f"[{', '.join(args)}]"
+
+
+def compile_plan(plan):
+    """Returns a CompiledPlan, or None (interpreter fallback) if generation fails."""
+    try:
+        return CompiledPlan(plan)
+    except Exception as e:
+        logger.error(f"FBD compiler failed for program {plan.name}, using the interpreter: {e}")
+        return None
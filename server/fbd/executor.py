@@ -1,30 +1,75 @@
+import json
+import hashlib
 import logging
-import math
 import time
 from collections import deque
+from . import blocks
+from .compiler import compile_plan
+from .incremental import IncrementalPlan, TIMER_BLOCKS
+
+IO_BLOCKS = ('DIGITAL_IN', 'ANALOG_IN', 'DIGITAL_OUT', 'ANALOG_OUT')
+
+# Blocks whose value leaves the diagram; everything else only matters if it feeds one
+SINK_SUFFIXES = ('_OUT', '_DISP')
+
+CONST_BLOCKS = ('CONST_DIG', 'CONST_ANA')
 
 logger = logging.getLogger(__name__)
 
-class FBDExecutor:
-    def __init__(self, program):
-        self.program = program
-        # diagram_json might be a string or a dict depending on how it's saved/passed
-        diagram = program.diagram_json
-        if isinstance(diagram, str):
-            import json
-            try:
-                diagram = json.loads(diagram)
-            except:
-                diagram = {}
-        
+def load_diagram(diagram):
+    """diagram_json might be a string or a dict depending on how it's saved/passed"""
+    if isinstance(diagram, str):
+        try:
+            diagram = json.loads(diagram)
+        except:
+            diagram = {}
+    return diagram if isinstance(diagram, dict) else {}
+
+
+def diagram_digest(diagram):
+    """Content hash of a diagram, independent of key order."""
+    return hashlib.sha1(json.dumps(load_diagram(diagram), sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _folded(outputs):
+    """Evaluator of a folded block: its outputs computed when the plan was built."""
+    return lambda executor, node, args: list(outputs)
+
+
+def flatten_outputs(node_values, folded=None):
+    """
+    {node_id: [outputs]} -> runtime_values {'<node_id>_out_<i>': value}. Pass the plan's
+    `folded` outputs so constant blocks that are not cycle steps still show a value.
+    """
+    flattened = {}
+    for node_id, outputs in {**(folded or {}), **node_values}.items():
+        if outputs is not None:
+            for i, val in enumerate(outputs):
+                flattened[f"{node_id}_out_{i}"] = val
+    return flattened
+
+
+def plan_diagram(plan):
+    """A diagram that rebuilds the same plan (sent to FBD workers instead of the stored JSON)."""
+    return {'nodes': list(plan.nodes_data.values()), 'edges': plan.edges}
+
+
+class ExecutionPlan:
+    """
+    The parsed, sorted form of a diagram: everything FBDExecutor needs that only
+    changes when the diagram is saved. Plans are immutable and shared between cycles.
+    With `prune` (FBDProgram.prune_unused) blocks that feed no output or display are
+    left out; otherwise every block runs, as the live viewer shows all their values.
+    """
+    def __init__(self, diagram, name='', mode='INTERPRETED', prune=False):
+        self.name = name
+        self.mode = mode
+        self.prune = prune
+        diagram = load_diagram(diagram)
+
         self.nodes_data = {n['id']: n for n in diagram.get('nodes', [])}
         self.edges = diagram.get('edges', [])
-        self.bindings = program.bindings or {}
-        
-        # Load persistent state
-        self.runtime_state = program.runtime_state or {}
-        self.last_runtime_values = program.runtime_values or {}
-        
+
         # Build adjacency list and in-degree map for manual topological sort
         self.adj = {nid: [] for nid in self.nodes_data}
         self.in_degree = {nid: 0 for nid in self.nodes_data}
@@ -41,6 +86,117 @@ class FBDExecutor:
 
         self.execution_order = self._get_execution_order_kahn()
 
+        # Wires that land on a valid input port
+        self.wires = {}
+        for node_id in self.execution_order:
+            input_count = self.nodes_data[node_id].get('inputs', 0)
+            self.wires[node_id] = tuple((u, f_port, t_port) for u, f_port, t_port in self.in_edges[node_id]
+                                        if f_port >= 0 and 0 <= t_port < input_count)
+
+        # Blocks that feed no output or display are never evaluated (when pruning); pure
+        # blocks fed only by constants are evaluated once, here (see _prune / _fold)
+        self.pruned = self._prune() if prune else set()
+        self.folded = self._fold()
+
+        # Per-cycle work list: (node_id, node, input_count, wires, evaluator, input caster,
+        # type, declared outputs); block dispatch is resolved here once. A folded block
+        # feeding a live one stays as a step without inputs returning its folded outputs
+        self.steps = []
+        for node_id in self.execution_order:
+            if node_id in self.pruned:
+                continue
+            node = self.nodes_data[node_id]
+            type_ = node.get('type', 'UNKNOWN')
+            if node_id in self.folded:
+                if not type_.endswith(SINK_SUFFIXES) and all(v in self.folded for v in self.adj[node_id]
+                                                             if v not in self.pruned):
+                    continue
+                self.steps.append((node_id, node, 0, (), _folded(self.folded[node_id]), None,
+                                   type_, node.get('outputs', 0)))
+                continue
+            input_count = node.get('inputs', 0)
+            evaluate, caster = blocks.resolve(type_, input_count)
+            self.steps.append((node_id, node, input_count, self.wires[node_id], evaluate, caster,
+                               type_, node.get('outputs', 0)))
+
+        # Generated straight-line function (fbd/compiler.py); None runs the interpreter loop
+        self.compiled = compile_plan(self) if mode == 'COMPILED' else None
+        # Downstream-cone evaluation (fbd/incremental.py); needs a memo kept across cycles
+        self.incremental = IncrementalPlan(self) if mode == 'INCREMENTAL' else None
+
+        # Points read/written by IO blocks, so a caller can fetch them all before the cycle
+        self.point_ids = set()
+        self.input_point_ids = set()   # those read by input blocks (EVENT task triggers)
+        for node_id, node, *_rest in self.steps:
+            if node.get('type') in IO_BLOCKS:
+                try:
+                    point_id = int(node.get('params', {}).get('pointId'))
+                except (TypeError, ValueError):
+                    continue
+                self.point_ids.add(point_id)
+                if node.get('type').endswith('_IN'):
+                    self.input_point_ids.add(point_id)
+
+    def _prune(self):
+        """Ids of the blocks with no path to an output or display block."""
+        live = set()
+        stack = [nid for nid, node in self.nodes_data.items() if node.get('type', '').endswith(SINK_SUFFIXES)]
+        while stack:
+            v = stack.pop()
+            if v in live:
+                continue
+            live.add(v)
+            stack.extend(u for u, _f_port, _t_port in self.wires[v])
+        return set(self.nodes_data) - live
+
+    def _fold(self):
+        """
+        {node_id: outputs} of the live blocks whose value never changes: constants and pure
+        blocks whose wired inputs all come from such blocks. Timers and IO are never folded;
+        a block that fails to evaluate is left to the cycle (which logs the error).
+        """
+        folded = {}
+        position = {nid: i for i, nid in enumerate(self.execution_order)}
+        for index, node_id in enumerate(self.execution_order):
+            if node_id in self.pruned:
+                continue
+            node = self.nodes_data[node_id]
+            type_ = node.get('type', 'UNKNOWN')
+            if type_ in IO_BLOCKS or type_ in TIMER_BLOCKS:
+                continue
+            inputs = [None] * node.get('inputs', 0)
+            constant = True
+            for u, f_port, t_port in self.wires[node_id]:
+                if position[u] >= index:
+                    # Cycle: the interpreter reads None here on every cycle
+                    continue
+                if u not in folded:
+                    constant = False
+                    break
+                if f_port < len(folded[u]):
+                    inputs[t_port] = folded[u][f_port]
+            if not constant:
+                continue
+            evaluate, caster = blocks.resolve(type_, len(inputs))
+            try:
+                folded[node_id] = blocks.shape_outputs(type_, node.get('outputs', 0),
+                                                       evaluate(None, node, caster(inputs) if caster else inputs))
+            except Exception:
+                pass
+        return folded
+
+    def summary(self):
+        """What the plan builder removed, for the editor (FBDProgramViewSet.plan)."""
+        evaluated = [step[0] for step in self.steps if step[0] not in self.folded]
+        return {
+            'blocks': len(self.nodes_data),
+            'evaluated': len(evaluated),
+            'pruned': sorted(self.pruned, key=str),
+            'folded': {node_id: outputs for node_id, outputs in self.folded.items()
+                       if self.nodes_data[node_id].get('type') not in CONST_BLOCKS},
+            'execution_order': evaluated,
+        }
+
     def _get_execution_order_kahn(self):
         """Kahn's algorithm for topological sort (dependency-free)"""
         queue = deque([nid for nid, deg in self.in_degree.items() if deg == 0])
@@ -58,39 +214,107 @@ class FBDExecutor:
                     queue.append(v)
         
         if len(order) < len(self.nodes_data):
-            logger.error(f"Cycle detected or missing nodes in FBD program {self.program.name}")
+            logger.error(f"Cycle detected or missing nodes in FBD program {self.name}")
             # Fallback: add remaining nodes anyway to attempt execution
             remaining = set(self.nodes_data.keys()) - set(order)
             order.extend(list(remaining))
             
         return order
 
-    def execute_cycle(self):
-        now = time.time() * 1000 # Milliseconds
+
+class PlanCache:
+    """
+    ExecutionPlans of the running programs, keyed by program id.
+
+    A plan is reused while the program's `updated_at` is unchanged. When it moves (any
+    save), the diagram is reloaded and hashed; the old plan is kept if the diagram
+    itself did not change (e.g. only the name or bindings were edited). Programs may be
+    loaded with `defer('diagram_json')`: the diagram is only fetched on a miss.
+    """
+    def __init__(self):
+        self._plans = {}   # program_id: (updated_at, digest, plan)
+        self.compiled = 0
+
+    def __len__(self):
+        return len(self._plans)
+
+    def get(self, program):
+        entry = self._plans.get(program.id)
+        if entry is not None and entry[0] == program.updated_at:
+            return entry[2]
+
+        digest = diagram_digest(program.diagram_json)
+        plan = entry[2] if entry is not None else None
+        if (plan is None or entry[1] != digest or plan.mode != program.execution_mode
+                or plan.prune != program.prune_unused):
+            plan = ExecutionPlan(program.diagram_json, program.name, program.execution_mode,
+                                 prune=program.prune_unused)
+            self.compiled += 1
+        self._plans[program.id] = (program.updated_at, digest, plan)
+        return plan
+
+    def retain(self, program_ids):
+        """Drops the plans of programs that are no longer running."""
+        for program_id in set(self._plans) - set(program_ids):
+            del self._plans[program_id]
+
+
+class FBDExecutor:
+    def __init__(self, program, plan=None, io=None, memo=None):
+        self.program = program
+        # Batched point access shared by all programs of an engine cycle (helper.point_io)
+        self.io = io
+        # Cached outputs of the previous cycle for INCREMENTAL plans (see RuntimeStore.memo)
+        self.memo = memo
+        # A cached plan skips parsing and sorting the diagram (see PlanCache)
+        self.plan = plan or ExecutionPlan(program.diagram_json, program.name,
+                                          getattr(program, 'execution_mode', 'INTERPRETED'),
+                                          prune=getattr(program, 'prune_unused', False))
+        self.nodes_data = self.plan.nodes_data
+        self.edges = self.plan.edges
+        self.adj = self.plan.adj
+        self.in_degree = self.plan.in_degree
+        self.in_edges = self.plan.in_edges
+        self.execution_order = self.plan.execution_order
+        self.bindings = program.bindings or {}
+        
+        # Load persistent state
+        self.runtime_state = program.runtime_state or {}
+        self.last_runtime_values = program.runtime_values or {}
+
+        # Blocks evaluated / blocks whose outputs changed in the last cycle (None: not tracked)
+        self.evaluated = 0
+        self.changed = None
+
+    def execute_cycle(self, now_ms=None):
+        # Callers running several programs pass one time for all of them
+        now = time.time() * 1000 if now_ms is None else now_ms # Milliseconds
         last_run = self.runtime_state.get('_last_run_ms', now)
         delta_ms = now - last_run
         self.runtime_state['_last_run_ms'] = now
         self.runtime_state['_delta_ms'] = delta_ms
 
+        if self.plan.incremental is not None and self.memo is not None:
+            return self.plan.incremental.run(self, self.memo)
+
+        self.evaluated = len(self.plan.steps)
+        if self.plan.compiled is not None:
+            return self.plan.compiled.run(self)
+
         node_values = {} # {node_id: [outputs]}
         
-        for node_id in self.execution_order:
-            node = self.nodes_data[node_id]
-            
+        shape_outputs = blocks.shape_outputs
+        for node_id, node, input_count, wires, evaluate, caster, type_, expected_outputs in self.plan.steps:
             # Gather inputs
-            input_count = node.get('inputs', 0)
             inputs = [None] * input_count
-            for u, f_port, t_port in self.in_edges[node_id]:
-                if u in node_values:
-                    u_outputs = node_values[u]
-                    if 0 <= f_port < len(u_outputs):
-                        val = u_outputs[f_port]
-                        if 0 <= t_port < input_count:
-                            inputs[t_port] = val
+            for u, f_port, t_port in wires:
+                u_outputs = node_values.get(u)
+                if u_outputs is not None and f_port < len(u_outputs):
+                    inputs[t_port] = u_outputs[f_port]
             
-            # Process block
+            # Process block (only the casts the block declared)
             try:
-                outputs = self._process_block(node, inputs)
+                outputs = shape_outputs(type_, expected_outputs, evaluate(self, node, caster(inputs) if caster else inputs))
             except Exception as e:
                 logger.error(f"Error executing block {node.get('type')} ({node_id}): {e}")
                 outputs = [None] * node.get('outputs', 1)
@@ -101,223 +325,14 @@ class FBDExecutor:
 
     def _process_block(self, node, inputs):
         type_ = node.get('type', 'UNKNOWN')
-        node_id = node.get('id')
-        expected_outputs = node.get('outputs', 0)
-        
-        # Safe casting helpers for the engine core
-        def cast_f(v):
-            if v is None: return 0.0
-            try: return float(v)
-            except: return 0.0
-
-        def cast_b(v):
-            if v is None: return False
-            if isinstance(v, bool): return v
-            if isinstance(v, (int, float)): return v > 0.5
-            if isinstance(v, str): return v.lower() in ['1', 'true', 'on', 'yes']
-            return False
-
-        f_vals = [cast_f(x) for x in inputs]
-        b_vals = [cast_b(x) for x in inputs]
-
-        res = []
-
-        # Logic Gates
-        if type_ == 'AND': res = [all(b_vals) if b_vals else False]
-        elif type_ == 'OR': res = [any(b_vals)]
-        elif type_ == 'XOR': res = [sum(b_vals) % 2 == 1]
-        elif type_ == 'NOT': res = [not b_vals[0] if b_vals else True]
-        elif type_ == 'NAND': res = [not all(b_vals) if b_vals else True]
-        elif type_ == 'NOR': res = [not any(b_vals)]
-        elif type_ == 'XNOR': res = [sum(b_vals) % 2 == 0]
-
-        # Arithmetic
-        elif type_ == 'ADD': res = [sum(f_vals)]
-        elif type_ == 'SUB': res = [f_vals[0] - sum(f_vals[1:])] if f_vals else [0.0]
-        elif type_ == 'MUL':
-            m = 1.0
-            for v in f_vals: m *= v
-            res = [m]
-        elif type_ == 'DIV':
-            d = f_vals[0] if f_vals else 0.0
-            for v in f_vals[1:]:
-                if v != 0: d /= v
-                else: d = 0.0; break
-            res = [d]
-        elif type_ == 'MOD': res = [f_vals[0] % f_vals[1] if len(f_vals) > 1 and f_vals[1] != 0 else 0.0]
-        elif type_ == 'ABS': res = [abs(f_vals[0]) if f_vals else 0.0]
-        elif type_ == 'NEG': res = [-f_vals[0] if f_vals else 0.0]
-        elif type_ == 'SQRT': res = [math.sqrt(f_vals[0]) if f_vals and f_vals[0] >= 0 else 0.0]
-        elif type_ == 'POW': res = [math.pow(f_vals[0], f_vals[1]) if len(f_vals) > 1 else 0.0]
-
-        # Comparison
-        elif type_ == 'EQ': res = [f_vals[0] == f_vals[1] if len(f_vals) > 1 else False]
-        elif type_ == 'NE': res = [f_vals[0] != f_vals[1] if len(f_vals) > 1 else True]
-        elif type_ == 'GT': res = [f_vals[0] > f_vals[1] if len(f_vals) > 1 else False]
-        elif type_ == 'GE': res = [f_vals[0] >= f_vals[1] if len(f_vals) > 1 else False]
-        elif type_ == 'LT': res = [f_vals[0] < f_vals[1] if len(f_vals) > 1 else False]
-        elif type_ == 'LE': res = [f_vals[0] <= f_vals[1] if len(f_vals) > 1 else False]
-
-        # Selection
-        elif type_ == 'SEL': res = [f_vals[2] if b_vals[0] else f_vals[1]] if len(f_vals) >= 3 else [0.0]
-        elif type_ == 'MAX': res = [max(f_vals) if f_vals else 0.0]
-        elif type_ == 'MIN': res = [min(f_vals) if f_vals else 0.0]
-        elif type_ == 'LIMIT':
-            if len(f_vals) >= 3:
-                mn, val, mx = f_vals[0], f_vals[1], f_vals[2]
-                res = [max(mn, min(val, mx))]
-            else: res = [0.0]
-
-        # IO
-        elif type_ == 'DIGITAL_IN' or type_ == 'ANALOG_IN':
-            val = self._get_binding_value(node.get('params', {}).get('pointId'))
-            if type_ == 'DIGITAL_IN': res = [cast_b(val)]
-            else: res = [cast_f(val)]
-            
-        elif type_ == 'DIGITAL_OUT' or type_ == 'ANALOG_OUT':
-            v = b_vals[0] if type_ == 'DIGITAL_OUT' else f_vals[0]
-            self._set_binding_value(node.get('params', {}).get('pointId'), v)
-            res = [v]
-
-        # Constants
-        elif type_ == 'CONST_DIG':
-            v = node.get('params', {}).get('value', False)
-            res = [cast_b(v)]
-        elif type_ == 'CONST_ANA':
-            v = node.get('params', {}).get('value', 0.0)
-            res = [cast_f(v)]
-
-        # Timers
-        elif type_ in ['TON', 'TOF', 'TP']:
-            # Inputs: IN, PT (Preset Time in ms) | Outputs: Q, ET (Elapsed Time)
-            in_val = b_vals[0]
-            pt = f_vals[1] if len(f_vals) > 1 else cast_f(node.get('params', {}).get('pt', 1000))
-            
-            # Node-specific state
-            state = self.runtime_state.setdefault(node_id, {'accum': 0, 'last_in': False, 'active': False})
-            delta = self.runtime_state.get('_delta_ms', 0)
-            
-            q = False
-            et = state['accum']
-
-            if type_ == 'TON':
-                if in_val:
-                    state['accum'] = min(pt, state['accum'] + delta)
-                    if state['accum'] >= pt: q = True
-                else:
-                    state['accum'] = 0
-                et = state['accum']
-
-            elif type_ == 'TOF':
-                if in_val:
-                    state['accum'] = 0
-                    q = True
-                else:
-                    state['accum'] = min(pt, state['accum'] + delta)
-                    if state['accum'] < pt: q = True
-                    else: q = False
-                et = state['accum']
-
-            elif type_ == 'TP':
-                # Rising edge detection for TP
-                if in_val and not state['last_in'] and not state['active']:
-                    state['active'] = True
-                    state['accum'] = 0
-                
-                if state['active']:
-                    state['accum'] += delta
-                    if state['accum'] >= pt:
-                        state['active'] = False
-                        state['accum'] = pt
-                        q = False
-                    else:
-                        q = True
-                et = state['accum']
-            
-            state['last_in'] = in_val
-            res = [q, et]
-
-        # Multiplexing
-        elif type_ == 'MUX':
-            # Inputs: IN0, IN1, ..., SEL (last input is selector)
-            if len(inputs) >= 2:
-                sel = int(cast_f(inputs[-1]))
-                data_inputs = inputs[:-1]
-                if 0 <= sel < len(data_inputs):
-                    res = [data_inputs[sel]]
-                else:
-                    res = [data_inputs[0]] if data_inputs else [0.0]
-            else:
-                res = [0.0]
-
-        elif type_ == 'DEMUX':
-            # Inputs: IN, SEL
-            if len(inputs) >= 2:
-                val = inputs[0]
-                sel = int(cast_f(inputs[1]))
-                res = [0.0] * expected_outputs
-                if 0 <= sel < expected_outputs:
-                    res[sel] = val
-            else:
-                res = [0.0] * expected_outputs
-
-        # Encoders/Decoders
-        elif type_ == 'ENCODER':
-            # Inputs: D0, D1, ... -> Output: Index of first active input
-            idx = 0
-            for i, v in enumerate(b_vals):
-                if v:
-                    idx = i
-                    break
-            res = [float(idx)]
-
-        elif type_ == 'DECODER':
-            # Input: Binary Index -> Outputs: One-hot (selected pin is 1, others 0)
-            idx = int(cast_f(inputs[0])) if inputs else 0
-            res = [False] * expected_outputs
-            if 0 <= idx < expected_outputs:
-                res[idx] = True
-
-        elif type_ == 'BIN_TO_DIG':
-            # Input: Integer -> Outputs: Individual bits
-            val = int(cast_f(inputs[0])) if inputs else 0
-            res = [(val >> i) & 1 == 1 for i in range(expected_outputs)]
-
-        elif type_ == 'DIG_TO_BIN':
-            # Inputs: Individual bits -> Output: Integer
-            val = 0
-            for i, v in enumerate(b_vals):
-                if v:
-                    val |= (1 << i)
-            res = [float(val)]
-
-        # Utils
-        elif type_ == 'SPLITTER':
-            # Input: 1 -> Outputs: Many (all same as input)
-            val = inputs[0] if inputs else 0.0
-            res = [val] * expected_outputs
-
-        elif type_ == 'TERMINAL':
-            res = [inputs[0] if inputs else 0.0]
-
-        # Displays
-        elif type_ == 'ANA_DISP': res = [f_vals[0] if f_vals else 0.0]
-        elif type_ == 'DIG_DISP': res = [b_vals[0] if b_vals else False]
-
-        # Force result to list of expected length
-        if expected_outputs > 0:
-            if len(res) < expected_outputs:
-                res.extend([None] * (expected_outputs - len(res)))
-            else:
-                res = res[:expected_outputs]
-        elif not res and (type_.endswith('_IN') or type_.endswith('_OUT') or type_.endswith('_DISP') or type_.startswith('CONST_')):
-            # Fallback for IO/Display with 0 declared outputs but used in viewer
-            res = [0.0]
-
-        return res
+        evaluate, caster = blocks.resolve(type_, len(inputs))
+        res = evaluate(self, node, caster(inputs) if caster else inputs)
+        return blocks.shape_outputs(type_, node.get('outputs', 0), res)
 
     def _get_binding_value(self, point_id):
         if not point_id: return None
+        if self.io is not None:
+            return self.io.read(point_id)
         from devices.models import Point
         try:
             point = Point.objects.get(id=point_id)
@@ -327,6 +342,9 @@ class FBDExecutor:
 
     def _set_binding_value(self, point_id, value):
         if not point_id: return
+        if self.io is not None:
+            self.io.write(point_id, value)
+            return
         from devices.models import Point
         try:
             point = Point.objects.get(id=point_id)
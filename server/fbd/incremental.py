@@ -0,0 +1,109 @@
+import heapq
+import logging
+from . import blocks
+
+logger = logging.getLogger(__name__)
+
+# Blocks evaluated every cycle: inputs read points that change outside the diagram,
+# outputs re-assert their value on the point like the full evaluation does
+ALWAYS_BLOCKS = ('DIGITAL_IN', 'ANALOG_IN', 'DIGITAL_OUT', 'ANALOG_OUT')
+
+# Blocks whose outputs depend on time (runtime_state), not only on their inputs
+TIMER_BLOCKS = ('TON', 'TOF', 'TP')
+
+
+def same_outputs(old, new):
+    """True if two output lists are equal value by value, including the type (1 vs True)."""
+    if old is None or len(old) != len(new):
+        return False
+    for a, b in zip(old, new):
+        if type(a) is not type(b) or a != b:
+            return False
+    return True
+
+
+class IncrementalPlan:
+    """
+    Event-driven evaluation of an ExecutionPlan: only the cone downstream of what changed.
+
+    Sources are re-evaluated every cycle: IO blocks and timers that are still running (a
+    timer settles once an evaluation leaves its state and outputs unchanged). A block is
+    only evaluated when one of its inputs changed this cycle, and its consumers only when
+    its own outputs changed (early cutoff). Everything else keeps its cached outputs from
+    `memo`, a dict the caller holds per program between cycles. The first cycle, and any
+    cycle after the plan changed, evaluates every block. Results equal the full evaluation.
+    """
+    def __init__(self, plan):
+        self.plan = plan
+        position = {node_id: i for i, (node_id, *_rest) in enumerate(plan.steps)}
+        self.wires = []       # per step: (source index, from port, to port), earlier steps only
+        self.consumers = []   # per step: indexes of the steps fed by it
+        for index, (node_id, node, input_count, wires, *_rest) in enumerate(plan.steps):
+            # Like the interpreter, wires from later steps (cycles) always read None
+            self.wires.append(tuple((position[u], f_port, t_port) for u, f_port, t_port in wires
+                                    if position[u] < index))
+            self.consumers.append(set())
+        for index, wires in enumerate(self.wires):
+            for u_index, _f_port, _t_port in wires:
+                self.consumers[u_index].add(index)
+        self.consumers = [tuple(sorted(c)) for c in self.consumers]
+        self.always = tuple(i for i, step in enumerate(plan.steps) if step[6] in ALWAYS_BLOCKS)
+        self.timers = frozenset(i for i, step in enumerate(plan.steps) if step[6] in TIMER_BLOCKS)
+
+    def run(self, executor, memo):
+        steps = self.plan.steps
+        if memo.get('plan') is not self.plan:
+            memo.clear()
+            memo['plan'] = self.plan
+            memo['values'] = [None] * len(steps)
+            memo['running'] = set()   # timers to evaluate next cycle
+            queue = list(range(len(steps)))
+        else:
+            queue = sorted(set(self.always) | memo['running'])
+        values = memo['values']
+        running = memo['running']
+        queued = set(queue)
+        state = executor.runtime_state
+        delta = state.get('_delta_ms', 0)
+        evaluated = changed = 0
+
+        # Steps are in topological order, so the smallest queued index never has a pending input
+        shape_outputs = blocks.shape_outputs
+        while queue:
+            index = heapq.heappop(queue)
+            node_id, node, input_count, _wires, evaluate, caster, type_, expected_outputs = steps[index]
+            inputs = [None] * input_count
+            for u_index, f_port, t_port in self.wires[index]:
+                u_outputs = values[u_index]
+                if u_outputs is not None and f_port < len(u_outputs):
+                    inputs[t_port] = u_outputs[f_port]
+
+            timer = index in self.timers
+            if timer:
+                before = dict(state[node_id]) if node_id in state else None
+            try:
+                outputs = shape_outputs(type_, expected_outputs, evaluate(executor, node, caster(inputs) if caster else inputs))
+            except Exception as e:
+                logger.error(f"Error executing block {node.get('type')} ({node_id}): {e}")
+                outputs = [None] * node.get('outputs', 1)
+            evaluated += 1
+
+            unchanged = same_outputs(values[index], outputs)
+            if timer:
+                # Settled: a cycle that advanced the clock changed nothing
+                if unchanged and delta > 0 and before == state.get(node_id):
+                    running.discard(index)
+                else:
+                    running.add(index)
+            values[index] = outputs
+            if unchanged:
+                continue
+            changed += 1
+            for consumer in self.consumers[index]:
+                if consumer not in queued:
+                    queued.add(consumer)
+                    heapq.heappush(queue, consumer)
+
+        executor.evaluated = evaluated
+        executor.changed = changed
+        return {step[0]: values[i] for i, step in enumerate(steps)}
@@ -0,0 +1,372 @@
+import math
+import time
+import random
+from django.core.management.base import BaseCommand
+from fbd.models import FBDProgram
+from fbd.executor import FBDExecutor, ExecutionPlan, logger
+
+# (type, inputs, outputs) of the blocks used in the synthetic diagrams; inputs come from
+# constants and ANALOG_IN blocks served by BenchIO instead of Points
+BENCH_BLOCKS = [
+    ('AND', 2, 1), ('OR', 3, 1), ('XOR', 2, 1), ('NOT', 1, 1),
+    ('ADD', 2, 1), ('SUB', 2, 1), ('MUL', 2, 1), ('DIV', 2, 1), ('ABS', 1, 1),
+    ('GT', 2, 1), ('LE', 2, 1), ('EQ', 2, 1),
+    ('SEL', 3, 1), ('MAX', 3, 1), ('LIMIT', 3, 1), ('MUX', 3, 1),
+    ('TON', 2, 2), ('TP', 2, 2), ('SPLITTER', 1, 2), ('DIG_TO_BIN', 4, 1),
+]
+
+
+class BenchIO:
+    """Stands in for helper.point_io.PointIO: point values held in a dict."""
+    def __init__(self):
+        self.values = {}
+
+    def read(self, point_id):
+        return self.values.get(point_id)
+
+    def write(self, point_id, value):
+        pass
+
+
+class BaselineExecutor(FBDExecutor):
+    """
+    The block dispatch FBDExecutor used before fbd.blocks: every node walks an if/elif
+    chain on its type string and casts all of its inputs to floats and booleans. Kept
+    here, unchanged, as the reference for the 'baseline' mode. Every block runs: the
+    plan's pruning and folding are not used.
+    """
+    def __init__(self, program, plan=None, io=None, memo=None):
+        super().__init__(program, plan=plan, io=io, memo=memo)
+        # Per-cycle work list of the old plan: (node_id, node, input_count, wires)
+        self.steps = [(node_id, self.nodes_data[node_id], self.nodes_data[node_id].get('inputs', 0),
+                       self.plan.wires[node_id]) for node_id in self.execution_order]
+
+    def execute_cycle(self, now_ms=None):
+        now = time.time() * 1000 if now_ms is None else now_ms
+        last_run = self.runtime_state.get('_last_run_ms', now)
+        delta_ms = now - last_run
+        self.runtime_state['_last_run_ms'] = now
+        self.runtime_state['_delta_ms'] = delta_ms
+        self.evaluated = len(self.steps)
+
+        node_values = {}
+        for node_id, node, input_count, wires in self.steps:
+            inputs = [None] * input_count
+            for u, f_port, t_port in wires:
+                u_outputs = node_values.get(u)
+                if u_outputs is not None and f_port < len(u_outputs):
+                    inputs[t_port] = u_outputs[f_port]
+            try:
+                outputs = self._process_block(node, inputs)
+            except Exception as e:
+                logger.error(f"Error executing block {node.get('type')} ({node_id}): {e}")
+                outputs = [None] * node.get('outputs', 1)
+            node_values[node_id] = outputs
+        return node_values
+
+    def _process_block(self, node, inputs):
+        type_ = node.get('type', 'UNKNOWN')
+        node_id = node.get('id')
+        expected_outputs = node.get('outputs', 0)
+        
+        # Safe casting helpers for the engine core
+        def cast_f(v):
+            if v is None: return 0.0
+            try: return float(v)
+            except: return 0.0
+
+        def cast_b(v):
+            if v is None: return False
+            if isinstance(v, bool): return v
+            if isinstance(v, (int, float)): return v > 0.5
+            if isinstance(v, str): return v.lower() in ['1', 'true', 'on', 'yes']
+            return False
+
+        f_vals = [cast_f(x) for x in inputs]
+        b_vals = [cast_b(x) for x in inputs]
+
+        res = []
+
+        # Logic Gates
+        if type_ == 'AND': res = [all(b_vals) if b_vals else False]
+        elif type_ == 'OR': res = [any(b_vals)]
+        elif type_ == 'XOR': res = [sum(b_vals) % 2 == 1]
+        elif type_ == 'NOT': res = [not b_vals[0] if b_vals else True]
+        elif type_ == 'NAND': res = [not all(b_vals) if b_vals else True]
+        elif type_ == 'NOR': res = [not any(b_vals)]
+        elif type_ == 'XNOR': res = [sum(b_vals) % 2 == 0]
+
+        # Arithmetic
+        elif type_ == 'ADD': res = [sum(f_vals)]
+        elif type_ == 'SUB': res = [f_vals[0] - sum(f_vals[1:])] if f_vals else [0.0]
+        elif type_ == 'MUL':
+            m = 1.0
+            for v in f_vals: m *= v
+            res = [m]
+        elif type_ == 'DIV':
+            d = f_vals[0] if f_vals else 0.0
+            for v in f_vals[1:]:
+                if v != 0: d /= v
+                else: d = 0.0; break
+            res = [d]
+        elif type_ == 'MOD': res = [f_vals[0] % f_vals[1] if len(f_vals) > 1 and f_vals[1] != 0 else 0.0]
+        elif type_ == 'ABS': res = [abs(f_vals[0]) if f_vals else 0.0]
+        elif type_ == 'NEG': res = [-f_vals[0] if f_vals else 0.0]
+        elif type_ == 'SQRT': res = [math.sqrt(f_vals[0]) if f_vals and f_vals[0] >= 0 else 0.0]
+        elif type_ == 'POW': res = [math.pow(f_vals[0], f_vals[1]) if len(f_vals) > 1 else 0.0]
+
+        # Comparison
+        elif type_ == 'EQ': res = [f_vals[0] == f_vals[1] if len(f_vals) > 1 else False]
+        elif type_ == 'NE': res = [f_vals[0] != f_vals[1] if len(f_vals) > 1 else True]
+        elif type_ == 'GT': res = [f_vals[0] > f_vals[1] if len(f_vals) > 1 else False]
+        elif type_ == 'GE': res = [f_vals[0] >= f_vals[1] if len(f_vals) > 1 else False]
+        elif type_ == 'LT': res = [f_vals[0] < f_vals[1] if len(f_vals) > 1 else False]
+        elif type_ == 'LE': res = [f_vals[0] <= f_vals[1] if len(f_vals) > 1 else False]
+
+        # Selection
+        elif type_ == 'SEL': res = [f_vals[2] if b_vals[0] else f_vals[1]] if len(f_vals) >= 3 else [0.0]
+        elif type_ == 'MAX': res = [max(f_vals) if f_vals else 0.0]
+        elif type_ == 'MIN': res = [min(f_vals) if f_vals else 0.0]
+        elif type_ == 'LIMIT':
+            if len(f_vals) >= 3:
+                mn, val, mx = f_vals[0], f_vals[1], f_vals[2]
+                res = [max(mn, min(val, mx))]
+            else: res = [0.0]
+
+        # IO
+        elif type_ == 'DIGITAL_IN' or type_ == 'ANALOG_IN':
+            val = self._get_binding_value(node.get('params', {}).get('pointId'))
+            if type_ == 'DIGITAL_IN': res = [cast_b(val)]
+            else: res = [cast_f(val)]
+            
+        elif type_ == 'DIGITAL_OUT' or type_ == 'ANALOG_OUT':
+            v = b_vals[0] if type_ == 'DIGITAL_OUT' else f_vals[0]
+            self._set_binding_value(node.get('params', {}).get('pointId'), v)
+            res = [v]
+
+        # Constants
+        elif type_ == 'CONST_DIG':
+            v = node.get('params', {}).get('value', False)
+            res = [cast_b(v)]
+        elif type_ == 'CONST_ANA':
+            v = node.get('params', {}).get('value', 0.0)
+            res = [cast_f(v)]
+
+        # Timers
+        elif type_ in ['TON', 'TOF', 'TP']:
+            # Inputs: IN, PT (Preset Time in ms) | Outputs: Q, ET (Elapsed Time)
+            in_val = b_vals[0]
+            pt = f_vals[1] if len(f_vals) > 1 else cast_f(node.get('params', {}).get('pt', 1000))
+            
+            # Node-specific state
+            state = self.runtime_state.setdefault(node_id, {'accum': 0, 'last_in': False, 'active': False})
+            delta = self.runtime_state.get('_delta_ms', 0)
+            
+            q = False
+            et = state['accum']
+
+            if type_ == 'TON':
+                if in_val:
+                    state['accum'] = min(pt, state['accum'] + delta)
+                    if state['accum'] >= pt: q = True
+                else:
+                    state['accum'] = 0
+                et = state['accum']
+
+            elif type_ == 'TOF':
+                if in_val:
+                    state['accum'] = 0
+                    q = True
+                else:
+                    state['accum'] = min(pt, state['accum'] + delta)
+                    if state['accum'] < pt: q = True
+                    else: q = False
+                et = state['accum']
+
+            elif type_ == 'TP':
+                # Rising edge detection for TP
+                if in_val and not state['last_in'] and not state['active']:
+                    state['active'] = True
+                    state['accum'] = 0
+                
+                if state['active']:
+                    state['accum'] += delta
+                    if state['accum'] >= pt:
+                        state['active'] = False
+                        state['accum'] = pt
+                        q = False
+                    else:
+                        q = True
+                et = state['accum']
+            
+            state['last_in'] = in_val
+            res = [q, et]
+
+        # Multiplexing
+        elif type_ == 'MUX':
+            # Inputs: IN0, IN1, ..., SEL (last input is selector)
+            if len(inputs) >= 2:
+                sel = int(cast_f(inputs[-1]))
+                data_inputs = inputs[:-1]
+                if 0 <= sel < len(data_inputs):
+                    res = [data_inputs[sel]]
+                else:
+                    res = [data_inputs[0]] if data_inputs else [0.0]
+            else:
+                res = [0.0]
+
+        elif type_ == 'DEMUX':
+            # Inputs: IN, SEL
+            if len(inputs) >= 2:
+                val = inputs[0]
+                sel = int(cast_f(inputs[1]))
+                res = [0.0] * expected_outputs
+                if 0 <= sel < expected_outputs:
+                    res[sel] = val
+            else:
+                res = [0.0] * expected_outputs
+
+        # Encoders/Decoders
+        elif type_ == 'ENCODER':
+            # Inputs: D0, D1, ... -> Output: Index of first active input
+            idx = 0
+            for i, v in enumerate(b_vals):
+                if v:
+                    idx = i
+                    break
+            res = [float(idx)]
+
+        elif type_ == 'DECODER':
+            # Input: Binary Index -> Outputs: One-hot (selected pin is 1, others 0)
+            idx = int(cast_f(inputs[0])) if inputs else 0
+            res = [False] * expected_outputs
+            if 0 <= idx < expected_outputs:
+                res[idx] = True
+
+        elif type_ == 'BIN_TO_DIG':
+            # Input: Integer -> Outputs: Individual bits
+            val = int(cast_f(inputs[0])) if inputs else 0
+            res = [(val >> i) & 1 == 1 for i in range(expected_outputs)]
+
+        elif type_ == 'DIG_TO_BIN':
+            # Inputs: Individual bits -> Output: Integer
+            val = 0
+            for i, v in enumerate(b_vals):
+                if v:
+                    val |= (1 << i)
+            res = [float(val)]
+
+        # Utils
+        elif type_ == 'SPLITTER':
+            # Input: 1 -> Outputs: Many (all same as input)
+            val = inputs[0] if inputs else 0.0
+            res = [val] * expected_outputs
+
+        elif type_ == 'TERMINAL':
+            res = [inputs[0] if inputs else 0.0]
+
+        # Displays
+        elif type_ == 'ANA_DISP': res = [f_vals[0] if f_vals else 0.0]
+        elif type_ == 'DIG_DISP': res = [b_vals[0] if b_vals else False]
+
+        # Force result to list of expected length
+        if expected_outputs > 0:
+            if len(res) < expected_outputs:
+                res.extend([None] * (expected_outputs - len(res)))
+            else:
+                res = res[:expected_outputs]
+        elif not res and (type_.endswith('_IN') or type_.endswith('_OUT') or type_.endswith('_DISP') or type_.startswith('CONST_')):
+            # Fallback for IO/Display with 0 declared outputs but used in viewer
+            res = [0.0]
+
+        return res
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks FBD block evaluation (blocks/sec) on synthetic diagrams (no DB access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000',
+                            help='Comma separated block counts per diagram (default: 100,1000,10000)')
+        parser.add_argument('--cycles', type=int, default=20,
+                            help='Cycles executed per size (default: 20)')
+        parser.add_argument('--modes', default='baseline,interpreted,compiled,incremental',
+                            help='Comma separated execution modes to compare; baseline is the if/elif dispatch '
+                                 'used before fbd.blocks (default: baseline,interpreted,compiled,incremental)')
+        parser.add_argument('--inputs', type=int, default=20,
+                            help='ANALOG_IN blocks per diagram (default: 20)')
+        parser.add_argument('--change', type=float, default=0.05,
+                            help='Fraction of the inputs changing value each cycle (default: 0.05)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prune', action='store_true', help='Skip blocks that feed no output (FBDProgram.prune_unused)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        modes = [m.strip().upper() for m in options['modes'].split(',') if m.strip()]
+
+        for size in sizes:
+            diagram = self._make_diagram(size, options['inputs'], rng)
+            reference = None   # blocks/sec of the baseline dispatch
+            for mode in modes:
+                baseline = mode == 'BASELINE'
+                plan_mode = 'INTERPRETED' if baseline else mode
+                # Every mode sees the same input changes
+                changes = random.Random(options['seed'])
+                io = BenchIO()
+                program = FBDProgram(id=size, name=f"bench_{size}", diagram_json=diagram, execution_mode=plan_mode,
+                                     prune_unused=options['prune'])
+                start = time.perf_counter()
+                plan = ExecutionPlan(program.diagram_json, program.name, plan_mode, prune=options['prune'])
+                build_time = time.perf_counter() - start
+                executor = (BaselineExecutor if baseline else FBDExecutor)(program, plan=plan, io=io, memo={})
+                executor.execute_cycle()
+
+                evaluated = 0
+                elapsed = 0.0
+                for _ in range(options['cycles']):
+                    for point_id in range(options['inputs']):
+                        if changes.random() < options['change']:
+                            io.values[point_id] = changes.uniform(0, 10)
+                    start = time.perf_counter()
+                    executor.execute_cycle()
+                    elapsed += time.perf_counter() - start
+                    evaluated += executor.evaluated
+
+                blocks = len(plan.execution_order) * options['cycles']
+                rate = blocks / elapsed
+                if baseline:
+                    reference = rate
+                    gain = ''
+                else:
+                    gain = f", {rate / reference:.2f}x baseline" if reference else ''
+                self.stdout.write(
+                    f"{size} blocks {mode.lower()}: {elapsed / options['cycles'] * 1000:.2f} ms/cycle, "
+                    f"{rate:,.0f} blocks/sec{gain}, {evaluated / options['cycles']:,.0f} evaluated/cycle "
+                    f"(plan built in {build_time * 1000:.1f} ms, {len(plan.pruned)} pruned, {len(plan.folded)} folded)"
+                )
+
+    def _make_diagram(self, size, inputs_count, rng):
+        nodes, edges = [], []
+        for i in range(4):
+            nodes.append({'id': f"c{i}", 'type': 'CONST_ANA', 'inputs': 0, 'outputs': 1,
+                          'params': {'value': rng.uniform(0, 10)}})
+        sources = nodes[:4]
+        for i in range(inputs_count):
+            nodes.append({'id': f"in{i}", 'type': 'ANALOG_IN', 'inputs': 0, 'outputs': 1,
+                          'params': {'pointId': i}})
+            sources.append(nodes[-1])
+        for i in range(size):
+            type_, inputs, outputs = rng.choice(BENCH_BLOCKS)
+            node_id = f"n{i}"
+            # Wire every input to a source or a nearby earlier block (acyclic, like drawn diagrams)
+            for port in range(inputs):
+                source = rng.choice(sources) if rng.random() < 1 / 3 else rng.choice(nodes[-8:])
+                edges.append({'fromNode': source['id'], 'fromPort': 0, 'toNode': node_id, 'toPort': port})
+            nodes.append({'id': node_id, 'type': type_, 'inputs': inputs, 'outputs': outputs,
+                          'params': {'pt': 500}})
+        # Displays on every 10th block, so the logic is not pruned as unused
+        for i in range(0, size, 10):
+            nodes.append({'id': f"d{i}", 'type': 'ANA_DISP', 'inputs': 1, 'outputs': 1})
+            edges.append({'fromNode': f"n{i}", 'fromPort': 0, 'toNode': f"d{i}", 'toPort': 0})
+        return {'nodes': nodes, 'edges': edges}
@@ -0,0 +1,111 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from fbd.models import FBDProgram
+from fbd.simulation import Simulation, load_sequence
+
+
+class Command(BaseCommand):
+    help = 'Simulates an FBD program offline on virtual time (cycles/sec, per-block-type cost, final outputs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('program', nargs='?', help='FBDProgram id or name')
+        parser.add_argument('--diagram', help='Diagram JSON file to simulate instead of a stored program')
+        parser.add_argument('--mode', help='Execution mode (default: the program\'s, INTERPRETED for --diagram)')
+        parser.add_argument('--prune', action='store_true',
+                            help='Skip blocks that feed no output (default: the program\'s setting, off for --diagram)')
+        parser.add_argument('--cycles', type=int, default=100, help='Cycles to run (default: 100)')
+        parser.add_argument('--cycle-ms', type=float, default=100.0,
+                            help='Virtual time per cycle in ms (default: 100)')
+        parser.add_argument('--inputs',
+                            help='Recorded inputs: JSON file with [{"cycle": n, "values": {point_id: v}}] '
+                                 'or {point_id: [v per cycle]}')
+        parser.add_argument('--change', type=float, default=0.0,
+                            help='Synthetic inputs: probability that an input point changes per cycle (default: 0)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--resume', action='store_true',
+                            help='Start from the program\'s stored timer state instead of a fresh one')
+        parser.add_argument('--trace', action='store_true', help='List the output writes that changed, per cycle')
+        parser.add_argument('--no-profile', action='store_true', help='Skip the per-block-type cost replay')
+        parser.add_argument('--json', action='store_true', help='Print the full result as JSON')
+        parser.add_argument('--max-ms', type=float,
+                            help='Fail (for CI) if the average cycle takes longer than this many ms')
+
+    def handle(self, *args, **options):
+        runtime_state = None
+        if options['diagram']:
+            with open(options['diagram']) as f:
+                diagram = json.load(f)
+            name = options['diagram']
+            mode = options['mode'] or 'INTERPRETED'
+            prune = options['prune']
+        elif options['program']:
+            program = self._get_program(options['program'])
+            diagram = program.diagram_json
+            name = program.name
+            mode = options['mode'] or program.execution_mode
+            prune = options['prune'] or program.prune_unused
+            if options['resume']:
+                runtime_state = program.runtime_state
+        else:
+            raise CommandError('Give a program id/name or --diagram')
+
+        sequence = {}
+        if options['inputs']:
+            with open(options['inputs']) as f:
+                sequence = load_sequence(json.load(f))
+
+        simulation = Simulation(diagram, mode=mode.upper(), name=name, cycle_ms=options['cycle_ms'],
+                                sequence=sequence, change=options['change'], seed=options['seed'],
+                                runtime_state=runtime_state, prune=prune)
+        if options['program'] and not options['diagram']:
+            # Inputs not given by the sequence start from the points' current values
+            simulation.initial = self._current_values(simulation.plan.input_point_ids)
+        result = simulation.run(options['cycles'], profile=not options['no_profile'], trace=options['trace'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2, default=str))
+        else:
+            self._print(result)
+
+        if options['max_ms'] is not None and result['avg_cycle_ms'] > options['max_ms']:
+            raise CommandError(f"Average cycle {result['avg_cycle_ms']:.3f} ms exceeds --max-ms {options['max_ms']}")
+
+    def _get_program(self, ref):
+        try:
+            if ref.isdigit():
+                return FBDProgram.objects.get(id=int(ref))
+            return FBDProgram.objects.get(name=ref)
+        except FBDProgram.DoesNotExist:
+            raise CommandError(f"FBD program {ref!r} not found")
+        except FBDProgram.MultipleObjectsReturned:
+            raise CommandError(f"Several FBD programs are named {ref!r}, use the id")
+
+    def _current_values(self, point_ids):
+        from helper.point_io import PointIO
+        io = PointIO()
+        io.prefetch(point_ids)
+        return {point_id: io.read(point_id) for point_id in io.points}
+
+    def _print(self, result):
+        self.stdout.write(
+            f"{result['program']} ({result['mode'].lower()}): {result['blocks']} blocks "
+            f"({result['pruned']} pruned, {result['folded']} folded), {result['cycles']} cycles = "
+            f"{result['virtual_s']:.1f}s virtual in {result['elapsed_s'] * 1000:.1f}ms"
+        )
+        cycles_per_sec = result['cycles_per_sec']
+        self.stdout.write(
+            f"  {cycles_per_sec:,.0f} cycles/sec, {result['avg_cycle_ms']:.3f} ms/cycle avg, "
+            f"{result['max_cycle_ms']:.3f} ms max, {result['evaluated_per_cycle']:,.1f} blocks evaluated/cycle"
+            if cycles_per_sec else "  no cycles run"
+        )
+        if 'block_costs' in result:
+            self.stdout.write("  Block cost (interpreted replay):")
+            for type_, cost in result['block_costs'].items():
+                self.stdout.write(f"    {type_:<12} {cost['count']:>8} evals {cost['total_ms']:>9.2f} ms {cost['avg_us']:>8.2f} us/eval")
+        self.stdout.write("  Outputs:")
+        for node_id, outputs in result['outputs'].items():
+            self.stdout.write(f"    {node_id}: {outputs}")
+        if result['writes']:
+            self.stdout.write(f"  Point writes: {result['writes']}")
+        for entry in result.get('trace', []):
+            self.stdout.write(f"  [{entry['cycle']} @ {entry['t_ms']:.0f}ms] {entry['writes']}")
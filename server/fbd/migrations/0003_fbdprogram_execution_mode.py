@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fbd', '0002_add_runtime_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fbdprogram',
+            name='execution_mode',
+            field=models.CharField(choices=[('INTERPRETED', 'Interpreted'), ('COMPILED', 'Compiled')], default='INTERPRETED', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fbd', '0003_fbdprogram_execution_mode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fbdprogram',
+            name='execution_mode',
+            field=models.CharField(choices=[('INTERPRETED', 'Interpreted'), ('COMPILED', 'Compiled'), ('INCREMENTAL', 'Incremental')], default='INTERPRETED', max_length=20),
+        ),
+    ]
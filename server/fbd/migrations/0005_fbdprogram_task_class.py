@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fbd', '0004_alter_fbdprogram_execution_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fbdprogram',
+            name='task_class',
+            field=models.CharField(choices=[('FAST', 'Fast'), ('NORMAL', 'Normal'), ('SLOW', 'Slow'), ('EVENT', 'Event')], default='NORMAL', max_length=10),
+        ),
+    ]
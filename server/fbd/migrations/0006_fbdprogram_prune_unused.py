@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fbd', '0005_fbdprogram_task_class'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fbdprogram',
+            name='prune_unused',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -2,9 +2,25 @@ from django.db import models
 from django.conf import settings
 
 class FBDProgram(models.Model):
+    EXECUTION_MODE_CHOICES = [
+        ('INTERPRETED', 'Interpreted'),
+        ('COMPILED', 'Compiled'),  # Generated Python function, see fbd/compiler.py
+        ('INCREMENTAL', 'Incremental'),  # Only blocks downstream of changes, see fbd/incremental.py
+    ]
+    TASK_CLASS_CHOICES = [
+        ('FAST', 'Fast'),      # Periods in settings.FBD_TASK_PERIODS, see fbd/scheduling.py
+        ('NORMAL', 'Normal'),
+        ('SLOW', 'Slow'),
+        ('EVENT', 'Event'),    # Runs when one of its input points changes
+    ]
+
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     is_active = models.BooleanField(default=False)
+    execution_mode = models.CharField(max_length=20, choices=EXECUTION_MODE_CHOICES, default='INTERPRETED')
+    task_class = models.CharField(max_length=10, choices=TASK_CLASS_CHOICES, default='NORMAL')
+    # Skip blocks that feed no output/display (the live viewer then shows no value for them)
+    prune_unused = models.BooleanField(default=False)
     diagram_json = models.JSONField(default=dict, blank=True)  # Stores nodes and edges
     bindings = models.JSONField(default=dict, blank=True)      # Stores IO bindings
     runtime_values = models.JSONField(default=dict, blank=True) # Last cycle output values
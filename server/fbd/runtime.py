@@ -0,0 +1,119 @@
+import json
+import time
+import logging
+from helper.live import live_get, live_set_many
+from .models import FBDProgram
+
+logger = logging.getLogger(__name__)
+
+# Live runtime values of a program in the shared cache (see FBDProgramViewSet.runtime)
+RUNTIME_KEY = 'fbd:runtime:{}'
+
+# Keys FBDExecutor rewrites every cycle; they alone do not make a program's state dirty
+VOLATILE_STATE_KEYS = ('_last_run_ms', '_delta_ms')
+
+
+def live_runtime_values(program_id):
+    """The engine's current runtime values of a program, or None if not published."""
+    return live_get(RUNTIME_KEY.format(program_id))
+
+
+def _fingerprint(values, state):
+    stable = {k: v for k, v in state.items() if k not in VOLATILE_STATE_KEYS}
+    return json.dumps([values, stable], sort_keys=True, default=str)
+
+
+class RuntimeStore:
+    """
+    runtime_values / runtime_state of the running FBD programs, held in engine memory.
+
+    The executor works on the in-memory state every cycle. `checkpoint()` writes it back
+    to the database at most every `checkpoint_interval` seconds (and when forced, e.g. at
+    shutdown), and only for programs whose outputs or block state changed since the last
+    checkpoint. `publish()` pushes changed runtime values to the live cache so the API
+    serves them without waiting for a checkpoint.
+    """
+    def __init__(self, checkpoint_interval=10.0, publish_ttl=30.0):
+        self.checkpoint_interval = checkpoint_interval
+        self.publish_ttl = publish_ttl
+        self._state = {}       # program_id: runtime_state (mutated by the executor)
+        self._values = {}      # program_id: runtime_values of the last cycle
+        self._saved = {}       # program_id: fingerprint of the last checkpoint
+        self._published = {}   # program_id: (values, time) last sent to the live cache
+        self._memo = {}        # program_id: cached block outputs of INCREMENTAL programs (never persisted)
+        self._last_checkpoint = time.time()
+        self.checkpoints = 0
+
+    def __contains__(self, program_id):
+        return program_id in self._state
+
+    def load(self, program_ids):
+        """Takes over the persisted state of programs not yet held in memory (one query)."""
+        missing = [pid for pid in program_ids if pid not in self._state]
+        if not missing:
+            return
+        rows = FBDProgram.objects.filter(id__in=missing).values('id', 'runtime_values', 'runtime_state')
+        for row in rows:
+            pid = row['id']
+            self._state[pid] = row['runtime_state'] or {}
+            self._values[pid] = row['runtime_values'] or {}
+            self._saved[pid] = _fingerprint(self._values[pid], self._state[pid])
+
+    def state(self, program_id):
+        return self._state.setdefault(program_id, {})
+
+    def values(self, program_id):
+        return self._values.get(program_id, {})
+
+    def memo(self, program_id):
+        return self._memo.setdefault(program_id, {})
+
+    def update(self, program_id, values, state):
+        self._values[program_id] = values
+        self._state[program_id] = state
+
+    def retain(self, program_ids):
+        """Checkpoints and forgets programs that stopped running."""
+        gone = set(self._state) - set(program_ids)
+        if gone:
+            self._write(gone)
+            for pid in gone:
+                for store in (self._state, self._values, self._saved, self._published, self._memo):
+                    store.pop(pid, None)
+
+    def publish(self):
+        """Sends changed runtime values to the live cache (unchanged ones are refreshed before they expire)."""
+        now = time.time()
+        refresh_after = self.publish_ttl / 3
+        pending = {}
+        for pid, values in self._values.items():
+            last = self._published.get(pid)
+            if last is None or last[0] != values or now - last[1] >= refresh_after:
+                pending[pid] = values
+        if pending and live_set_many({RUNTIME_KEY.format(pid): v for pid, v in pending.items()}, self.publish_ttl):
+            for pid, values in pending.items():
+                self._published[pid] = (values, now)
+
+    def checkpoint(self, force=False):
+        """Persists changed programs if the interval elapsed. Returns the number written."""
+        now = time.time()
+        if not force and now - self._last_checkpoint < self.checkpoint_interval:
+            return 0
+        self._last_checkpoint = now
+        return self._write(self._state)
+
+    def _write(self, program_ids):
+        changed = []
+        fingerprints = {}
+        for pid in program_ids:
+            values, state = self._values.get(pid, {}), self._state.get(pid, {})
+            fingerprint = _fingerprint(values, state)
+            if fingerprint != self._saved.get(pid):
+                changed.append(FBDProgram(id=pid, runtime_values=values, runtime_state=state))
+                fingerprints[pid] = fingerprint
+        if changed:
+            # Only the runtime columns; updated_at stays the diagram's edit time
+            FBDProgram.objects.bulk_update(changed, ['runtime_values', 'runtime_state'])
+            self._saved.update(fingerprints)
+            self.checkpoints += len(changed)
+        return len(changed)
@@ -0,0 +1,110 @@
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Cycle period (seconds) of the cyclic task classes; override with settings.FBD_TASK_PERIODS
+DEFAULT_TASK_PERIODS = {'FAST': 0.02, 'NORMAL': 0.1, 'SLOW': 1.0}
+
+# Order in which due programs run within an engine tick
+TASK_PRIORITY = ('FAST', 'EVENT', 'NORMAL', 'SLOW')
+
+
+def task_periods():
+    periods = dict(DEFAULT_TASK_PERIODS)
+    periods.update(getattr(settings, 'FBD_TASK_PERIODS', {}))
+    return periods
+
+
+class TaskScheduler:
+    """
+    IEC 61131-style task classes of the FBD programs (FBDProgram.task_class).
+
+    FAST, NORMAL and SLOW programs run cyclically at their class period. The programs of a
+    class are spread over its period (the phase follows the program id), so the slow
+    ones do not all land on the same engine tick. EVENT programs run when a point they
+    read changed (see `trigger()`) and once when they start. `due()` lists what should
+    run now by priority; a program only moves to its next period once `ran()` is called,
+    so a program the engine defers stays due. A cyclic program that starts a full period
+    late (it missed a cycle) counts as an overrun of its class.
+    """
+    def __init__(self, periods=None):
+        self.periods = periods or task_periods()
+        # Engine tick: the fastest period
+        self.tick = min(self.periods.values())
+        self._class = {}      # program_id: task class
+        self._next = {}       # program_id: next start time (cyclic classes)
+        self._triggers = {}   # program_id: point ids (EVENT class)
+        self._events = set()  # EVENT programs waiting to run
+        self.stats = {task_class: {'runs': 0, 'overruns': 0, 'max_late_ms': 0.0}
+                      for task_class in TASK_PRIORITY}
+
+    def __len__(self):
+        return len(self._class)
+
+    def sync(self, programs, point_ids, now):
+        """Follows the active programs; `point_ids` maps program id to the points it reads."""
+        seen = set()
+        for program in programs:
+            pid = program.id
+            seen.add(pid)
+            task_class = program.task_class
+            if task_class != 'EVENT' and task_class not in self.periods:
+                task_class = 'NORMAL'
+            if task_class == 'EVENT':
+                self._triggers[pid] = point_ids.get(pid, set())
+            if self._class.get(pid) == task_class:
+                continue
+            self._class[pid] = task_class
+            self._next.pop(pid, None)
+            self._events.discard(pid)
+            if task_class == 'EVENT':
+                self._events.add(pid)
+            else:
+                slots = max(1, round(self.periods[task_class] / self.tick))
+                self._next[pid] = now + (pid % slots) * self.tick
+        for pid in set(self._class) - seen:
+            del self._class[pid]
+            self._next.pop(pid, None)
+            self._triggers.pop(pid, None)
+            self._events.discard(pid)
+
+    def trigger(self, changed_point_ids):
+        """Marks the EVENT programs reading any of the changed points as due."""
+        if not changed_point_ids:
+            return
+        for pid, points in self._triggers.items():
+            if not points.isdisjoint(changed_point_ids):
+                self._events.add(pid)
+
+    def due(self, now):
+        """[(task class, program id)] to run now, highest priority and most overdue first."""
+        due = [(self._class[pid], start, pid) for pid, start in self._next.items() if start <= now]
+        due.extend(('EVENT', now, pid) for pid in self._events)
+        due.sort(key=lambda item: (TASK_PRIORITY.index(item[0]), item[1]))
+        return [(task_class, pid) for task_class, _start, pid in due]
+
+    def ran(self, program_id, now):
+        """Advances a program that just started running to its next period."""
+        task_class = self._class.get(program_id)
+        if task_class is None:
+            return
+        stats = self.stats[task_class]
+        stats['runs'] += 1
+        if task_class == 'EVENT':
+            self._events.discard(program_id)
+            return
+        period = self.periods[task_class]
+        start = self._next[program_id]
+        late = now - start
+        stats['max_late_ms'] = max(stats['max_late_ms'], late * 1000)
+        if late >= period:
+            # Missed cycles are dropped, not caught up
+            stats['overruns'] += 1
+            self._next[program_id] = now + period
+        else:
+            self._next[program_id] = start + period
+
+    def next_start(self):
+        """Earliest time a cyclic program is due (None if there are none)."""
+        return min(self._next.values()) if self._next else None
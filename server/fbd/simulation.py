@@ -0,0 +1,172 @@
+import time
+import random
+from types import SimpleNamespace
+from .executor import ExecutionPlan, FBDExecutor, SINK_SUFFIXES
+
+
+class SimulationIO:
+    """Point values of the input sequence; output writes are recorded, never stored."""
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.writes = {}
+
+    @staticmethod
+    def _key(point_id):
+        try:
+            return int(point_id)
+        except (TypeError, ValueError):
+            return None
+
+    def read(self, point_id):
+        return self.values.get(self._key(point_id))
+
+    def write(self, point_id, value):
+        point_id = self._key(point_id)
+        if point_id is not None:
+            self.writes[point_id] = value
+
+
+def load_sequence(data):
+    """
+    Recorded inputs as {cycle: {point_id: value}}. Accepts a list of frames
+    [{'cycle': 0, 'values': {'12': 1.5}}, ...] or per-point series {'12': [v0, v1, ...]}.
+    A value holds until the next frame that sets the point.
+    """
+    sequence = {}
+    if isinstance(data, dict):
+        for point_id, series in data.items():
+            for cycle, value in enumerate(series):
+                sequence.setdefault(cycle, {})[int(point_id)] = value
+    else:
+        for frame in data:
+            values = sequence.setdefault(int(frame.get('cycle', 0)), {})
+            values.update({int(k): v for k, v in frame.get('values', {}).items()})
+    return sequence
+
+
+class Simulation:
+    """
+    Runs a diagram offline on virtual time: cycle n executes at n * cycle_ms, so timers
+    (TON/TOF/TP) behave as in the engine but N cycles take only the CPU time they need.
+
+    Inputs come from `initial` values, a recorded `sequence` (see load_sequence) and/or
+    synthetic changes: each input point changes with probability `change` per cycle.
+    `run()` measures the program in its execution mode, then replays the same inputs
+    through the interpreter with timed evaluators for the per-block-type cost.
+    """
+    def __init__(self, diagram, mode='INTERPRETED', name='simulation', cycle_ms=100,
+                 initial=None, sequence=None, change=0.0, seed=1, runtime_state=None, prune=False):
+        self.diagram = diagram
+        self.mode = mode
+        self.name = name
+        self.cycle_ms = cycle_ms
+        self.initial = initial or {}
+        self.sequence = sequence or {}
+        self.change = change
+        self.seed = seed
+        # Block state only: the engine's wall-clock timestamps mean nothing on virtual time
+        self.runtime_state = {k: v for k, v in (runtime_state or {}).items() if not k.startswith('_')}
+        self.plan = ExecutionPlan(diagram, name, mode, prune=prune)
+
+    def _inputs(self, cycles):
+        """Point values per cycle, generated up front so every pass sees the same inputs."""
+        rng = random.Random(self.seed)
+        digital = set()
+        for node_id, node, *_rest in self.plan.steps:
+            if node.get('type') == 'DIGITAL_IN':
+                digital.add(SimulationIO._key(node.get('params', {}).get('pointId')))
+        values = dict(self.initial)
+        frames = []
+        for cycle in range(cycles):
+            values.update(self.sequence.get(cycle, {}))
+            if self.change:
+                for point_id in sorted(self.plan.input_point_ids):
+                    if rng.random() < self.change:
+                        values[point_id] = (not values.get(point_id)) if point_id in digital else round(rng.uniform(0, 100), 3)
+            frames.append(dict(values))
+        return frames
+
+    def _execute(self, plan, frames, trace=None):
+        program = SimpleNamespace(id=0, name=self.name, bindings={}, diagram_json=None,
+                                  runtime_state=dict(self.runtime_state), runtime_values={})
+        io = SimulationIO()
+        memo = {}
+        node_values = {}
+        evaluated = 0
+        cycle_times = []
+        written = {}
+        for cycle, values in enumerate(frames):
+            io.values = values
+            io.writes = {}
+            executor = FBDExecutor(program, plan=plan, io=io, memo=memo)
+            start = time.perf_counter()
+            node_values = executor.execute_cycle(cycle * self.cycle_ms)
+            cycle_times.append(time.perf_counter() - start)
+            evaluated += executor.evaluated
+            program.runtime_state = executor.runtime_state
+            changed = {k: v for k, v in io.writes.items() if k not in written or written[k] != v}
+            written.update(io.writes)
+            if trace is not None and changed:
+                trace.append({'cycle': cycle, 't_ms': cycle * self.cycle_ms, 'writes': changed})
+        return node_values, program.runtime_state, written, evaluated, cycle_times
+
+    def _profile(self, frames):
+        """{block type: [evaluations, seconds]} from an interpreted replay."""
+        costs = {}
+        plan = ExecutionPlan(self.diagram, self.name, 'INTERPRETED', prune=self.plan.prune)
+
+        def timed(evaluate, cost):
+            def run(executor, node, args):
+                start = time.perf_counter()
+                try:
+                    return evaluate(executor, node, args)
+                finally:
+                    cost[0] += 1
+                    cost[1] += time.perf_counter() - start
+            return run
+
+        steps = []
+        for node_id, node, input_count, wires, evaluate, caster, type_, expected in plan.steps:
+            cost = costs.setdefault(type_, [0, 0.0])
+            steps.append((node_id, node, input_count, wires, timed(evaluate, cost), caster, type_, expected))
+        plan.steps = steps
+        self._execute(plan, frames)
+        return costs
+
+    def run(self, cycles, profile=True, trace=False):
+        """Result dict; `trace` adds the output writes that changed, per cycle."""
+        frames = self._inputs(cycles)
+        trace_list = [] if trace else None
+        node_values, state, written, evaluated, cycle_times = self._execute(self.plan, frames, trace_list)
+        elapsed = sum(cycle_times)
+
+        result = {
+            'program': self.name,
+            'mode': self.mode,
+            'blocks': len(self.plan.nodes_data),
+            'pruned': len(self.plan.pruned),
+            'folded': len(self.plan.folded),
+            'cycles': cycles,
+            'cycle_ms': self.cycle_ms,
+            'virtual_s': cycles * self.cycle_ms / 1000,
+            'elapsed_s': elapsed,
+            'cycles_per_sec': cycles / elapsed if elapsed else None,
+            'avg_cycle_ms': elapsed / cycles * 1000 if cycles else 0.0,
+            'max_cycle_ms': max(cycle_times) * 1000 if cycle_times else 0.0,
+            'evaluated_per_cycle': evaluated / cycles if cycles else 0.0,
+            # Values of the output and display blocks after the last cycle
+            'outputs': {node_id: outputs for node_id, outputs in node_values.items()
+                        if self.plan.nodes_data[node_id].get('type', '').endswith(SINK_SUFFIXES)},
+            'state': {k: v for k, v in state.items() if not k.startswith('_')},
+            'writes': written,
+        }
+        if profile:
+            costs = self._profile(frames)
+            result['block_costs'] = {
+                type_: {'count': count, 'total_ms': seconds * 1000,
+                        'avg_us': seconds / count * 1e6 if count else 0.0}
+                for type_, (count, seconds) in sorted(costs.items(), key=lambda item: -item[1][1])
+            }
+        if trace:
+            result['trace'] = trace_list
+        return result
@@ -1,3 +1,410 @@
-from django.test import TestCase
+import os
+import random
+import signal
+import time
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib.auth import get_user_model
+from unittest import skipUnless
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+from .executor import ExecutionPlan, FBDExecutor, PlanCache, flatten_outputs
+from .management.commands.bench_fbd import BaselineExecutor, Command as BenchCommand
+from .models import FBDProgram
+from .runtime import RuntimeStore
+from .scheduling import TaskScheduler
+from .simulation import Simulation, load_sequence
+from .workers import WorkerPool
+from .views import FBDProgramViewSet
 
-# Create your tests here.
+User = get_user_model()
+
+
+class MemoryIO:
+    def __init__(self, values):
+        self.values = values
+        self.points = values   # what WorkerPool checks before reading
+        self.writes = {}
+
+    def read(self, point_id):
+        return self.values.get(int(point_id))
+
+    def write(self, point_id, value):
+        self.writes[int(point_id)] = value
+
+
+def _node(node_id, type_, inputs, outputs, **params):
+    return {'id': node_id, 'type': type_, 'inputs': inputs, 'outputs': outputs, 'params': params}
+
+
+def _wire(u, v, to_port=0):
+    return {'fromNode': u, 'fromPort': 0, 'toNode': v, 'toPort': to_port}
+
+
+# in1 + c1 -> out; side branches without a sink: c2 * c3 -> neg (folded, feeds only folded
+# blocks) and in1 > c1 (live values nobody writes)
+SIDE_BRANCH_DIAGRAM = {
+    'nodes': [
+        _node('in1', 'ANALOG_IN', 0, 1, pointId=1),
+        _node('c1', 'CONST_ANA', 0, 1, value=2.0),
+        _node('add', 'ADD', 2, 1),
+        _node('out', 'ANALOG_OUT', 1, 1, pointId=2),
+        _node('c2', 'CONST_ANA', 0, 1, value=3.0),
+        _node('c3', 'CONST_ANA', 0, 1, value=4.0),
+        _node('mul', 'MUL', 2, 1),
+        _node('neg', 'NEG', 1, 1),
+        _node('gt', 'GT', 2, 1),
+    ],
+    'edges': [
+        _wire('in1', 'add'), _wire('c1', 'add', 1), _wire('add', 'out'),
+        _wire('c2', 'mul'), _wire('c3', 'mul', 1), _wire('mul', 'neg'),
+        _wire('in1', 'gt'), _wire('c1', 'gt', 1),
+    ],
+}
+
+
+class RuntimeValuesTests(SimpleTestCase):
+    def _runtime_values(self, mode, prune=False):
+        plan = ExecutionPlan(SIDE_BRANCH_DIAGRAM, 'side', mode, prune=prune)
+        program = SimpleNamespace(id=1, name='side', bindings={}, runtime_state={}, runtime_values={})
+        io = MemoryIO({1: 5.0})
+        node_values = FBDExecutor(program, plan=plan, io=io, memo={}).execute_cycle(0)
+        return flatten_outputs(node_values, plan.folded), io.writes
+
+    def test_every_block_keeps_its_runtime_value(self):
+        # What the viewer reads: '<node>_out_<port>' of every block with outputs
+        expected = {f"{node['id']}_out_{i}" for node in SIDE_BRANCH_DIAGRAM['nodes'] for i in range(node['outputs'])}
+        for mode in ('INTERPRETED', 'COMPILED', 'INCREMENTAL'):
+            with self.subTest(mode=mode):
+                values, writes = self._runtime_values(mode)
+                self.assertEqual(set(values), expected)
+                self.assertEqual(values['neg_out_0'], -12.0)
+                self.assertEqual(values['gt_out_0'], True)
+                self.assertEqual(writes, {2: 7.0})
+
+    def test_pruning_is_opt_in(self):
+        values, writes = self._runtime_values('INTERPRETED', prune=True)
+        self.assertNotIn('gt_out_0', values)
+        self.assertEqual(writes, {2: 7.0})
+
+
+# Representative diagrams for the mode equivalence test; points 1-3 are inputs
+EQUIVALENCE_DIAGRAMS = {
+    # On-delay, off-delay and pulse timers, with the preset wired from a constant or as a parameter
+    'timers': {
+        'nodes': [
+            _node('in1', 'DIGITAL_IN', 0, 1, pointId=1),
+            _node('in2', 'DIGITAL_IN', 0, 1, pointId=2),
+            _node('pt', 'CONST_ANA', 0, 1, value=300),
+            _node('ton', 'TON', 2, 2),
+            _node('tof', 'TOF', 1, 2, pt=250),
+            _node('tp', 'TP', 1, 2, pt=400),
+            _node('out1', 'DIGITAL_OUT', 1, 1, pointId=10),
+            _node('out2', 'DIGITAL_OUT', 1, 1, pointId=11),
+            _node('et', 'ANA_DISP', 1, 1),
+            _node('q', 'DIG_DISP', 1, 1),
+        ],
+        'edges': [
+            _wire('in1', 'ton'), _wire('pt', 'ton', 1), _wire('ton', 'out1'),
+            _wire('in1', 'tof'), _wire('tof', 'q'),
+            _wire('in2', 'tp'), _wire('tp', 'out2'),
+            {'fromNode': 'ton', 'fromPort': 1, 'toNode': 'et', 'toPort': 0},
+        ],
+    },
+    # Self-holding set/reset loop (there is no SR block; the wire closing the loop reads
+    # None in every mode) next to a TP pulse that latches on the rising edge
+    'latch': {
+        'nodes': [
+            _node('set', 'DIGITAL_IN', 0, 1, pointId=1),
+            _node('reset', 'DIGITAL_IN', 0, 1, pointId=2),
+            _node('not', 'NOT', 1, 1),
+            _node('or', 'OR', 2, 1),
+            _node('hold', 'AND', 2, 1),
+            _node('arm', 'AND', 2, 1),
+            _node('tp', 'TP', 1, 2, pt=200),
+            _node('out', 'DIGITAL_OUT', 1, 1, pointId=12),
+            _node('pulse', 'DIGITAL_OUT', 1, 1, pointId=13),
+        ],
+        'edges': [
+            _wire('set', 'or'), _wire('hold', 'or', 1), _wire('or', 'hold'),
+            _wire('reset', 'not'), _wire('not', 'hold', 1), _wire('or', 'out'),
+            _wire('set', 'arm'), _wire('not', 'arm', 1), _wire('arm', 'tp'), _wire('tp', 'pulse'),
+        ],
+    },
+    # Constant sub-graphs folded into an analogue chain with selection and limits
+    'folded': {
+        'nodes': [
+            _node('in3', 'ANALOG_IN', 0, 1, pointId=3),
+            _node('in1', 'DIGITAL_IN', 0, 1, pointId=1),
+            _node('gain', 'CONST_ANA', 0, 1, value=1.5),
+            _node('two', 'CONST_ANA', 0, 1, value=2.0),
+            _node('k', 'MUL', 2, 1),
+            _node('scaled', 'MUL', 2, 1),
+            _node('lo', 'CONST_ANA', 0, 1, value=10.0),
+            _node('hi', 'CONST_ANA', 0, 1, value=200.0),
+            _node('limit', 'LIMIT', 3, 1),
+            _node('sel', 'SEL', 3, 1),
+            _node('out', 'ANALOG_OUT', 1, 1, pointId=14),
+        ],
+        'edges': [
+            _wire('gain', 'k'), _wire('two', 'k', 1), _wire('in3', 'scaled'), _wire('k', 'scaled', 1),
+            _wire('lo', 'limit'), _wire('scaled', 'limit', 1), _wire('hi', 'limit', 2),
+            _wire('in1', 'sel'), _wire('lo', 'sel', 1), _wire('limit', 'sel', 2), _wire('sel', 'out'),
+        ],
+    },
+    # Live chain plus side branches that pruning removes
+    'side_branches': SIDE_BRANCH_DIAGRAM,
+}
+
+
+class ModeEquivalenceTests(SimpleTestCase):
+    MODES = ('INTERPRETED', 'COMPILED', 'INCREMENTAL')
+
+    def _inputs(self, cycles):
+        """(now_ms, point values) per cycle: uneven time steps, inputs that often hold still."""
+        rng = random.Random(7)
+        values = {1: False, 2: False, 3: 20.0}
+        now_ms, frames = 0, []
+        for _ in range(cycles):
+            now_ms += rng.choice((10, 50, 100, 100, 100, 250, 400))
+            for point_id in (1, 2):
+                if rng.random() < 0.2:
+                    values[point_id] = not values[point_id]
+            if rng.random() < 0.3:
+                values[3] = round(rng.uniform(0, 150), 2)
+            frames.append((now_ms, dict(values)))
+        return frames
+
+    def _run(self, diagram, mode, prune, frames):
+        """Runtime values, state and point values after every cycle, as the engine keeps them."""
+        plan = ExecutionPlan(diagram, 'equivalence', mode, prune=prune)
+        program = SimpleNamespace(id=1, name='equivalence', bindings={}, runtime_state={}, runtime_values={})
+        memo, points, history = {}, {}, []
+        for now_ms, values in frames:
+            io = MemoryIO(values)
+            executor = FBDExecutor(program, plan=plan, io=io, memo=memo)
+            node_values = executor.execute_cycle(now_ms)
+            if executor.changed != 0 or not program.runtime_values:
+                program.runtime_values = flatten_outputs(node_values, plan.folded)
+            program.runtime_state = executor.runtime_state
+            points.update(io.writes)
+            history.append((dict(program.runtime_values), repr(program.runtime_state), dict(points)))
+        return history
+
+    def test_all_modes_match_the_interpreter(self):
+        frames = self._inputs(200)
+        for name, diagram in EQUIVALENCE_DIAGRAMS.items():
+            for prune in (False, True):
+                expected = self._run(diagram, 'INTERPRETED', prune, frames)
+                for mode in self.MODES[1:]:
+                    with self.subTest(diagram=name, mode=mode, prune=prune):
+                        for cycle, (got, want) in enumerate(zip(self._run(diagram, mode, prune, frames), expected)):
+                            self.assertEqual(got, want, f"cycle {cycle}")
+
+
+class BenchBaselineTests(SimpleTestCase):
+    def test_baseline_dispatch_matches_the_registry(self):
+        # bench_fbd's gains are measured against this copy of the old if/elif dispatch
+        diagram = BenchCommand()._make_diagram(300, 10, random.Random(3))
+        plan = ExecutionPlan(diagram, 'bench')
+        runs = {}
+        for executor_class in (BaselineExecutor, FBDExecutor):
+            program = SimpleNamespace(id=1, name='bench', bindings={}, runtime_state={}, runtime_values={})
+            frames = random.Random(11)
+            history = []
+            for cycle in range(15):
+                io = MemoryIO({i: frames.uniform(0, 10) for i in range(10)})
+                executor = executor_class(program, plan=plan, io=io)
+                node_values = executor.execute_cycle(cycle * 100)
+                program.runtime_state = executor.runtime_state
+                history.append((flatten_outputs(node_values, plan.folded), repr(program.runtime_state)))
+            runs[executor_class] = history
+        self.assertEqual(runs[BaselineExecutor], runs[FBDExecutor])
+
+
+class PlanCacheTests(SimpleTestCase):
+    def _program(self, updated_at, diagram=SIDE_BRANCH_DIAGRAM, mode='INTERPRETED'):
+        return SimpleNamespace(id=1, name='side', updated_at=updated_at, diagram_json=diagram,
+                               execution_mode=mode, prune_unused=False)
+
+    def test_plan_is_reused_until_the_diagram_changes(self):
+        cache = PlanCache()
+        plan = cache.get(self._program(1))
+        self.assertIs(cache.get(self._program(1)), plan)
+        # Saved again (e.g. renamed) with the same diagram: the plan is kept
+        self.assertIs(cache.get(self._program(2, diagram=dict(SIDE_BRANCH_DIAGRAM))), plan)
+        self.assertEqual(cache.compiled, 1)
+
+        edited = {'nodes': SIDE_BRANCH_DIAGRAM['nodes'][:4], 'edges': SIDE_BRANCH_DIAGRAM['edges'][:3]}
+        self.assertIsNot(cache.get(self._program(3, diagram=edited)), plan)
+        self.assertEqual(cache.get(self._program(4, diagram=edited, mode='COMPILED')).mode, 'COMPILED')
+        self.assertEqual(cache.compiled, 3)
+
+    def test_retain_drops_stopped_programs(self):
+        cache = PlanCache()
+        cache.get(self._program(1))
+        cache.retain([2])
+        self.assertEqual(len(cache), 0)
+
+
+class RuntimeStoreTests(TestCase):
+    def setUp(self):
+        self.program = FBDProgram.objects.create(name='timer', runtime_values={'t1_out_0': False},
+                                                 runtime_state={'t1': {'elapsed': 200}})
+
+    def test_state_is_restored_and_only_checkpointed_when_it_changed(self):
+        store = RuntimeStore(checkpoint_interval=3600)
+        store.load([self.program.id])
+        self.assertEqual(store.state(self.program.id), {'t1': {'elapsed': 200}})
+
+        # Bookkeeping the executor rewrites every cycle is not a change
+        state = {'t1': {'elapsed': 200}, '_last_run_ms': 1000, '_delta_ms': 100}
+        store.update(self.program.id, {'t1_out_0': False}, state)
+        self.assertEqual(store.checkpoint(force=True), 0)
+
+        store.update(self.program.id, {'t1_out_0': True}, dict(state, t1={'elapsed': 500}))
+        self.assertEqual(store.checkpoint(), 0)   # interval not elapsed
+        self.assertEqual(store.checkpoint(force=True), 1)
+
+        # What an engine restart picks up
+        restarted = RuntimeStore()
+        restarted.load([self.program.id])
+        self.assertEqual(restarted.values(self.program.id), {'t1_out_0': True})
+        self.assertEqual(restarted.state(self.program.id)['t1'], {'elapsed': 500})
+
+    def test_stopped_program_is_written_and_forgotten(self):
+        store = RuntimeStore(checkpoint_interval=3600)
+        store.load([self.program.id])
+        store.update(self.program.id, {'t1_out_0': True}, {'t1': {'elapsed': 900}})
+        store.retain([])
+        self.assertNotIn(self.program.id, store)
+        self.program.refresh_from_db()
+        self.assertEqual(self.program.runtime_state, {'t1': {'elapsed': 900}})
+
+
+class TaskSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        # Whole seconds keep the arithmetic exact; the tick is the FAST period
+        self.tasks = TaskScheduler({'FAST': 1, 'NORMAL': 2, 'SLOW': 10})
+        programs = [SimpleNamespace(id=pid, task_class=task_class) for pid, task_class in
+                    ((1, 'FAST'), (2, 'NORMAL'), (3, 'NORMAL'), (4, 'SLOW'), (5, 'EVENT'))]
+        self.tasks.sync(programs, {5: {42}}, 0)
+
+    def test_due_by_priority_with_programs_spread_over_their_period(self):
+        self.assertEqual(self.tasks.due(0), [('FAST', 1), ('EVENT', 5), ('NORMAL', 2)])
+        self.assertEqual(self.tasks.due(1), [('FAST', 1), ('EVENT', 5), ('NORMAL', 2), ('NORMAL', 3)])
+
+    def test_program_stays_due_until_it_ran(self):
+        self.tasks.ran(1, 0)
+        self.tasks.ran(5, 0)
+        self.assertEqual(self.tasks.due(0.5), [('NORMAL', 2)])
+        self.assertIn(('FAST', 1), self.tasks.due(1))
+        self.assertEqual(self.tasks.next_start(), 0)
+
+    def test_event_program_runs_when_a_point_it_reads_changed(self):
+        self.tasks.ran(5, 0)
+        self.tasks.trigger({7})
+        self.assertNotIn(('EVENT', 5), self.tasks.due(0))
+        self.tasks.trigger({42})
+        self.assertIn(('EVENT', 5), self.tasks.due(0))
+
+    def test_late_start_counts_as_overrun_and_drops_missed_cycles(self):
+        self.tasks.ran(2, 0.5)
+        self.assertEqual(self.tasks.stats['NORMAL']['overruns'], 0)
+        self.tasks.ran(2, 5)   # due at 2, started three seconds late
+        self.assertEqual(self.tasks.stats['NORMAL']['overruns'], 1)
+        self.assertEqual(self.tasks.stats['NORMAL']['max_late_ms'], 3000)
+        self.assertNotIn(('NORMAL', 2), self.tasks.due(6))
+        self.assertIn(('NORMAL', 2), self.tasks.due(7))
+
+
+# Point 1 held for 500 ms switches point 2 on
+TON_DIAGRAM = {
+    'nodes': [
+        _node('in1', 'DIGITAL_IN', 0, 1, pointId=1),
+        _node('pt', 'CONST_ANA', 0, 1, value=500),
+        _node('ton', 'TON', 2, 2),
+        _node('out', 'DIGITAL_OUT', 1, 1, pointId=2),
+    ],
+    'edges': [_wire('in1', 'ton'), _wire('pt', 'ton', 1), _wire('ton', 'out')],
+}
+
+
+class SimulationTests(SimpleTestCase):
+    def test_timers_run_on_virtual_time(self):
+        sequence = load_sequence([{'cycle': 2, 'values': {'1': True}}, {'cycle': 20, 'values': {'1': False}}])
+        result = Simulation(TON_DIAGRAM, cycle_ms=100, initial={1: False}, sequence=sequence).run(
+            600, profile=False, trace=True)
+        # Input on at 200 ms; TON counts the 100 ms of the cycle it first sees it, so 500 ms are up at 600 ms
+        self.assertEqual(result['trace'], [
+            {'cycle': 0, 't_ms': 0, 'writes': {2: False}},
+            {'cycle': 6, 't_ms': 600, 'writes': {2: True}},
+            {'cycle': 20, 't_ms': 2000, 'writes': {2: False}},
+        ])
+        self.assertEqual(result['virtual_s'], 60)
+        self.assertLess(result['elapsed_s'], result['virtual_s'])
+
+    def test_per_point_series_hold_their_last_value(self):
+        self.assertEqual(load_sequence({'1': [True, False], '2': [3.5]}),
+                         {0: {1: True, 2: 3.5}, 1: {1: False}})
+
+
+class WorkerPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = WorkerPool(2)
+        self.addCleanup(self.pool.close)
+        self.plan = ExecutionPlan(SIDE_BRANCH_DIAGRAM, 'side')
+        self.batch = [(SimpleNamespace(id=pid), self.plan) for pid in (1, 2)]
+
+    def _run(self, now_ms=0):
+        return self.pool.run(self.batch, MemoryIO({1: 5.0, 2: 0.0}), RuntimeStore(), now_ms)
+
+    def test_results_match_a_run_in_the_engine_process(self):
+        results = self._run()
+        self.assertEqual(set(results), {1, 2})
+        values, _state, writes, _changed = results[1]
+        self.assertEqual(values['add_out_0'], 7.0)
+        self.assertEqual(writes, {2: 7.0})
+
+    def test_dead_worker_is_restarted_with_its_programs(self):
+        self._run()
+        process, _conn = self.pool._workers[1]
+        process.kill()
+        process.join(5)
+        results = self._run(now_ms=100)
+        self.assertEqual(results[1][2], {2: 7.0})
+        self.assertEqual(self.pool.stats[1]['restarts'], 1)
+
+    @skipUnless(hasattr(signal, 'SIGSTOP'), "needs SIGSTOP to stall a worker")
+    def test_stalled_workers_share_one_deadline(self):
+        self.pool.timeout = 0.5
+        self._run()
+        for process, _conn in self.pool._workers:
+            os.kill(process.pid, signal.SIGSTOP)
+        start = time.monotonic()
+        self.assertEqual(self._run(now_ms=100), {})
+        # Both workers missed the same deadline instead of one timeout each
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual([w['restarts'] for w in self.pool.stats], [1, 1])
+
+    @skipUnless(hasattr(signal, 'SIGSTOP'), "needs SIGSTOP to stall a worker")
+    def test_only_the_stalled_worker_is_restarted(self):
+        self.pool.timeout = 0.5
+        self._run()
+        os.kill(self.pool._workers[1][0].pid, signal.SIGSTOP)
+        results = self._run(now_ms=100)
+        # Program 2 runs on worker 0, program 1 on the stalled worker 1
+        self.assertEqual(set(results), {2})
+        self.assertEqual([w['restarts'] for w in self.pool.stats], [0, 1])
+        self.assertEqual(set(self._run(now_ms=200)), {1, 2})
+
+
+class RuntimeEndpointTests(TestCase):
+    def test_live_values_are_not_served_for_unknown_programs(self):
+        request = APIRequestFactory().get('/api/fbd/programs/999/runtime/')
+        force_authenticate(request, user=User.objects.create_user('viewer'))
+        view = FBDProgramViewSet.as_view({'get': 'runtime'})
+        with mock.patch('fbd.views.live_runtime_values', return_value={'n1_out_0': 1}) as live:
+            response = view(request, pk='999')
+        self.assertEqual(response.status_code, 404)
+        live.assert_not_called()
@@ -1,8 +1,11 @@
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.generics import get_object_or_404
 from .models import FBDProgram
 from .serializers import FBDProgramSerializer
+from .runtime import live_runtime_values
+from .executor import ExecutionPlan
 from helper.viewsets import BaseDuplicateViewSet
 
 class FBDProgramViewSet(BaseDuplicateViewSet):
@@ -20,6 +23,19 @@ class FBDProgramViewSet(BaseDuplicateViewSet):
 
     @action(detail=True, methods=['get'])
     def runtime(self, request, pk=None):
+        # Lookup and permission checks as get_object(), without loading the diagram
+        queryset = self.filter_queryset(self.get_queryset()).defer('diagram_json', 'runtime_state')
+        program = get_object_or_404(queryset, pk=pk)
+        self.check_object_permissions(request, program)
+        # The engine's live copy; the last checkpoint when the engine is not publishing
+        values = live_runtime_values(program.id)
+        if values is None:
+            values = program.runtime_values or {}
+        return Response({'status': 'ok', 'values': values})
+
+    @action(detail=True, methods=['get'])
+    def plan(self, request, pk=None):
+        # Blocks the engine prunes or precomputes for the saved diagram
         program = self.get_object()
-        # Return the latest persisted values calculated by the background worker
-        return Response({'status': 'ok', 'values': program.runtime_values or {}})
+        plan = ExecutionPlan(program.diagram_json, program.name, prune=program.prune_unused)
+        return Response({'status': 'ok', 'execution_mode': program.execution_mode, **plan.summary()})
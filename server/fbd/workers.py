@@ -0,0 +1,232 @@
+import time
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+from .executor import ExecutionPlan, FBDExecutor, flatten_outputs, plan_diagram
+
+logger = logging.getLogger(__name__)
+
+# Nothing in this module may import Django: workers are plain Python processes.
+
+
+class _Program:
+    """What FBDExecutor needs of an FBDProgram, held by the worker."""
+    def __init__(self, program_id):
+        self.id = program_id
+        self.name = ''
+        self.bindings = {}
+        self.runtime_state = {}
+        self.runtime_values = {}
+        self.plan = None
+        self.memo = {}
+
+
+class SnapshotIO:
+    """Point values of one cycle as sent by the engine; writes are collected per program."""
+    def __init__(self, values):
+        self.values = values
+        self.writes = {}
+
+    @staticmethod
+    def _key(point_id):
+        try:
+            return int(point_id)
+        except (TypeError, ValueError):
+            return None
+
+    def read(self, point_id):
+        return self.values.get(self._key(point_id))
+
+    def write(self, point_id, value):
+        point_id = self._key(point_id)
+        if point_id in self.values:
+            self.writes[point_id] = value
+
+
+def worker_main(conn):
+    """
+    Worker loop. Messages from the engine:
+      ('plan', program_id, name, mode, prune, diagram)   build / replace a program's plan
+      ('state', program_id, runtime_state, runtime_values) take over a program's state
+      ('drop', program_id)                               forget a program
+      ('run', now_ms, point_values, program_ids)         run one cycle, reply ('done', results, seconds)
+      ('stop',)
+    results: {program_id: (runtime_values, runtime_state, writes, changed)}.
+    """
+    programs = {}
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        kind = message[0]
+
+        if kind == 'plan':
+            _kind, program_id, name, mode, prune, diagram = message
+            program = programs.setdefault(program_id, _Program(program_id))
+            program.name = name
+            program.plan = ExecutionPlan(diagram, name, mode, prune=prune)
+            program.memo = {}
+
+        elif kind == 'state':
+            _kind, program_id, runtime_state, runtime_values = message
+            program = programs.setdefault(program_id, _Program(program_id))
+            program.runtime_state = runtime_state or {}
+            program.runtime_values = runtime_values or {}
+
+        elif kind == 'drop':
+            programs.pop(message[1], None)
+
+        elif kind == 'run':
+            _kind, now_ms, point_values, program_ids = message
+            start = time.perf_counter()
+            results = {}
+            for program_id in program_ids:
+                program = programs.get(program_id)
+                if program is None or program.plan is None:
+                    continue
+                io = SnapshotIO(point_values)
+                try:
+                    executor = FBDExecutor(program, plan=program.plan, io=io, memo=program.memo)
+                    node_values = executor.execute_cycle(now_ms)
+                    if executor.changed != 0 or not program.runtime_values:
+                        program.runtime_values = flatten_outputs(node_values, program.plan.folded)
+                    program.runtime_state = executor.runtime_state
+                    results[program_id] = (program.runtime_values, program.runtime_state, io.writes, executor.changed)
+                except Exception as e:
+                    logger.error(f"Error executing FBD {program.name}: {e}")
+            conn.send(('done', results, time.perf_counter() - start))
+
+        elif kind == 'stop':
+            break
+
+
+class WorkerPool:
+    """
+    FBD programs spread over worker processes, one core each.
+
+    A program always runs on the same worker (program id modulo the pool size), which
+    keeps its plan, timer state and incremental cache resident. Per cycle the engine
+    sends each worker the point values its programs read and gets back their runtime
+    values, state and output writes; the engine applies the writes in program order, so
+    the result is the same as running the programs one after another. The workers are
+    awaited together against one `timeout` deadline per cycle; a worker that dies or
+    misses it is restarted and its programs re-sent, the others' results are kept.
+    """
+    def __init__(self, size, timeout=5.0):
+        self.size = size
+        self.timeout = timeout
+        # Spawned, not forked: workers never share the engine's database connections
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = [None] * size   # (process, connection)
+        self._sent = [{} for _ in range(size)]   # per worker: program_id -> plan sent
+        self.stats = [{'cycles': 0, 'last_ms': 0.0, 'max_ms': 0.0, 'restarts': 0} for _ in range(size)]
+
+    def _connection(self, index):
+        worker = self._workers[index]
+        if worker is None or not worker[0].is_alive():
+            if worker is not None:
+                self.stats[index]['restarts'] += 1
+                logger.error(f"FBD worker {index} died, restarting")
+            parent_conn, child_conn = self._context.Pipe()
+            process = self._context.Process(target=worker_main, args=(child_conn,),
+                                            name=f"fbd-worker-{index}", daemon=True)
+            process.start()
+            child_conn.close()
+            self._workers[index] = (process, parent_conn)
+            self._sent[index] = {}
+        return self._workers[index][1]
+
+    def _kill(self, index):
+        worker = self._workers[index]
+        if worker is not None:
+            worker[0].kill()
+            worker[0].join(1)
+            worker[1].close()
+        self._workers[index] = None
+        self._sent[index] = {}
+        self.stats[index]['restarts'] += 1
+
+    def run(self, batch, io, runtime, now_ms):
+        """
+        Runs [(program, plan)] for one cycle. `io` is the cycle's PointIO (prefetched),
+        `runtime` the RuntimeStore that seeds programs new to a worker.
+        Returns {program_id: (runtime_values, runtime_state, writes, changed)}.
+        """
+        assigned = {}
+        for program, plan in batch:
+            assigned.setdefault(program.id % self.size, []).append((program, plan))
+
+        pending = {}
+        for index, items in assigned.items():
+            try:
+                conn = self._connection(index)
+                sent = self._sent[index]
+                point_ids = set()
+                for program, plan in items:
+                    if program.id not in sent:
+                        conn.send(('state', program.id, runtime.state(program.id), runtime.values(program.id)))
+                    if sent.get(program.id) is not plan:
+                        conn.send(('plan', program.id, plan.name, plan.mode, plan.prune, plan_diagram(plan)))
+                        sent[program.id] = plan
+                    point_ids |= plan.point_ids
+                values = {point_id: io.read(point_id) for point_id in point_ids if point_id in io.points}
+                conn.send(('run', now_ms, values, [program.id for program, _plan in items]))
+                pending[index] = conn
+            except (OSError, EOFError) as e:
+                logger.error(f"FBD worker {index} unreachable: {e}")
+                self._kill(index)
+
+        results = {}
+        waiting = {conn: index for index, conn in pending.items()}
+        deadline = time.monotonic() + self.timeout
+        while waiting:
+            ready = wait(list(waiting), max(0.0, deadline - time.monotonic()))
+            if not ready:
+                break
+            for conn in ready:
+                index = waiting.pop(conn)
+                try:
+                    _kind, worker_results, elapsed = conn.recv()
+                except (OSError, EOFError) as e:
+                    logger.error(f"FBD worker {index} failed: {e}")
+                    self._kill(index)
+                    continue
+                results.update(worker_results)
+                stats = self.stats[index]
+                stats['cycles'] += 1
+                stats['last_ms'] = elapsed * 1000
+                stats['max_ms'] = max(stats['max_ms'], stats['last_ms'])
+
+        # Only the workers that missed the deadline are restarted
+        for index in waiting.values():
+            logger.error(f"FBD worker {index} failed: no reply within {self.timeout}s")
+            self._kill(index)
+        return results
+
+    def retain(self, program_ids):
+        """Drops programs that stopped running from their worker."""
+        program_ids = set(program_ids)
+        for index, sent in enumerate(self._sent):
+            gone = set(sent) - program_ids
+            if not gone or self._workers[index] is None:
+                continue
+            try:
+                for program_id in gone:
+                    self._workers[index][1].send(('drop', program_id))
+                    del sent[program_id]
+            except (OSError, EOFError):
+                self._kill(index)
+
+    def close(self):
+        for index, worker in enumerate(self._workers):
+            if worker is None:
+                continue
+            try:
+                worker[1].send(('stop',))
+            except (OSError, EOFError):
+                pass
+            worker[0].join(1)
+            if worker[0].is_alive():
+                worker[0].kill()
+            self._workers[index] = None
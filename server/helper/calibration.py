@@ -0,0 +1,184 @@
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # Optional: the engine falls back to the scalar path
+    np = None
+
+logger = logging.getLogger(__name__)
+
+ANALOGUE_TYPES = ('Integer', 'Float', 'Real')
+
+# Below this size packing the arrays costs more than it saves
+MIN_BATCH = 64
+
+# 10**n is exact in float64 up to here; beyond it rounding is left to Python
+MAX_VECTOR_DECIMALS = 15
+
+
+def is_available():
+    return np is not None
+
+
+def _is_batchable(point):
+    """Configuration-only check; runtime state (forced, register errors) is handled by PointProcessor."""
+    return (
+        point.point_type == 'REGISTER'
+        and point.data_type in ANALOGUE_TYPES
+        and point.register is not None
+        and point.gain is not None
+        and point.offset is not None
+    )
+
+
+class CalibrationTable:
+    """
+    Vectorized equivalent of PointProcessor._resolve_register_value for analogue points.
+
+    Per-point coefficients (gain, offset, offset_before_gain, range_*, scale_*,
+    decimal_places) are packed into NumPy arrays once and kept between cycles; a row is
+    repacked when the Point instance changes (the engine's PointCache replaces instances
+    on every configuration edit). Each cycle then only parses the raw register values.
+
+    Results match the scalar path exactly: the arithmetic runs in the same order, and
+    rounding is only vectorized where the decimal result is provably the one Python's
+    round() gives; the few ambiguous elements are rounded by Python.
+    """
+    def __init__(self):
+        self._rows = {}      # point_id: (row, Point); row is None for points that are not batchable
+        self._coeffs = {name: [] for name in (
+            'gain', 'offset', 'before', 'r_min', 'r_max', 's_min', 's_max', 'has_scale', 'decimals', 'is_int')}
+        self._arrays = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def calibrate(self, points):
+        """Returns {point_id: value} for the batchable points. Returns {} when NumPy is missing."""
+        if np is None:
+            return {}
+
+        ids, rows, raws = [], [], []
+        for point in points:
+            entry = self._rows.get(point.id)
+            if entry is None or entry[1] is not point:
+                entry = self._pack(point)
+            row = entry[0]
+            if row is None:
+                continue
+            try:
+                raws.append(float(point.register.current_value or 0))
+            except (TypeError, ValueError):
+                # Let the scalar path raise as it always did
+                continue
+            ids.append(point.id)
+            rows.append(row)
+
+        if not ids:
+            return {}
+        if self._arrays is None:
+            self._arrays = {name: np.array(values, dtype=bool if name in ('before', 'has_scale', 'is_int') else np.float64)
+                            for name, values in self._coeffs.items()}
+
+        a = self._arrays
+        idx = np.array(rows, dtype=np.intp)
+        raw = np.array(raws, dtype=np.float64)
+        gain, offset = a['gain'][idx], a['offset'][idx]
+        r_min, r_max = a['r_min'][idx], a['r_max'][idx]
+        s_min, s_max = a['s_min'][idx], a['s_max'][idx]
+
+        # Same operation order as the scalar path so every element rounds identically
+        with np.errstate(all='ignore'):
+            cal = np.where(a['before'][idx], (raw + offset) * gain, (raw * gain) + offset)
+            r_span = r_max - r_min
+            s_span = s_max - s_min
+            scaled = s_min + (cal - r_min) * (s_span / r_span)
+            val = np.where(a['has_scale'][idx] & (r_span != 0), scaled, cal)
+            return self._round(ids, val, a['decimals'][idx], a['is_int'][idx])
+
+    def _round(self, ids, val, decimals, is_int):
+        result = {}
+        id_array = np.array(ids)
+        finite = np.isfinite(val)
+
+        # Integer points: int() truncates toward zero
+        int_mask = is_int & finite & (np.abs(val) < 2.0 ** 62)
+        sel = np.flatnonzero(int_mask)
+        result.update(zip(id_array[sel].tolist(), np.trunc(val[sel]).astype(np.int64).tolist()))
+
+        # round(v, n): for p = v * 10**n, rint(p) / 10**n equals Python's correctly rounded
+        # result unless p sits within an ulp of a .5 boundary (or is huge)
+        float_rows = ~is_int & finite & ~np.isnan(decimals) & (decimals <= MAX_VECTOR_DECIMALS)
+        scale = np.power(10.0, np.where(float_rows, decimals, 0.0))
+        p = val * scale
+        frac = p - np.floor(p)
+        safe = float_rows & (np.abs(p) < 2.0 ** 52) & (np.abs(frac - 0.5) > 2 * np.spacing(np.abs(p)))
+        sel = np.flatnonzero(safe)
+        result.update(zip(id_array[sel].tolist(), (np.rint(p[sel]) / scale[sel]).tolist()))
+
+        # Everything else goes through Python exactly like the scalar path
+        for i in np.flatnonzero(~int_mask & ~safe).tolist():
+            v, d = float(val[i]), decimals[i]
+            try:
+                if is_int[i]:
+                    result[ids[i]] = int(v)
+                else:
+                    result[ids[i]] = round(v, None if np.isnan(d) else int(d))
+            except (ValueError, OverflowError):
+                # nan/inf: the scalar path raises for these
+                continue
+        return result
+
+    def _pack(self, point):
+        if not _is_batchable(point):
+            entry = (None, point)
+            self._rows[point.id] = entry
+            return entry
+
+        nan = float('nan')
+        values = {
+            'gain': point.gain,
+            'offset': point.offset,
+            'before': bool(point.offset_before_gain),
+            'r_min': nan if point.range_min is None else point.range_min,
+            'r_max': nan if point.range_max is None else point.range_max,
+            's_min': nan if point.scale_min is None else point.scale_min,
+            's_max': nan if point.scale_max is None else point.scale_max,
+            'has_scale': (point.range_min is not None and point.range_max is not None and
+                          point.scale_min is not None and point.scale_max is not None),
+            'decimals': nan if point.decimal_places is None else point.decimal_places,
+            'is_int': point.data_type == 'Integer',
+        }
+
+        old = self._rows.get(point.id)
+        row = old[0] if old is not None and old[0] is not None else len(self._coeffs['gain'])
+        for name, value in values.items():
+            column = self._coeffs[name]
+            if row == len(column):
+                column.append(value)
+            else:
+                column[row] = value
+
+        entry = (row, point)
+        self._rows[point.id] = entry
+        self._arrays = None
+        return entry
+
+    def retain(self, point_ids):
+        """Drops the rows of points that are no longer polled (deleted or deactivated)."""
+        gone = self._rows.keys() - point_ids
+        if not gone:
+            return
+        for point_id in gone:
+            del self._rows[point_id]
+        # Repacked so the coefficient arrays shrink with the table
+        columns = self._coeffs
+        self._coeffs = {name: [] for name in columns}
+        for point_id, (row, point) in self._rows.items():
+            if row is None:
+                continue
+            new_row = len(self._coeffs['gain'])
+            for name, column in columns.items():
+                self._coeffs[name].append(column[row])
+            self._rows[point_id] = (new_row, point)
+        self._arrays = None
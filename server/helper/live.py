@@ -0,0 +1,116 @@
+import time
+import logging
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Bumped (after commit) by every writer of Point values; readers use it as a cheap
+# "something changed" signal before they query the database.
+VALUES_NOTICE_KEY = 'points:values_notice'
+
+# Bumped (after commit) when alarms are acknowledged or cleared through the API; the
+# engine reloads its active-alarm index (helper.processors) when it moves.
+ALARMS_NOTICE_KEY = 'alarms:notice'
+
+# After a failure the live cache is left alone for this long, so a missing Redis
+# does not cost the engine a connection timeout every cycle.
+RETRY_AFTER = 5.0
+
+_down_until = 0.0
+_warned = False
+
+
+def live_cache():
+    """The shared cache (settings.CACHES['live']), or None while it is unavailable."""
+    if time.monotonic() < _down_until:
+        return None
+    return caches['live']
+
+
+def mark_unavailable(error):
+    global _down_until, _warned
+    # Warn once; readers and writers fall back to the database meanwhile
+    log = logger.debug if _warned else logger.warning
+    log(f"Live cache unavailable, retrying in {RETRY_AFTER:.0f}s: {error}")
+    _warned = True
+    _down_until = time.monotonic() + RETRY_AFTER
+
+
+def notify_values_changed():
+    """
+    Signals push subscribers that point values were written. Inside a transaction the
+    bump waits for the commit, so a woken reader never re-queries before the rows are visible.
+    """
+    transaction.on_commit(_bump_values_notice)
+
+
+def _bump_values_notice():
+    _bump(VALUES_NOTICE_KEY)
+
+
+def notify_alarms_changed():
+    """Signals the engine that alarms were changed by another process (after commit, as above)."""
+    transaction.on_commit(_bump_alarms_notice)
+
+
+def _bump_alarms_notice():
+    _bump(ALARMS_NOTICE_KEY)
+
+
+def _bump(key):
+    cache = live_cache()
+    if cache is None:
+        return
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+    except Exception as e:
+        mark_unavailable(e)
+
+
+def values_notice():
+    """Current notice counter, or None when the live cache is unavailable."""
+    return _notice(VALUES_NOTICE_KEY)
+
+
+def alarms_notice():
+    """Current alarm notice counter, or None when the live cache is unavailable."""
+    return _notice(ALARMS_NOTICE_KEY)
+
+
+def _notice(key):
+    cache = live_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(key, 0)
+    except Exception as e:
+        mark_unavailable(e)
+        return None
+
+
+def live_get(key, default=None):
+    cache = live_cache()
+    if cache is None:
+        return default
+    try:
+        return cache.get(key, default)
+    except Exception as e:
+        mark_unavailable(e)
+        return default
+
+
+def live_set_many(mapping, timeout):
+    """Returns False when the live cache is unavailable."""
+    cache = live_cache()
+    if cache is None:
+        return False
+    try:
+        cache.set_many(mapping, timeout)
+        return True
+    except Exception as e:
+        mark_unavailable(e)
+        return False
@@ -0,0 +1,133 @@
+import time
+import logging
+from django.db.models import Max
+from devices.models import Point, Register
+
+logger = logging.getLogger(__name__)
+
+
+class PointCache:
+    """
+    Resident copy of the active Points (and their Registers) used by the background engine.
+
+    Instead of reloading every point each cycle, the cache only fetches rows whose
+    `last_updated` moved past the last seen watermark. A full resync runs every
+    `resync_interval` seconds to pick up deletions and anything the watermark missed.
+
+    `refresh()` reports which points need re-evaluation: points whose configuration was
+    edited and points whose Register value/status actually moved. DATA points have no
+    change signal and are listed in `polled` instead.
+    """
+    def __init__(self, resync_interval=60.0):
+        self.resync_interval = resync_interval
+        self.points = {}        # point_id: Point (register pre-attached)
+        self.by_register = {}   # register_id: set(point_id)
+        self.polled = set()     # point_ids without a change signal (DATA points)
+        self.point_mark = None
+        self.register_mark = None
+        self._last_resync = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def refresh(self):
+        """Applies changes since the last refresh. Returns the ids of points that were (re)loaded."""
+        if self._last_resync is None or (time.time() - self._last_resync) >= self.resync_interval:
+            return self.load()
+
+        touched = set()
+
+        # 1. Point configuration edits (API saves bump Point.last_updated)
+        point_mark = self.point_mark
+        for point in self._since(Point.objects.select_related('register'), point_mark):
+            point_mark = self._later(point_mark, point.last_updated)
+            cached = self.points.get(point.id)
+            if cached is not None and cached.last_updated == point.last_updated:
+                continue
+            if point.is_active:
+                self._store(point)
+                touched.add(point.id)
+            else:
+                self._drop(point.id)
+        self.point_mark = point_mark
+
+        # 2. Register values written by SmartyService
+        register_mark = self.register_mark
+        for register in self._since(Register.objects.all(), register_mark):
+            register_mark = self._later(register_mark, register.last_updated)
+            for point_id in self.by_register.get(register.id, ()):
+                point = self.points[point_id]
+                old = point.register
+                if old is not None and old.last_updated == register.last_updated:
+                    continue
+                point.register = register
+                # A poll that only bumped the timestamp does not need re-evaluation
+                if old is None or self._register_state(old) != self._register_state(register):
+                    touched.add(point_id)
+        self.register_mark = register_mark
+
+        return touched
+
+    def load(self):
+        """Full reload of all active points. Returns the ids of points that are new or changed."""
+        # Take the watermarks first so rows written during the load are fetched again next refresh
+        point_mark = Point.objects.aggregate(m=Max('last_updated'))['m']
+        register_mark = Register.objects.aggregate(m=Max('last_updated'))['m']
+
+        previous = self.points
+        self.points = {}
+        self.by_register = {}
+        self.polled = set()
+        touched = set()
+
+        for point in Point.objects.filter(is_active=True).select_related('register'):
+            self._store(point)
+            old = previous.get(point.id)
+            if old is None or old.last_updated != point.last_updated or \
+                    self._register_state_of(old) != self._register_state_of(point):
+                touched.add(point.id)
+
+        self.point_mark = point_mark
+        self.register_mark = register_mark
+        self._last_resync = time.time()
+        logger.debug(f"PointCache resync: {len(self.points)} points, {len(touched)} changed")
+        return touched
+
+    def _store(self, point):
+        self._drop(point.id)
+        self.points[point.id] = point
+        if point.register_id is not None:
+            self.by_register.setdefault(point.register_id, set()).add(point.id)
+        if point.point_type == 'DATA':
+            self.polled.add(point.id)
+
+    def _drop(self, point_id):
+        point = self.points.pop(point_id, None)
+        self.polled.discard(point_id)
+        if point is not None and point.register_id is not None:
+            ids = self.by_register.get(point.register_id)
+            if ids is not None:
+                ids.discard(point_id)
+                if not ids:
+                    del self.by_register[point.register_id]
+
+    @staticmethod
+    def _since(queryset, mark):
+        # Boundary rows are fetched again (gte) and skipped above when nothing moved
+        return queryset.filter(last_updated__gte=mark) if mark is not None else queryset
+
+    @staticmethod
+    def _later(mark, value):
+        if mark is None or (value is not None and value > mark):
+            return value
+        return mark
+
+    @staticmethod
+    def _register_state(register):
+        """The Register fields PointProcessor depends on."""
+        return (register.current_value, register.error_status, register.error_message, register.signal_type)
+
+    @classmethod
+    def _register_state_of(cls, point):
+        register = point.register
+        return cls._register_state(register) if register is not None else None
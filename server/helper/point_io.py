@@ -0,0 +1,70 @@
+import logging
+from devices.models import Point
+from helper.processors import PointProcessor
+
+logger = logging.getLogger(__name__)
+
+
+def point_key(point_id):
+    """Bindings store point ids as ints or strings; returns the int id or None."""
+    try:
+        return int(point_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class PointIO:
+    """
+    Point reads and writes of the logic phases (FBD, scripts) batched per cycle.
+
+    `prefetch()` loads every point the cycle will touch: points already resident in
+    `source` (the engine's PointCache, values from this cycle's refresh) are used as
+    they are, the rest come from one query. Reads are side-effect free
+    (PointProcessor.peek). Writes are collected and `flush()` stores them with one
+    bulk_update of `write_value`, skipping values the point already holds.
+    """
+    def __init__(self, source=None):
+        self.source = source if source is not None else {}
+        self.points = {}
+        self.writes = {}   # point_id: value as stored in write_value
+
+    def prefetch(self, point_ids):
+        self.points = {}
+        missing = []
+        for point_id in point_ids:
+            point = self.source.get(point_id)
+            if point is not None:
+                self.points[point_id] = point
+            else:
+                missing.append(point_id)
+        if missing:
+            for point in Point.objects.filter(id__in=missing).select_related('register'):
+                self.points[point.id] = point
+
+    def read(self, point_id):
+        point = self.points.get(point_key(point_id))
+        if point is None:
+            return None
+        try:
+            return PointProcessor(point).peek()
+        except Exception as e:
+            logger.error(f"Error reading Point {point.name}: {e}")
+            return None
+
+    def write(self, point_id, value):
+        point_id = point_key(point_id)
+        if point_id in self.points:
+            self.writes[point_id] = str(value)
+
+    def flush(self):
+        """Writes the collected values that changed. Returns the number of points updated."""
+        changed = []
+        for point_id, value in self.writes.items():
+            point = self.points[point_id]
+            if point.write_value != value:
+                point.write_value = value
+                changed.append(point)
+        self.writes = {}
+        if changed:
+            Point.objects.bulk_update(changed, ['write_value'])
+        return len(changed)
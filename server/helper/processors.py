@@ -1,44 +1,186 @@
 import json
+import time
+import logging
 from django.utils import timezone
 from django.apps import apps
 from django.db.models import Sum, Avg, Count
 
+logger = logging.getLogger(__name__)
+
+# --- RECORD BUFFER ---
+
+class RecordBuffer:
+    """
+    Bounded per-cycle buffer for the Alarm/Event/Log rows raised by PointProcessor.
+
+    While installed with `set_record_buffer()`, create_alarm/create_event/create_log queue
+    unsaved instances here instead of writing them one by one. The engine calls `flush()`
+    once per cycle, which writes them with one bulk_create per model. If the queue reaches
+    `max_size` it is flushed inline (back-pressure); `stats()` exposes the counters.
+    """
+    MODELS = ('Alarm', 'Event', 'Log')
+
+    def __init__(self, max_size=5000):
+        self.max_size = max_size
+        self.pending = {name: [] for name in self.MODELS}
+        self.pending_alarms = set()  # (point_id, name) queued but not written yet
+        self.size = 0
+        # Metrics
+        self.written = 0
+        self.failed = 0
+        self.forced_flushes = 0
+        self.high_water = 0
+
+    def add(self, model_name, instance):
+        if self.size >= self.max_size:
+            self.forced_flushes += 1
+            self.flush()
+        self.pending[model_name].append(instance)
+        if model_name == 'Alarm':
+            self.pending_alarms.add((instance.point_id, instance.name))
+        self.size += 1
+        self.high_water = max(self.high_water, self.size)
+        return instance
+
+    def flush(self):
+        """Writes everything queued. Returns the number of rows written."""
+        if not self.size:
+            return 0
+        written = 0
+        for model_name in self.MODELS:
+            rows = self.pending[model_name]
+            if not rows:
+                continue
+            try:
+                apps.get_model('main', model_name).objects.bulk_create(rows)
+                written += len(rows)
+            except Exception as e:
+                self.failed += len(rows)
+                logger.error(f"RecordBuffer: failed to write {len(rows)} {model_name} rows: {e}")
+            self.pending[model_name] = []
+        self.pending_alarms.clear()
+        self.size = 0
+        self.written += written
+        return written
+
+    def stats(self):
+        return {
+            'pending': self.size,
+            'written': self.written,
+            'failed': self.failed,
+            'forced_flushes': self.forced_flushes,
+            'high_water': self.high_water,
+        }
+
+_record_buffer = None
+
+def set_record_buffer(buffer):
+    """Installs (or removes, with None) the buffer used by the create_* helpers."""
+    global _record_buffer
+    _record_buffer = buffer
+
+# --- ACTIVE ALARM INDEX ---
+
+class ActiveAlarmIndex:
+    """
+    In-memory set of (point_id, alarm name) keys of active alarms.
+
+    create_alarm uses it for duplicate suppression instead of an exists() query per check.
+    It is loaded on first use and reloaded every `resync_interval` seconds. The engine
+    also calls `follow()` every cycle with the alarm notice of helper.live, which the API
+    bumps when it acknowledges or clears alarms, so their changes count from the next cycle.
+    """
+    def __init__(self, resync_interval=30.0):
+        self.resync_interval = resync_interval
+        self.keys = set()
+        self._loaded_at = None
+        self._notice = None
+
+    def load(self):
+        Alarm = apps.get_model('main', 'Alarm')
+        keys = set(Alarm.objects.filter(is_active=True).values_list('point_id', 'name'))
+        if _record_buffer is not None:
+            # Queued alarms are not in the DB yet
+            keys |= _record_buffer.pending_alarms
+        self.keys = keys
+        self._loaded_at = time.time()
+
+    def invalidate(self):
+        """Forces a reload on next use (e.g. after a bulk update of alarms)."""
+        self._loaded_at = None
+
+    def follow(self, notice):
+        """Reloads on next use when `notice` moved since the last call (None: live cache unavailable)."""
+        if notice is not None and notice != self._notice:
+            self._notice = notice
+            self.invalidate()
+
+    def contains(self, point_id, name):
+        if self._loaded_at is None or (time.time() - self._loaded_at) >= self.resync_interval:
+            self.load()
+        return (point_id, name) in self.keys
+
+    def add(self, point_id, name):
+        self.keys.add((point_id, name))
+
+    def discard(self, point_id, name):
+        self.keys.discard((point_id, name))
+
+    def sync(self, alarm):
+        """Mirrors the state of a single alarm after it was changed."""
+        if alarm.is_active:
+            self.add(alarm.point_id, alarm.name)
+        else:
+            self.discard(alarm.point_id, alarm.name)
+
+active_alarms = ActiveAlarmIndex()
+
 # --- HELPER FUNCTIONS ---
 
 def create_alarm(point, name, description, severity='MEDIUM'):
     """Creates alarm if no active alarm for this point/reason exists."""
     Alarm = apps.get_model('main', 'Alarm')
-    exists = Alarm.objects.filter(point=point, name=name, is_active=True).exists()
-    if not exists:
-        return Alarm.objects.create(
+    if not active_alarms.contains(point.id, name):
+        alarm = Alarm(
             point=point,
             name=name,
             description=description,
             severity=severity,
             is_active=True,
         )
+        active_alarms.add(point.id, name)
+        return _save_record('Alarm', alarm)
     return None
 
 def create_event(point, event_type, description, severity='INFO'):
     """Records system events."""
     Event = apps.get_model('main', 'Event')
-    return Event.objects.create(
+    event = Event(
         point=point,
         event_type=event_type,
         description=description,
         severity=severity
     )
+    return _save_record('Event', event)
 
 def create_log(point, value, source='Point_Update'):
     """Stores historical data for future reference."""
     Log = apps.get_model('main', 'Log')
-    return Log.objects.create(
+    log = Log(
         point=point,
         source=source,
         message=f"{point.name} recorded as {value}",
         value=str(value),
         name=f"Log-{point.name}"
     )
+    return _save_record('Log', log)
+
+def _save_record(model_name, instance):
+    """Queues the record on the active buffer, or saves it straight away."""
+    if _record_buffer is not None:
+        return _record_buffer.add(model_name, instance)
+    instance.save(force_insert=True)
+    return instance
 
 # --- POINT PROCESSOR CLASS ---
 
@@ -48,9 +190,11 @@ class PointProcessor:
         self.point = point
         self.register = getattr(point, 'register', None)
 
-    def process(self, persist=True):
+    def process(self, persist=True, register_value=None):
         """
         Main logic called by the Point model property.
+        `register_value` is an already calibrated register value (see helper.calibration)
+        that replaces the scalar resolution step.
         """
         # 1. Manual Force Priority
         if self.point.is_forced:
@@ -75,7 +219,10 @@ class PointProcessor:
 
         # 3. Resolve Value based on Type
         if self.point.point_type == 'REGISTER':
-            resolved_val = self._resolve_register_value()
+            if register_value is not None:
+                resolved_val = register_value
+            else:
+                resolved_val = self._resolve_register_value()
         elif self.point.point_type == 'VARIABLE':
             resolved_val = self._cast_type(self.point.read_value)
         elif self.point.point_type == 'DATA':
@@ -94,6 +241,35 @@ class PointProcessor:
         
         return resolved_val
 
+    def peek(self):
+        """
+        Side-effect-free read used by the API: the value last computed by the engine
+        (read_value), or a resolution without persistence or alarm checks if the point
+        has never been processed.
+        """
+        if self.point.is_forced:
+            return self._handle_force_logic()
+        if self.point.read_value not in (None, ''):
+            val = self._cast_type(self.point.read_value)
+            if self.point.data_type == 'Integer' and isinstance(val, float) and val.is_integer():
+                return int(val)
+            return val
+        return self.resolve()
+
+    def resolve(self):
+        """Resolves the current value like process(), but never writes or raises alarms."""
+        if self.point.is_forced:
+            return self._handle_force_logic()
+        if self.point.point_type == 'REGISTER':
+            if self.register and self.register.error_status != 'OK':
+                return self.point.faulty_value if self.point.can_be_faulty else 0
+            return self._resolve_register_value()
+        elif self.point.point_type == 'VARIABLE':
+            return self._cast_type(self.point.read_value)
+        elif self.point.point_type == 'DATA':
+            return self._resolve_data_type_value()
+        return 0
+
     def _persist_value(self, val):
         """Updates the database so the system knows the last state."""
         self.point.read_value = str(val)
@@ -0,0 +1,110 @@
+import math
+import heapq
+
+
+class PointScheduler:
+    """
+    Scan scheduler for the engine's point phase.
+
+    `Point.frequency` is read as the scan interval in seconds (empty, zero or anything
+    faster than the engine cycle means every cycle). Points are grouped by interval and
+    each group's due time is aligned to a grid of that interval, so the min-heap only
+    holds one entry per distinct interval and all points of a group come due together.
+
+    Slow groups (interval >= `slow_threshold`) are not returned in one go: their points
+    go to a backlog drained at most `slow_batch` per cycle, so a large batch of meters
+    cannot starve the fast digital I/O. When the caller passes `needed` (the points that
+    changed or are polled), only those enter the backlog: the others would not be
+    evaluated anyway, so they are skipped at no cost and do not delay the ones that would.
+    """
+    def __init__(self, base_interval=0.1, slow_threshold=1.0, slow_batch=500):
+        self.base_interval = base_interval
+        self.slow_threshold = slow_threshold
+        self.slow_batch = slow_batch
+        self._members = {}   # point_id: interval
+        self._groups = {}    # interval: set(point_id)
+        self._heap = []      # (due, interval), one entry per scheduled group
+        self._new = set()    # point_ids due immediately (added or rescheduled)
+        self._backlog = {}   # slow point_ids that are due, in arrival order
+
+    def __len__(self):
+        return len(self._members)
+
+    @property
+    def backlog(self):
+        return len(self._backlog)
+
+    def interval_for(self, point):
+        freq = point.frequency
+        if not freq or freq < self.base_interval:
+            return self.base_interval
+        return freq
+
+    def schedule(self, point, now):
+        """Adds a point (due immediately) or moves it to a new group if its interval changed."""
+        interval = self.interval_for(point)
+        if self._members.get(point.id) == interval:
+            return
+        self.discard(point.id)
+        self._members[point.id] = interval
+        group = self._groups.get(interval)
+        if group is None:
+            group = self._groups[interval] = set()
+            heapq.heappush(self._heap, (self._next_due(interval, now), interval))
+        group.add(point.id)
+        self._new.add(point.id)
+
+    def discard(self, point_id):
+        interval = self._members.pop(point_id, None)
+        if interval is not None:
+            self._groups[interval].discard(point_id)
+        self._new.discard(point_id)
+        self._backlog.pop(point_id, None)
+
+    def pop_due(self, now, needed=None):
+        """
+        Returns the ids of points due at `now`. With `needed` (a set of point ids), slow
+        points outside it are dropped instead of queued behind the `slow_batch` cap.
+        """
+        due = set()
+        slow_threshold = self.slow_threshold
+
+        for point_id in self._new:
+            if self._members[point_id] >= slow_threshold:
+                if needed is None or point_id in needed:
+                    self._backlog[point_id] = None
+            else:
+                due.add(point_id)
+        self._new.clear()
+
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, interval = heapq.heappop(heap)
+            group = self._groups[interval]
+            if not group:
+                # Empty groups are dropped; schedule() recreates them on demand
+                del self._groups[interval]
+                continue
+            heapq.heappush(heap, (self._next_due(interval, now), interval))
+            if interval >= slow_threshold:
+                self._backlog.update(dict.fromkeys(group if needed is None else group & needed))
+            else:
+                due.update(group)
+
+        due_ids = list(due)
+        if self._backlog:
+            batch = []
+            for point_id in self._backlog:
+                if len(batch) >= self.slow_batch:
+                    break
+                batch.append(point_id)
+            for point_id in batch:
+                del self._backlog[point_id]
+            due_ids.extend(batch)
+
+        return due_ids
+
+    @staticmethod
+    def _next_due(interval, now):
+        due = (math.floor(now / interval) + 1) * interval
+        return due if due > now else due + interval
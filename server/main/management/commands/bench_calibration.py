@@ -0,0 +1,83 @@
+import time
+import random
+from django.core.management.base import BaseCommand, CommandError
+from devices.models import Point, Register
+from helper.processors import PointProcessor
+from helper import calibration
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks scalar vs vectorized calibration of analogue points (no DB access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000',
+                            help='Comma separated point counts (default: 10000,100000)')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Runs per size, best time is reported (default: 3)')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if not calibration.is_available():
+            raise CommandError("NumPy is not installed; the vectorized path is unavailable.")
+
+        rng = random.Random(options['seed'])
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+
+        for size in sizes:
+            points = [self._make_point(i, rng) for i in range(size)]
+
+            scalar_time, scalar = self._best(options['repeat'], lambda: {
+                p.id: PointProcessor(p)._resolve_register_value() for p in points
+            })
+            table = calibration.CalibrationTable()
+            start = time.perf_counter()
+            table.calibrate(points)
+            pack_time = time.perf_counter() - start
+            batch_time, batch = self._best(options['repeat'], lambda: table.calibrate(points))
+
+            mismatches = [pid for pid, val in scalar.items() if batch.get(pid) != val]
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} results differ from the scalar path (e.g. point {mismatches[0]})")
+
+            self.stdout.write(
+                f"{size} points: scalar {scalar_time * 1000:.1f} ms, "
+                f"vectorized {batch_time * 1000:.1f} ms ({scalar_time / batch_time:.1f}x, "
+                f"first pass with packing {pack_time * 1000:.1f} ms), results identical"
+            )
+
+    def _best(self, repeat, fn):
+        best, result = None, None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def _make_point(self, i, rng):
+        register = Register(
+            id=i + 1,
+            name=f"bench_{i}",
+            signal_type='Analogue',
+            current_value=str(round(rng.uniform(-1000, 30000), rng.randint(0, 4))),
+            error_status='OK',
+        )
+        scaled = rng.random() < 0.7
+        range_min = rng.choice([0.0, 4.0, -100.0])
+        scale_min = rng.uniform(-50, 50)
+        point = Point(
+            id=i + 1,
+            name=f"bench_{i}",
+            point_type='REGISTER',
+            data_type=rng.choice(['Integer', 'Float', 'Real']),
+            gain=rng.choice([1.0, 0.1, 0.01, rng.uniform(0.001, 10)]),
+            offset=rng.choice([0.0, rng.uniform(-100, 100)]),
+            offset_before_gain=rng.random() < 0.5,
+            decimal_places=rng.randint(0, 4),
+            range_min=range_min if scaled else None,
+            range_max=range_min + rng.choice([0.0, 16.0, 27648.0, rng.uniform(1, 1000)]) if scaled else None,
+            scale_min=scale_min if scaled else None,
+            scale_max=scale_min + rng.uniform(1, 500) if scaled else None,
+        )
+        point.register = register
+        return point
@@ -1,113 +1,434 @@
+import sys
 import time
+import signal
 import logging
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from devices.models import Point
+from helper.point_cache import PointCache
+from helper.scheduler import PointScheduler
+from helper import calibration
+from helper.calibration import CalibrationTable, MIN_BATCH
+from helper.live import notify_values_changed, alarms_notice
+from helper.point_io import PointIO
+from helper.processors import PointProcessor, RecordBuffer, set_record_buffer, active_alarms
 from fbd.models import FBDProgram
-from fbd.executor import FBDExecutor
-from script.models import ScriptProgram
+from fbd.executor import FBDExecutor, PlanCache, flatten_outputs
+from fbd.runtime import RuntimeStore
+from fbd.scheduling import TaskScheduler
+from fbd.workers import WorkerPool
+from script.models import ScriptProgram, ScriptBinding
 from script.executor import ScriptExecutor
+from script.compiled import script_cache
+from script.status import StatusStore
+from script.workers import ScriptPool
+from script.triggers import ScriptTriggers
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
     help = 'Runs the unified Smarty Background Engine (Points, FBD, Scripts)'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--point-resync', type=float, default=60.0,
+                            help='Seconds between full reloads of the point cache (default: 60)')
+        parser.add_argument('--full-scan', action='store_true',
+                            help='Process every due point instead of only changed ones')
+        parser.add_argument('--slow-threshold', type=float, default=1.0,
+                            help='Scan interval (s) from which points are treated as slow and batched (default: 1.0)')
+        parser.add_argument('--slow-batch', type=int, default=500,
+                            help='Maximum slow points evaluated per cycle (default: 500)')
+        parser.add_argument('--record-queue', type=int, default=5000,
+                            help='Alarms/events/logs buffered before a forced flush (default: 5000)')
+        parser.add_argument('--fbd-checkpoint', type=float, default=10.0,
+                            help='Seconds between writes of changed FBD runtime state to the DB (default: 10)')
+        parser.add_argument('--fbd-workers', type=int, default=0,
+                            help='Worker processes for FBD programs; 0 runs them in the engine process (default: 0)')
+        parser.add_argument('--script-heartbeat', type=float, default=60.0,
+                            help='Seconds after which an unchanged script status is written to the DB again (default: 60)')
+        parser.add_argument('--script-workers', type=int, default=0,
+                            help='Worker processes for scripts, with CPU/wall-time limits; 0 runs them in the engine process (default: 0)')
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS("Starting Smarty Background Engine..."))
+        self.point_cache = PointCache(resync_interval=options['point_resync'])
+        self.full_scan = options['full_scan']
+        self.scheduler = PointScheduler(
+            base_interval=0.1,
+            slow_threshold=options['slow_threshold'],
+            slow_batch=options['slow_batch'],
+        )
+        self.pending_points = set()
+        self.calibration = CalibrationTable()
+        if not calibration.is_available():
+            self.stdout.write(self.style.WARNING(
+                "NumPy is not installed: vectorized calibration is disabled, analogue points are calibrated one by one"))
+        # Parsed and sorted FBD diagrams, rebuilt only when a program is saved
+        self.fbd_plans = PlanCache()
+        self.fbd_runtime = RuntimeStore(checkpoint_interval=options['fbd_checkpoint'])
+        # FAST / NORMAL / SLOW / EVENT task classes, each at its own period
+        self.fbd_tasks = TaskScheduler()
+        self.fbd_programs = {}
+        # Script execution status lives in memory; the DB is written when it changes
+        self.script_status = StatusStore(heartbeat=options['script_heartbeat'])
+        # Scripts isolated in worker processes when requested; executors of the scripts still running
+        self.script_workers = ScriptPool(options['script_workers']) if options['script_workers'] > 0 else None
+        self.scripts_running = {}
+        # Periodic / on-change / cron scripts only run when their trigger fires
+        self.script_triggers = ScriptTriggers()
+        # Programs spread over worker processes (one core each) when requested
+        self.fbd_workers = WorkerPool(options['fbd_workers']) if options['fbd_workers'] > 0 else None
+        # Alarms, events and logs raised during a cycle are written in bulk at its end
+        self.records = RecordBuffer(max_size=options['record_queue'])
+        set_record_buffer(self.records)
+        # Duplicate suppression for alarms runs against memory, not an exists() per check
+        active_alarms.load()
+
+        # SIGTERM unwinds like Ctrl+C so the state held in memory is written out
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            self._run()
+        finally:
+            if self.fbd_workers is not None:
+                self.fbd_workers.close()
+            if self.script_workers is not None:
+                self.script_workers.close()
+            self.fbd_runtime.checkpoint(force=True)
+            self.script_status.persist(force=True)
+            self.records.flush()
+
+    def _run(self):
         cycle_count = 0
+        forced_flushes = 0
+        overruns = {}
+        next_cycle = time.time()
+        f_count, f_time = 0, 0.0
         
+        # The loop ticks at the fastest FBD task period; points, scripts and records
+        # keep their 100ms cycle, FBD programs run when their task class is due
         while True:
-            cycle_count += 1
-            start_time = time.time()
+            tick_start = time.time()
+            base_cycle = tick_start >= next_cycle
             
             try:
-                # --- Phase 1: Point Refresh (Alarms, Events, Logs) ---
-                p_start = time.time()
-                p_count = self._refresh_points()
-                p_time = time.time() - p_start
+                if base_cycle:
+                    cycle_count += 1
+                    start_time = tick_start
+                    f_count, f_time = 0, 0.0
+
+                    # --- Phase 1: Point Refresh (Alarms, Events, Logs) ---
+                    p_start = time.time()
+                    p_count = self._refresh_points()
+                    p_time = time.time() - p_start
+
+                    # Active FBD programs and their plans for this cycle's ticks
+                    self._load_fbd_programs()
                 
-                # --- Phase 2: FBD Execution ---
+                # --- Phase 2: FBD Execution (programs due in this tick) ---
                 f_start = time.time()
-                f_count = self._execute_fbd_programs()
-                f_time = time.time() - f_start
+                f_count += self._execute_fbd_programs()
+                f_time += time.time() - f_start
                 
-                # --- Phase 3: Script Execution ---
-                s_start = time.time()
-                s_count = self._execute_scripts()
-                s_time = time.time() - s_start
-                
-                if cycle_count % 10 == 0:  # Log every 10 cycles (~1 second)
-                    self.stdout.write(f"Cycle {cycle_count}: P:{p_count}({p_time:.3f}s) F:{f_count}({f_time:.3f}s) S:{s_count}({s_time:.3f}s)")
+                if base_cycle:
+                    # Live values for the API every cycle; the database only at checkpoints
+                    self.fbd_runtime.publish()
+                    self.fbd_runtime.checkpoint()
+
+                    # --- Phase 3: Script Execution ---
+                    s_start = time.time()
+                    s_count = self._execute_scripts()
+                    s_time = time.time() - s_start
+
+                    # --- Phase 4: Flush buffered Alarms, Events and Logs ---
+                    r_start = time.time()
+                    r_count = self.records.flush()
+                    r_time = time.time() - r_start
+                    
+                    if cycle_count % 10 == 0:  # Log every 10 cycles (~1 second)
+                        self.stdout.write(f"Cycle {cycle_count}: P:{p_count}({p_time:.3f}s) F:{f_count}({f_time:.3f}s) S:{s_count}({s_time:.3f}s) R:{r_count}({r_time:.3f}s)")
+                        stats = self.records.stats()
+                        if stats['forced_flushes'] > forced_flushes:
+                            self.stdout.write(self.style.WARNING(
+                                f"Record queue overflowed {stats['forced_flushes'] - forced_flushes} time(s) "
+                                f"(high water {stats['high_water']}, failed {stats['failed']})"))
+                            forced_flushes = stats['forced_flushes']
+                        for task_class, task_stats in self.fbd_tasks.stats.items():
+                            if task_stats['overruns'] > overruns.get(task_class, 0):
+                                self.stdout.write(self.style.WARNING(
+                                    f"FBD {task_class} task overran {task_stats['overruns'] - overruns.get(task_class, 0)} time(s) "
+                                    f"(max {task_stats['max_late_ms']:.0f}ms late, {task_stats['runs']} runs)"))
+                                overruns[task_class] = task_stats['overruns']
+                        if self.fbd_workers is not None:
+                            self.stdout.write("FBD workers: " + " ".join(
+                                f"#{i}:{w['last_ms']:.1f}ms(max {w['max_ms']:.1f}ms, {w['restarts']} restarts)"
+                                for i, w in enumerate(self.fbd_workers.stats)))
+                        if self.script_workers is not None:
+                            self.stdout.write("Script workers: " + " ".join(
+                                f"#{i}:{w['last_ms']:.1f}ms(max {w['max_ms']:.1f}ms, {w['timeouts']} timeouts, {w['restarts']} restarts)"
+                                for i, w in enumerate(self.script_workers.stats)))
                 
             except Exception as e:
                 logger.error(f"Engine Loop Error: {e}")
                 self.stdout.write(self.style.ERROR(f"Engine Loop Error: {e}"))
 
             # Maintain frequency (e.g., 100ms cycle)
-            elapsed = time.time() - start_time
-            sleep_time = max(0.01, 0.1 - elapsed)
-            time.sleep(sleep_time)
+            if base_cycle:
+                elapsed = time.time() - start_time
+                next_cycle = start_time + elapsed + max(0.01, 0.1 - elapsed)
+            wake_at = next_cycle
+            next_fbd = self.fbd_tasks.next_start()
+            if next_fbd is not None:
+                wake_at = min(wake_at, next_fbd)
+            time.sleep(max(0.001, wake_at - time.time()))
 
     def _refresh_points(self):
-        """Triggers PointProcessor for all active points and performs bulk updates."""
-        # Use select_related to minimize queries for registers
-        active_points = Point.objects.filter(is_active=True).select_related('register')
+        """
+        Triggers PointProcessor for due points and performs bulk updates.
+        A due point is only processed if it changed since its last scan (unless --full-scan).
+        """
+        # Alarms acknowledged or cleared through the API count from this cycle on
+        active_alarms.follow(alarms_notice())
+
+        # Only rows changed since the last cycle are fetched from the DB
+        now = time.time()
+        touched = self.point_cache.refresh()
+        points = self.point_cache.points
+
+        # New or edited points are (re)scheduled; changes wait for the point's next scan
+        for pid in touched:
+            self.scheduler.schedule(points[pid], now)
+        self.pending_points |= touched
+
+        dirty = []
+        # Slow points that did not change are skipped by the scheduler, not queued behind the batch cap
+        needed = None if self.full_scan else self.pending_points | self.point_cache.polled
+        for pid in self.scheduler.pop_due(now, needed):
+            point = points.get(pid)
+            if point is None:
+                self.scheduler.discard(pid)
+            elif self.full_scan or pid in self.pending_points or pid in self.point_cache.polled:
+                # DATA points have no change signal and are evaluated on every scan
+                dirty.append(point)
+            self.pending_points.discard(pid)
         modified_points = []
+
+        # Gain/offset/scaling of analogue points in one vectorized pass (needs NumPy)
+        self.calibration.retain(points)
+        calibrated = self.calibration.calibrate(dirty) if len(dirty) >= MIN_BATCH else {}
         
-        for point in active_points:
+        for point in dirty:
             try:
                 old_val = point.read_value
                 # Process without immediate persistence
-                from helper.processors import PointProcessor
-                PointProcessor(point).process(persist=False)
+                PointProcessor(point).process(persist=False, register_value=calibrated.get(point.id))
                 
-                # Only add to bulk update if the value changed
-                if point.read_value != old_val:
+                # Only add to bulk update if the value (or its status) changed
+                status = point.live_status
+                if point.read_value != old_val or getattr(point, '_published_status', status) != status:
                     modified_points.append(point)
+                point._published_status = status
             except Exception as e:
                 logger.error(f"Error refreshing Point {point.name}: {e}")
         
         if modified_points:
-            Point.objects.bulk_update(modified_points, ['read_value', 'last_updated'])
+            # New value versions let API clients fetch only what changed
+            stamped_at = timezone.now()
+            for point in modified_points:
+                point.stamp_value(when=stamped_at)
+            # last_updated is left alone: it is the cache watermark for configuration edits
+            Point.objects.bulk_update(modified_points, ['read_value', 'value_version', 'value_time'])
+            # Wakes the push streams (devices.streams) in the API processes
+            notify_values_changed()
+
+        # EVENT programs and ON_CHANGE scripts run when a point they read changed (or was edited)
+        changed = {point.id for point in modified_points} | touched
+        self.fbd_tasks.trigger(changed)
+        self.script_triggers.changed(changed)
             
-        return active_points.count()
+        return len(dirty)
+
+    def _load_fbd_programs(self):
+        """Loads the active FBD programs and their plans, and follows them in the task scheduler."""
+        # The diagram is only fetched when a program's plan has to be rebuilt, and the
+        # runtime columns never: values and timer state live in self.fbd_runtime
+        programs = list(FBDProgram.objects.filter(is_active=True).defer(
+            'diagram_json', 'runtime_values', 'runtime_state'))
+        program_ids = [p.id for p in programs]
+        self.fbd_plans.retain(program_ids)
+        self.fbd_runtime.retain(program_ids)
+        self.fbd_runtime.load(program_ids)
+        if self.fbd_workers is not None:
+            self.fbd_workers.retain(program_ids)
+
+        plans = {}
+        for program in programs:
+            try:
+                plans[program.id] = self.fbd_plans.get(program)
+            except Exception as e:
+                logger.error(f"Error compiling FBD {program.name}: {e}")
+        self.fbd_programs = {p.id: (p, plans[p.id]) for p in programs if p.id in plans}
+        self.fbd_tasks.sync([p for p, _plan in self.fbd_programs.values()],
+                            {pid: plan.input_point_ids for pid, (_p, plan) in self.fbd_programs.items()},
+                            time.time())
 
     def _execute_fbd_programs(self):
-        """Runs active FBD programs and performs bulk update of results."""
-        programs = list(FBDProgram.objects.filter(is_active=True))
-        modified_programs = []
+        """Runs the FBD programs due now (see fbd.scheduling) and writes their outputs in bulk."""
+        now = time.time()
+        due = [(task_class, pid) for task_class, pid in self.fbd_tasks.due(now) if pid in self.fbd_programs]
+        if not due:
+            return 0
+
+        # All bound points of the due programs in one go; outputs are written back once at the end
+        io = PointIO(self.point_cache.points)
+        io.prefetch(set().union(*(self.fbd_programs[pid][1].point_ids for _task_class, pid in due)))
+        # One time for every program of the tick
+        now_ms = now * 1000
+        if self.fbd_workers is not None:
+            count = self._run_fbd_workers(due, io, now, now_ms)
+        else:
+            count = self._run_fbd_local(due, io, now, now_ms)
         
-        for program in programs:
+        try:
+            io.flush()
+        except Exception as e:
+            logger.error(f"Error writing FBD outputs: {e}")
+            
+        return count
+
+    def _run_fbd_local(self, due, io, now, now_ms):
+        """Runs the due programs one after another in this process."""
+        count = 0
+        for task_class, pid in due:
+            if task_class != 'FAST' and count and time.time() - now >= self.fbd_tasks.tick:
+                # Tick used up: the rest stays due for the next tick so FAST programs keep their period
+                break
+            program, plan = self.fbd_programs[pid]
+            self.fbd_tasks.ran(pid, time.time())
+            count += 1
             try:
-                executor = FBDExecutor(program)
-                node_values = executor.execute_cycle()
+                # The executor reads these instead of the deferred columns
+                program.runtime_state = self.fbd_runtime.state(program.id)
+                program.runtime_values = self.fbd_runtime.values(program.id)
+                executor = FBDExecutor(program, plan=plan, io=io,
+                                       memo=self.fbd_runtime.memo(program.id))
+                node_values = executor.execute_cycle(now_ms)
                 
-                # Persist values and state
-                flattened = {}
-                for node_id, outputs in node_values.items():
-                    if outputs is not None:
-                        for i, val in enumerate(outputs):
-                            flattened[f"{node_id}_out_{i}"] = val
+                # Persist values and state (an incremental cycle that changed nothing keeps the last values)
+                if executor.changed == 0 and program.runtime_values:
+                    flattened = program.runtime_values
+                else:
+                    flattened = flatten_outputs(node_values, plan.folded)
                 
-                program.runtime_values = flattened
-                program.runtime_state = executor.runtime_state
-                modified_programs.append(program)
+                self.fbd_runtime.update(program.id, flattened, executor.runtime_state)
             except Exception as e:
                 logger.error(f"Error executing FBD {program.name}: {e}")
-        
-        if modified_programs:
-            FBDProgram.objects.bulk_update(modified_programs, ['runtime_values', 'runtime_state', 'updated_at'])
-            
-        return len(programs)
+        return count
+
+    def _run_fbd_workers(self, due, io, now, now_ms):
+        """Runs the due programs on the worker processes, all at once."""
+        for _task_class, pid in due:
+            self.fbd_tasks.ran(pid, now)
+        results = self.fbd_workers.run([self.fbd_programs[pid] for _task_class, pid in due],
+                                       io, self.fbd_runtime, now_ms)
+
+        # Writes in program order, as if the programs had run one after another
+        for _task_class, pid in due:
+            result = results.get(pid)
+            if result is None:
+                continue
+            values, state, writes, _changed = result
+            self.fbd_runtime.update(pid, values, state)
+            for point_id, value in writes.items():
+                io.write(point_id, value)
+        return len(results)
 
     def _execute_scripts(self):
-        """Runs active Script programs. Scripts currently self-persist logs, but we collect them for counting."""
-        scripts = ScriptProgram.objects.filter(is_active=True)
+        """Runs active Script programs; their execution status is kept in self.script_status."""
+        scripts = list(ScriptProgram.objects.filter(is_active=True))
+        script_ids = [script.id for script in scripts]
+        script_cache.retain(script_ids)
+        self.script_status.retain(script_ids)
+        self.script_status.load(scripts)
+        if self.script_workers is not None:
+            self.script_workers.retain(script_ids)
+            for script_id in set(self.scripts_running) - set(script_ids):
+                del self.scripts_running[script_id]
+
+        # The bindings of all scripts in one query; their points come from the point cache
+        bindings = {}
+        for binding in ScriptBinding.objects.filter(script__is_active=True):
+            bindings.setdefault(binding.script_id, []).append(binding)
+
+        # Only the scripts whose trigger fired run in this cycle
+        now, local_now = time.time(), timezone.localtime()
+        self.script_triggers.sync(scripts, {sid: {b.point_id for b in script_bindings if b.direction == 'input'}
+                                            for sid, script_bindings in bindings.items()}, now)
+        due = self.script_triggers.due(now, local_now)
+        scripts = [script for script in scripts if script.id in due]
+
+        io = PointIO(self.point_cache.points)
+        # Points of the due scripts and of those still running in a worker (their results may come back now)
+        running = set(self.scripts_running) | due
+        io.prefetch({b.point_id for sid in running for b in bindings.get(sid, [])})
+
+        if self.script_workers is not None:
+            count = self._run_script_workers(scripts, bindings, io, now, local_now)
+        else:
+            count = 0
+            for script in scripts:
+                self.script_triggers.ran(script.id, now, local_now)
+                try:
+                    executor = ScriptExecutor(script, bindings=bindings.get(script.id, []), io=io,
+                                              status_store=self.script_status)
+                    executor.execute()
+                    count += 1
+                except Exception as e:
+                    logger.error(f"Error executing Script {script.name}: {e}")
+
+        # Outputs of all scripts in one bulk_update
+        try:
+            io.flush()
+        except Exception as e:
+            logger.error(f"Error writing Script outputs: {e}")
+
+        self.script_status.publish()
+        try:
+            self.script_status.persist()
+        except Exception as e:
+            logger.error(f"Error writing Script status: {e}")
+        return count
+
+    def _run_script_workers(self, scripts, bindings, io, now, local_now):
+        """Hands the scripts to the worker processes and applies the results that are ready."""
+        pool = self.script_workers
+        jobs = []
         for script in scripts:
+            # A script still running from an earlier cycle is not queued again
+            if pool.busy(script.id):
+                continue
+            self.script_triggers.ran(script.id, now, local_now)
             try:
-                executor = ScriptExecutor(script)
-                executor.execute()
+                executor = ScriptExecutor(script, bindings=bindings.get(script.id, []), io=io,
+                                          status_store=self.script_status)
+                symbols = executor.prepare()
             except Exception as e:
                 logger.error(f"Error executing Script {script.name}: {e}")
-        return scripts.count()
+                continue
+            self.scripts_running[script.id] = executor
+            jobs.append((script.id, executor.code, symbols, list(executor.outputs),
+                         script.max_cpu_time, script.max_wall_time))
+        pool.submit(jobs)
+
+        # Slow scripts are collected on a later cycle instead of holding up FAST FBD programs
+        results = pool.collect(wait_for=self.fbd_tasks.tick)
+        for script_id, (status, logs, outputs) in results.items():
+            executor = self.scripts_running.pop(script_id, None)
+            if executor is None:
+                continue
+            # Outputs go to this cycle's points, whichever cycle the script started in
+            executor.io = io
+            try:
+                executor.finish(status, logs, outputs)
+            except Exception as e:
+                logger.error(f"Error executing Script {executor.script_program.name}: {e}")
+        return len(results)
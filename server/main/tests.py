@@ -1,3 +1,231 @@
-from django.test import TestCase
+from types import SimpleNamespace
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from devices.models import Device, Point, PointGroup, Register
+from helper import live, processors
+from helper.calibration import CalibrationTable
+from helper.point_cache import PointCache
+from helper.point_io import PointIO
+from helper.processors import ActiveAlarmIndex, PointProcessor, RecordBuffer, create_alarm, create_event, set_record_buffer
+from helper.scheduler import PointScheduler
+from .models import Event
+from .views import AlarmViewSet
 
-# Create your tests here.
+User = get_user_model()
+
+# The live cache in process memory instead of Redis
+LIVE_IN_MEMORY = {**settings.CACHES, 'live': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                              'LOCATION': 'tests-live'}}
+
+
+class PointCacheTests(TestCase):
+    def setUp(self):
+        self.group = PointGroup.objects.create(name='Plant')
+        self.cache = PointCache(resync_interval=3600)
+
+    def test_refresh_only_reloads_points_edited_since_the_watermark(self):
+        pump = Point.objects.create(name='Pump', point_group=self.group)
+        valve = Point.objects.create(name='Valve', point_group=self.group)
+        self.assertEqual(self.cache.refresh(), {pump.id, valve.id})
+        self.assertEqual(self.cache.refresh(), set())
+
+        valve.unit = '%'
+        valve.save()
+        self.assertEqual(self.cache.refresh(), {valve.id})
+        self.assertEqual(self.cache.points[valve.id].unit, '%')
+
+    def test_deactivated_point_leaves_the_cache(self):
+        pump = Point.objects.create(name='Pump', point_group=self.group)
+        self.cache.refresh()
+        pump.is_active = False
+        pump.save()
+        self.assertEqual(self.cache.refresh(), set())
+        self.assertNotIn(pump.id, self.cache.points)
+
+    def test_only_registers_whose_value_or_status_moved_touch_their_points(self):
+        device = Device.objects.create(name='PLC', slug='plc')
+        register = Register.objects.create(device=device, name='HR1', current_value='1')
+        level = Point.objects.create(name='Level', point_group=self.group, register=register)
+        self.cache.refresh()
+
+        # A poll that read the same value only bumps last_updated
+        register.save()
+        self.assertEqual(self.cache.refresh(), set())
+
+        register.current_value = '2'
+        register.save()
+        self.assertEqual(self.cache.refresh(), {level.id})
+        self.assertEqual(self.cache.points[level.id].register.current_value, '2')
+
+        register.error_status = 'COMM_ERROR'
+        register.save()
+        self.assertEqual(self.cache.refresh(), {level.id})
+
+    def test_data_points_are_polled(self):
+        data = Point.objects.create(name='Setpoint', point_group=self.group, point_type='DATA')
+        self.cache.refresh()
+        self.assertEqual(self.cache.polled, {data.id})
+
+
+class PointIOTests(TestCase):
+    def setUp(self):
+        group = PointGroup.objects.create(name='Plant')
+        self.pump, self.fan, self.valve = (
+            Point.objects.create(name=name, point_group=group, point_type='VARIABLE', read_value='1', write_value='1')
+            for name in ('Pump', 'Fan', 'Valve'))
+
+    def test_prefetch_queries_only_points_not_resident(self):
+        io = PointIO({self.pump.id: self.pump})
+        with self.assertNumQueries(1):
+            io.prefetch({self.pump.id, self.fan.id, self.valve.id})
+        self.assertIs(io.points[self.pump.id], self.pump)
+        self.assertEqual(set(io.points), {self.pump.id, self.fan.id, self.valve.id})
+        with self.assertNumQueries(0):
+            self.assertEqual(io.read(str(self.fan.id)), 1.0)
+
+    def test_writes_are_flushed_in_one_update(self):
+        io = PointIO()
+        io.prefetch({self.pump.id, self.fan.id, self.valve.id})
+        # Bindings may hold ids as strings; unknown points are ignored
+        io.write(str(self.pump.id), 5)
+        io.write(self.fan.id, 6)
+        io.write(self.valve.id, 1)
+        io.write(9999, 7)
+        with self.assertNumQueries(1):
+            self.assertEqual(io.flush(), 2)
+        self.assertEqual(Point.objects.get(pk=self.pump.pk).write_value, '5')
+        self.assertEqual(io.flush(), 0)
+
+
+class CalibrationTableTests(SimpleTestCase):
+    def _point(self, point_id, raw, **config):
+        register = Register(id=point_id, name=f'HR{point_id}', signal_type='Analogue', current_value=raw, error_status='OK')
+        return Point(id=point_id, name=f'AI{point_id}', point_type='REGISTER', data_type='Real',
+                     register=register, decimal_places=2, **config)
+
+    def test_retain_drops_rows_of_points_no_longer_polled(self):
+        points = [
+            self._point(1, '100', gain=0.1, offset=0.0),
+            self._point(2, '4000', gain=1.0, offset=-5.0),
+            self._point(3, '12', gain=1.0, offset=0.0, range_min=4.0, range_max=20.0, scale_min=0.0, scale_max=100.0),
+        ]
+        table = CalibrationTable()
+        table.calibrate(points)
+        table.retain({1, 3})
+        self.assertEqual(len(table), 2)
+        self.assertEqual(len(table._coeffs['gain']), 2)
+
+        # The remaining rows still carry their own coefficients
+        kept = [points[0], points[2]]
+        self.assertEqual(table.calibrate(kept), {p.id: PointProcessor(p)._resolve_register_value() for p in kept})
+        self.assertEqual(table.calibrate(kept), {1: 10.0, 3: 50.0})
+
+
+class PointSchedulerTests(SimpleTestCase):
+    def test_changed_slow_point_is_not_queued_behind_unchanged_ones(self):
+        # Point.frequency defaults to 1.0s, which is also the default slow_threshold
+        scheduler = PointScheduler(base_interval=0.1, slow_threshold=1.0, slow_batch=500)
+        points = [SimpleNamespace(id=i, frequency=1.0) for i in range(5000)]
+        now = 1000.05
+        for point in points:
+            scheduler.schedule(point, now)
+
+        # Start-up: every point is new and needs its first evaluation
+        due = scheduler.pop_due(now, needed={p.id for p in points})
+        self.assertEqual(len(due), 500)
+        while scheduler.backlog:
+            now += 0.1
+            scheduler.pop_due(now, needed={p.id for p in points})
+
+        # Steady state: only a few registers change, the rest is skipped at no cost
+        changed = {4321, 17}
+        for _ in range(10):
+            now += 0.1
+            due = scheduler.pop_due(now, needed=changed)
+            if due:
+                break
+        self.assertEqual(set(due), changed)
+        self.assertEqual(scheduler.backlog, 0)
+
+    def test_backlog_caps_points_that_need_evaluation(self):
+        scheduler = PointScheduler(slow_batch=500)
+        for i in range(1200):
+            scheduler.schedule(SimpleNamespace(id=i, frequency=1.0), 0.0)
+        self.assertEqual(len(scheduler.pop_due(0.0)), 500)
+        self.assertEqual(scheduler.backlog, 700)
+
+
+class RecordBufferTests(TestCase):
+    def setUp(self):
+        self.point = Point.objects.create(name='Pump', point_group=PointGroup.objects.create(name='Plant'))
+        self.addCleanup(set_record_buffer, None)
+
+    def test_records_are_written_in_bulk_on_flush(self):
+        buffer = RecordBuffer()
+        set_record_buffer(buffer)
+        for i in range(3):
+            create_event(self.point, 'STATE', f'Pump state {i}')
+        self.assertEqual(Event.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(Event.objects.count(), 3)
+        self.assertEqual(buffer.stats()['pending'], 0)
+
+    def test_full_queue_is_flushed_inline(self):
+        buffer = RecordBuffer(max_size=2)
+        set_record_buffer(buffer)
+        for i in range(5):
+            create_event(self.point, 'STATE', f'Pump state {i}')
+        self.assertEqual(Event.objects.count(), 4)
+        self.assertEqual(buffer.stats(), {'pending': 1, 'written': 4, 'failed': 0,
+                                          'forced_flushes': 2, 'high_water': 2})
+
+
+class ValuesNoticeTests(TestCase):
+    def test_notice_is_bumped_after_commit(self):
+        with mock.patch.object(live, '_bump_values_notice') as bump:
+            with self.captureOnCommitCallbacks(execute=True):
+                live.notify_values_changed()
+                # Still inside the transaction: readers must not wake up yet
+                bump.assert_not_called()
+            bump.assert_called_once()
+
+
+@override_settings(CACHES=LIVE_IN_MEMORY)
+class ActiveAlarmIndexTests(TestCase):
+    def setUp(self):
+        caches['live'].clear()
+        patcher = mock.patch.object(live, '_down_until', 0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.point = Point.objects.create(name='Tank level', point_group=PointGroup.objects.create(name='Tanks'))
+        # The engine process keeps an index of its own, apart from the API's
+        self.engine_alarms = ActiveAlarmIndex()
+
+    def _engine_cycle(self):
+        """What run_engine does at the start of a cycle, then a still-true alarm condition."""
+        with mock.patch.object(processors, 'active_alarms', self.engine_alarms):
+            self.engine_alarms.follow(live.alarms_notice())
+            return create_alarm(self.point, 'HIGH', 'Level above threshold')
+
+    def test_duplicate_alarm_is_suppressed(self):
+        self.assertIsNotNone(self._engine_cycle())
+        self.assertIsNone(self._engine_cycle())
+
+    def test_alarm_cleared_through_the_api_is_raised_again_on_next_cycle(self):
+        alarm = self._engine_cycle()
+
+        request = APIRequestFactory().post(f'/api/main/alarms/{alarm.id}/clear/')
+        force_authenticate(request, user=User.objects.create_user('operator'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = AlarmViewSet.as_view({'post': 'clear'})(request, pk=str(alarm.id))
+        self.assertEqual(response.status_code, 200)
+
+        raised = self._engine_cycle()
+        self.assertIsNotNone(raised)
+        self.assertNotEqual(raised.id, alarm.id)
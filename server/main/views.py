@@ -11,6 +11,8 @@ from .models import Alarm, Event, Log, Fault, LogWrite
 from .serializers import AlarmSerializer, EventSerializer, LogSerializer, FaultSerializer
 from devices.models import Device, Point, PointGroup, Register
 from modules.models import Module, Page
+from helper.processors import active_alarms
+from helper.live import notify_alarms_changed
 from django.db.models import Count, Q
 
 class AlarmViewSet(viewsets.ReadOnlyModelViewSet):
@@ -49,6 +51,8 @@ class AlarmViewSet(viewsets.ReadOnlyModelViewSet):
             alarm.acknowledged_by = request.user.username if request.user.is_authenticated else 'System'
             alarm.acknowledged_time = timezone.now()
             alarm.save()
+            active_alarms.sync(alarm)
+            notify_alarms_changed()
         return Response({'status': 'alarm acknowledged'})
 
     @action(detail=False, methods=['post'])
@@ -59,6 +63,8 @@ class AlarmViewSet(viewsets.ReadOnlyModelViewSet):
             acknowledged_by=request.user.username if request.user.is_authenticated else 'System',
             acknowledged_time=timezone.now()
         )
+        active_alarms.invalidate()
+        notify_alarms_changed()
         return Response({'status': 'all alarms acknowledged', 'count': count})
 
     @action(detail=True, methods=['post'])
@@ -68,17 +74,27 @@ class AlarmViewSet(viewsets.ReadOnlyModelViewSet):
             alarm.is_cleared = True
             alarm.cleared_by = request.user.username if request.user.is_authenticated else 'System'
             alarm.cleared_time = timezone.now()
+            # A cleared alarm is over: the engine raises it again if its condition persists
+            alarm.is_active = False
+            alarm.end_time = alarm.cleared_time
             alarm.save()
+            active_alarms.sync(alarm)
+            notify_alarms_changed()
         return Response({'status': 'alarm cleared'})
 
     @action(detail=False, methods=['post'])
     def clear_all(self, request):
         alarms = self.get_queryset().filter(is_cleared=False)
+        now = timezone.now()
         count = alarms.update(
             is_cleared=True,
             cleared_by=request.user.username if request.user.is_authenticated else 'System',
-            cleared_time=timezone.now()
+            cleared_time=now,
+            is_active=False,
+            end_time=now
         )
+        active_alarms.invalidate()
+        notify_alarms_changed()
         return Response({'status': 'all alarms cleared', 'count': count})
 
 class EventViewSet(viewsets.ReadOnlyModelViewSet):
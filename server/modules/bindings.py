@@ -0,0 +1,37 @@
+def _point_id(ref):
+    """A binding reference is a point id, a numeric string, or an object with id/value."""
+    if isinstance(ref, dict):
+        ref = ref.get('id') or ref.get('value')
+    if isinstance(ref, bool) or ref is None:
+        return None
+    if isinstance(ref, int):
+        return ref
+    if isinstance(ref, float):
+        return int(ref) if ref.is_integer() else None
+    if isinstance(ref, str) and ref.strip().isdigit():
+        return int(ref.strip())
+    return None
+
+
+def extract_point_ids(content):
+    """
+    Point ids referenced by a page's elements, resolved the way the HMI does:
+    `data_binding_source` (with `current_value` as the legacy fallback) and the
+    `current_value` of gauges.
+    """
+    ids = set()
+    elements = content.get('elements') if isinstance(content, dict) else None
+    for element in elements or []:
+        if not isinstance(element, dict):
+            continue
+        if element.get('data_binding_source'):
+            refs = (element.get('data_binding_source'), element.get('current_value'))
+        elif 'Gauge' in str(element.get('type') or ''):
+            refs = (element.get('current_value'),)
+        else:
+            continue
+        for ref in refs:
+            point_id = _point_id(ref)
+            if point_id is not None:
+                ids.add(point_id)
+    return sorted(ids)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:05
+
+from django.db import migrations, models
+from modules.bindings import extract_point_ids
+
+
+def index_existing_pages(apps, schema_editor):
+    Page = apps.get_model('modules', 'Page')
+    pages = list(Page.objects.only('id', 'content'))
+    for page in pages:
+        page.point_ids = extract_point_ids(page.content)
+    Page.objects.bulk_update(pages, ['point_ids'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modules', '0002_page_is_dashboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='point_ids',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(index_existing_pages, migrations.RunPython.noop),
+    ]
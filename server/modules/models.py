@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.text import slugify
+from .bindings import extract_point_ids
 
 class Module(models.Model):
     name = models.CharField(max_length=255)
@@ -36,6 +37,8 @@ class Page(models.Model):
     # Store the graphic elements as a JSON object
     # Structure: { "elements": [ ... ] } as defined in the prompt
     content = models.JSONField(default=dict, blank=True)
+    # Point ids bound by the elements in content; maintained by save()
+    point_ids = models.JSONField(default=list, blank=True, editable=False)
     
     is_dashboard = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
@@ -55,6 +58,13 @@ class Page(models.Model):
             # Set all other pages is_dashboard=False
             Page.objects.filter(is_dashboard=True).exclude(pk=self.pk).update(is_dashboard=False)
 
+        # Index the bound points so the page's values can be served without parsing content
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.point_ids = extract_point_ids(self.content)
+            if update_fields is not None:
+                kwargs['update_fields'] = list(update_fields) + ['point_ids']
+
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -5,7 +5,8 @@ class PageSerializer(serializers.ModelSerializer):
     slug = serializers.SlugField(read_only=True)
     class Meta:
         model = Page
-        fields = ['id', 'module', 'name', 'slug', 'page_type', 'description', 'content', 'is_dashboard', 'is_active', 'created_at', 'updated_at']
+        fields = ['id', 'module', 'name', 'slug', 'page_type', 'description', 'content', 'point_ids', 'is_dashboard', 'is_active', 'created_at', 'updated_at']
+        read_only_fields = ['point_ids']
 
 class ModuleSerializer(serializers.ModelSerializer):
     pages = PageSerializer(many=True, read_only=True)
@@ -1,3 +1,63 @@
-from django.test import TestCase
+from importlib import import_module
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+from devices.models import Point, PointGroup
+from .bindings import extract_point_ids
+from .models import Module, Page
+from .views import PageViewSet
 
-# Create your tests here.
+User = get_user_model()
+
+CONTENT = {'elements': [
+    {'type': 'Text', 'data_binding_source': '12', 'current_value': 3},
+    {'type': 'Lamp', 'data_binding_source': {'id': 7}},
+    {'type': 'RadialGauge', 'current_value': 5.0},
+    {'type': 'Button', 'data_binding_source': True},
+    # Not bound: a plain value is only a point for gauges
+    {'type': 'Text', 'current_value': 9},
+    {'type': 'Text', 'data_binding_source': 'tank level'},
+]}
+
+
+class ExtractPointIdsTests(SimpleTestCase):
+    def test_bindings_are_resolved_like_the_hmi(self):
+        self.assertEqual(extract_point_ids(CONTENT), [3, 5, 7, 12])
+
+    def test_malformed_content_has_no_points(self):
+        for content in (None, [], {'elements': None}, {'elements': ['text', 4]}):
+            self.assertEqual(extract_point_ids(content), [])
+
+
+class PagePointIdsTests(TestCase):
+    def setUp(self):
+        self.module = Module.objects.create(name='Plant')
+
+    def test_save_indexes_bound_points(self):
+        page = Page.objects.create(module=self.module, name='Overview', content=CONTENT)
+        self.assertEqual(page.point_ids, [3, 5, 7, 12])
+
+        page.content = {'elements': [{'type': 'Lamp', 'data_binding_source': 8}]}
+        page.save()
+        page.refresh_from_db()
+        self.assertEqual(page.point_ids, [8])
+
+    def test_migration_indexes_existing_pages(self):
+        page = Page.objects.create(module=self.module, name='Overview', content=CONTENT)
+        Page.objects.filter(pk=page.pk).update(point_ids=[])
+        migration = import_module('modules.migrations.0003_page_point_ids')
+        migration.index_existing_pages(apps, None)
+        page.refresh_from_db()
+        self.assertEqual(page.point_ids, [3, 5, 7, 12])
+
+    def test_page_values_serve_only_bound_points(self):
+        group = PointGroup.objects.create(name='Plant')
+        bound = Point.objects.create(name='Pump', point_group=group, read_value='1')
+        Point.objects.create(name='Fan', point_group=group, read_value='1')
+        page = Page.objects.create(module=self.module, name='Overview',
+                                   content={'elements': [{'type': 'Lamp', 'data_binding_source': bound.id}]})
+        request = APIRequestFactory().get(f'/api/pages/{page.id}/values/')
+        force_authenticate(request, user=User.objects.create_user('viewer'))
+        response = PageViewSet.as_view({'get': 'values'})(request, pk=str(page.id))
+        self.assertEqual(list(response.data['values']), [bound.id])
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from .models import Module, Page
 from .serializers import ModuleSerializer, PageSerializer
 from helper.viewsets import BaseDuplicateViewSet
+from devices.streams import point_values_response
 
 class ModuleViewSet(BaseDuplicateViewSet):
     queryset = Module.objects.all()
@@ -35,6 +36,19 @@ class PageViewSet(BaseDuplicateViewSet):
         except Page.DoesNotExist:
             return Response({"detail": "No dashboard page configured"}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=True, methods=['get'])
+    def values(self, request, pk=None):
+        """
+        Live values of the points bound on this page: GET pages/{id}/values/?since=<version>
+        Same format as points/values/; the bound ids are indexed when the page is saved.
+        """
+        page = self.get_object()
+        try:
+            since = int(request.query_params.get('since') or 0)
+        except ValueError:
+            return Response({'error': 'since must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        return point_values_response(request, page.point_ids, since)
+
     def get_queryset(self):
         queryset = Page.objects.all()
         module_id = self.request.query_params.get('module', None)
@@ -0,0 +1,203 @@
+import re
+import math
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Nothing in this module imports Django, so compiled scripts can run outside the engine too.
+
+# Allows optional semicolon and optional trailing comment
+DECL_PATTERN = re.compile(r'^\s*(digital_input|digital_output|analogue_input|analogue_output)\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*;?(\s*#.*)?$', re.IGNORECASE)
+
+# Security Hardening: potentially sensitive/leaky built-ins removed from the interpreter
+BLOCKED_SYMBOLS = ['print', 'pprint', 'eval', 'exec', 'getattr', 'setattr', 'hasattr', 'type', 'id']
+
+BASE_SYMBOLS = {
+    'math': math,
+    'min': min,
+    'max': max,
+    'round': round,
+    'abs': abs,
+}
+
+ASTEVAL_MISSING = "Execution failed: 'asteval' package is not installed on the server. Please run 'pip install asteval'."
+
+
+def parse_declarations(code):
+    """
+    Parses the custom DSL declarations at the top of the script.
+    Format: <type> <var_name>;
+    Types: digital_input, digital_output, analogue_input, analogue_output
+    Returns (declarations, python code with the declarations commented out).
+    """
+    declarations = []
+    process_decls = True
+    python_lines = []
+
+    for line in code.splitlines():
+        stripped = line.strip()
+
+        # Skip empty lines and comments but remain in declaration mode
+        if not stripped or stripped.startswith('#'):
+            python_lines.append(line)
+            continue
+
+        match = DECL_PATTERN.match(stripped)
+        if process_decls and match:
+            dtype, var_name, _ = match.groups()
+            declarations.append({
+                'type': dtype.lower(),
+                'name': var_name
+            })
+            # Comment out the line in the target python buffer
+            python_lines.append(f"# {line}")
+        else:
+            # Once we hit a non-declaration line (that isn't a comment/empty),
+            # we stop processing declarations.
+            process_decls = False
+            python_lines.append(line)
+
+    return declarations, "\n".join(python_lines)
+
+
+def code_digest(code):
+    return hashlib.sha1((code or "").encode()).hexdigest()
+
+
+class CompiledScript:
+    """
+    Everything about a script that only changes with its code: the parsed declarations,
+    the pre-parsed AST and a warm asteval interpreter.
+
+    `run()` puts the interpreter's symbol table back to its state right after setup
+    (variables and functions of the previous run are dropped, overwritten names are
+    restored), injects the input symbols and runs the cached AST. Syntax errors are
+    found once, here, and reported by every run.
+    """
+    def __init__(self, code):
+        self.digest = code_digest(code)
+        self.declarations, self.python_code = parse_declarations(code or "")
+        self.errors = []
+        self.available = True
+        self._lock = threading.Lock()
+        self._tree = None
+
+        try:
+            from asteval import Interpreter
+        except ImportError:
+            self.available = False
+            return
+
+        self._interpreter = Interpreter(
+            usersyms=dict(BASE_SYMBOLS),
+            no_if_expression=False,
+            no_assert=True,
+            no_delete=True,
+            no_print=True,
+            builtins_readonly=True
+        )
+        for name in BLOCKED_SYMBOLS:
+            if name in self._interpreter.symtable:
+                del self._interpreter.symtable[name]
+        self._baseline = dict(self._interpreter.symtable)
+
+        try:
+            self._tree = self._interpreter.parse(self.python_code)
+        except Exception as e:
+            self.errors = [f"Exec Error: {err.msg} at line {err.lineno}" for err in self._interpreter.error]
+            if not self.errors:
+                self.errors = [f"Runtime Crash: {str(e)}"]
+
+    def _reset(self):
+        aeval = self._interpreter
+        symtable = aeval.symtable
+        for name in [name for name in symtable if name not in self._baseline]:
+            del symtable[name]
+        for name, value in self._baseline.items():
+            if symtable.get(name) is not value:
+                symtable[name] = value
+        # What Interpreter.eval() resets before a run; code_text would grow forever
+        aeval.error = []
+        aeval.error_msg = None
+        aeval.retval = None
+        aeval._interrupt = None
+        aeval._calldepth = 0
+        aeval.code_text = []
+        aeval.lineno = 0
+        aeval.start_time = time.time()
+
+    def run(self, symbols, output_names):
+        """Runs the script with `symbols` defined. Returns (status, logs, {output name: value})."""
+        if not self.available:
+            return "error", [ASTEVAL_MISSING], {}
+        if self.errors:
+            return "error", list(self.errors), {}
+
+        logs = []
+        outputs = {}
+        with self._lock:
+            self._reset()
+            aeval = self._interpreter
+            aeval.symtable.update(symbols)
+            try:
+                aeval.run(self._tree, expr=self.python_code, lineno=0, with_raise=False)
+
+                if aeval.error:
+                    # Capture asteval specific errors
+                    for err in aeval.error:
+                        logs.append(f"Exec Error: {err.msg} at line {err.lineno}")
+                    status = "error"
+                else:
+                    # Outputs from the symbols
+                    for var_name in output_names:
+                        if var_name in aeval.symtable:
+                            outputs[var_name] = aeval.symtable[var_name]
+                    status = "success"
+                    logs.append("Execution completed successfully.")
+
+            except Exception as e:
+                status = "error"
+                logs.append(f"Runtime Crash: {str(e)}")
+        return status, logs, outputs
+
+
+class ScriptCache:
+    """
+    CompiledScripts keyed by script id. An entry is reused while the script's
+    `updated_at` is unchanged; when it moves, the code is hashed and the entry is kept
+    if the code itself did not change (e.g. only the status or the name was saved).
+    """
+    def __init__(self):
+        self._scripts = {}   # script_id: (updated_at, CompiledScript)
+        self._lock = threading.Lock()
+        self.compiled = 0
+
+    def __len__(self):
+        return len(self._scripts)
+
+    def get(self, script_id, updated_at, code):
+        if script_id is None:
+            return CompiledScript(code)
+        with self._lock:
+            entry = self._scripts.get(script_id)
+            if entry is not None and entry[0] == updated_at:
+                return entry[1]
+            compiled = entry[1] if entry is not None else None
+            if compiled is None or compiled.digest != code_digest(code):
+                compiled = CompiledScript(code)
+                self.compiled += 1
+            self._scripts[script_id] = (updated_at, compiled)
+            return compiled
+
+    def retain(self, script_ids):
+        """Drops the scripts that are no longer running."""
+        with self._lock:
+            for script_id in set(self._scripts) - set(script_ids):
+                del self._scripts[script_id]
+
+
+# Shared by every ScriptExecutor of the process
+script_cache = ScriptCache()
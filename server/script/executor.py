@@ -1,59 +1,48 @@
-import re
-import math
 import logging
-# from asteval import Interpreter (Moved to local import in execute)
 from django.utils import timezone
-from devices.models import Point
+from helper.point_io import PointIO
+from .compiled import script_cache
+from .status import STATUS_FIELDS
 
 logger = logging.getLogger(__name__)
 
 class ScriptExecutor:
-    def __init__(self, script_program):
+    """
+    Runs one script. The engine passes the script's `bindings` and the cycle's shared
+    PointIO (prefetched, flushed once after all scripts) and its StatusStore
+    (script.status); on its own the executor loads both itself, writes its outputs when
+    the run succeeds and saves the execution status.
+    """
+    def __init__(self, script_program, bindings=None, io=None, status_store=None):
         self.script_program = script_program
+        self.status_store = status_store
         self.code = script_program.code_text or ""
         self.declarations = []
         self.python_code = ""
         self.inputs = {}  # var_name: value
         self.outputs = {} # var_name: value
-        self.bindings = script_program.bindings.all()
+        if bindings is None:
+            bindings = list(script_program.bindings.select_related('point'))
+        self.bindings = bindings
+        self.io = io
+        self.owns_io = io is None
+        if self.owns_io:
+            self.io = PointIO({b.point_id: b.point for b in bindings})
+            self.io.prefetch([b.point_id for b in bindings])
+        self.compiled = None  # CompiledScript, see parse()
 
     def parse(self):
         """
         Parses the custom DSL declarations at the top of the script.
         Format: <type> <var_name>;
         Types: digital_input, digital_output, analogue_input, analogue_output
+        The result is cached per script with the pre-parsed code (script.compiled).
         """
-        lines = self.code.splitlines()
-        # Allows optional semicolon and optional trailing comment
-        decl_pattern = re.compile(r'^\s*(digital_input|digital_output|analogue_input|analogue_output)\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*;?(\s*#.*)?$', re.IGNORECASE)
-        
-        process_decls = True
-        python_lines = []
-        
-        for line in lines:
-            stripped = line.strip()
-            
-            # Skip empty lines and comments but remain in declaration mode
-            if not stripped or stripped.startswith('#'):
-                python_lines.append(line)
-                continue
-                
-            match = decl_pattern.match(stripped)
-            if process_decls and match:
-                dtype, var_name, _ = match.groups()
-                self.declarations.append({
-                    'type': dtype.lower(),
-                    'name': var_name
-                })
-                # Comment out the line in the target python buffer
-                python_lines.append(f"# {line}")
-            else:
-                # Once we hit a non-declaration line (that isn't a comment/empty),
-                # we stop processing declarations.
-                process_decls = False
-                python_lines.append(line)
-        
-        self.python_code = "\n".join(python_lines)
+        if self.compiled is None:
+            program = self.script_program
+            self.compiled = script_cache.get(program.id, program.updated_at, self.code)
+        self.declarations = list(self.compiled.declarations)
+        self.python_code = self.compiled.python_code
         return self.declarations
 
     def gather_inputs(self):
@@ -68,7 +57,7 @@ class ScriptExecutor:
             if 'input' in dtype:
                 binding = binding_map.get(var_name)
                 if binding:
-                    val = binding.point.current_value
+                    val = self.io.read(binding.point_id)
                     # Cast based on declaration type
                     if 'digital' in dtype:
                         self.inputs[var_name] = self._to_bool(val)
@@ -81,7 +70,7 @@ class ScriptExecutor:
                 # Outputs are initialized with current values if available, or defaults
                 binding = binding_map.get(var_name)
                 if binding:
-                    val = binding.point.current_value
+                    val = self.io.read(binding.point_id)
                     if 'digital' in dtype:
                         self.outputs[var_name] = self._to_bool(val)
                     else:
@@ -89,73 +78,36 @@ class ScriptExecutor:
                 else:
                     self.outputs[var_name] = False if 'digital' in dtype else 0.0
 
-    def execute(self):
-        """Executes the Python code in a restricted sandbox."""
+    def prepare(self):
+        """Parses the script and reads its inputs; returns the symbols to run it with."""
         self.parse()
         self.gather_inputs()
-        
-        # Build symbols for the interpreter
-        symbols = {
-            **self.inputs,
-            **self.outputs,
-            'math': math,
-            'min': min,
-            'max': max,
-            'round': round,
-            'abs': abs,
-        }
-        
-        try:
-            from asteval import Interpreter
-        except ImportError:
-            status = "error"
-            logs = ["Execution failed: 'asteval' package is not installed on the server. Please run 'pip install asteval'."]
-            self.script_program.last_execution_status = status
-            self.script_program.last_execution_time = timezone.now()
-            self.script_program.last_execution_log = "\n".join(logs)
-            self.script_program.save()
-            return status
+        # Only the declared variables are injected; the rest of the symbol table
+        # (math, min, max, round, abs, builtins) is set up once per compiled script
+        return {**self.inputs, **self.outputs}
 
-        aeval = Interpreter(
-            usersyms=symbols, 
-            no_if_expression=False, 
-            no_assert=True, 
-            no_delete=True,
-            no_print=True,
-            builtins_readonly=True
-        )
-        
-        # Security Hardening: Remove potentially sensitive/leaky built-ins
-        for name in ['print', 'pprint', 'eval', 'exec', 'getattr', 'setattr', 'hasattr', 'type', 'id']:
-            if name in aeval.symtable:
-                del aeval.symtable[name]
-        
-        logs = []
-        try:
-            aeval(self.python_code)
-            
-            if aeval.error:
-                # Capture asteval specific errors
-                for err in aeval.error:
-                    logs.append(f"Exec Error: {err.msg} at line {err.lineno}")
-                status = "error"
-            else:
-                # Update outputs from the symbols
-                for var_name in self.outputs:
-                    if var_name in aeval.symtable:
-                        self.outputs[var_name] = aeval.symtable[var_name]
-                status = "success"
-                logs.append("Execution completed successfully.")
-                
-        except Exception as e:
-            status = "error"
-            logs.append(f"Runtime Crash: {str(e)}")
+    def execute(self):
+        """Executes the Python code in a restricted sandbox."""
+        symbols = self.prepare()
+        status, logs, outputs = self.compiled.run(symbols, self.outputs)
+        return self.finish(status, logs, outputs)
+
+    def finish(self, status, logs, outputs):
+        """Records the result of a run (here or in a script worker) and writes the outputs on success."""
+        self.outputs.update(outputs)
             
         # Update script metadata
         self.script_program.last_execution_status = status
         self.script_program.last_execution_time = timezone.now()
         self.script_program.last_execution_log = "\n".join(logs)
-        self.script_program.save()
+        if self.status_store is not None:
+            # The engine persists it when it changes (see StatusStore.persist)
+            self.status_store.update(self.script_program.id, status,
+                                     self.script_program.last_execution_time,
+                                     self.script_program.last_execution_log)
+        else:
+            # Only the status columns: a save() would bump updated_at (the compiled-code key)
+            self.script_program.save(update_fields=STATUS_FIELDS)
         
         if status == "success":
             self.write_outputs()
@@ -163,14 +115,14 @@ class ScriptExecutor:
         return status
 
     def write_outputs(self):
-        """Persists modified output variables back to bound Points."""
+        """Hands the output variables to the PointIO; only changed values are stored, in one bulk_update."""
         binding_map = {b.variable_name: b for b in self.bindings}
         for var_name, value in self.outputs.items():
             binding = binding_map.get(var_name)
             if binding:
-                point = binding.point
-                point.write_value = str(value)
-                point.save()
+                self.io.write(binding.point_id, value)
+        if self.owns_io:
+            self.io.flush()
 
     def _to_bool(self, val):
         if isinstance(val, bool): return val
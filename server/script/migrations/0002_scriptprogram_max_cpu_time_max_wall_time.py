@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('script', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scriptprogram',
+            name='max_cpu_time',
+            field=models.FloatField(default=1.0),
+        ),
+        migrations.AddField(
+            model_name='scriptprogram',
+            name='max_wall_time',
+            field=models.FloatField(default=2.0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('script', '0002_scriptprogram_max_cpu_time_max_wall_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scriptprogram',
+            name='trigger_type',
+            field=models.CharField(choices=[('CYCLE', 'Every Cycle'), ('PERIODIC', 'Periodic'), ('ON_CHANGE', 'On Input Change'), ('CRON', 'Cron')], default='CYCLE', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='scriptprogram',
+            name='trigger_interval',
+            field=models.FloatField(default=1.0),
+        ),
+        migrations.AddField(
+            model_name='scriptprogram',
+            name='trigger_cron',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
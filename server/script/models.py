@@ -2,10 +2,23 @@ from django.db import models
 from django.conf import settings
 
 class ScriptProgram(models.Model):
+    TRIGGER_CHOICES = [
+        ('CYCLE', 'Every Cycle'),
+        ('PERIODIC', 'Periodic'),    # Every trigger_interval seconds, see script/triggers.py
+        ('ON_CHANGE', 'On Input Change'),  # When a point bound as an input changes
+        ('CRON', 'Cron'),            # trigger_cron, e.g. "*/15 * * * *"
+    ]
+
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     code_text = models.TextField(blank=True, default="# Start writing your script here\n")
     is_active = models.BooleanField(default=True)
+    # Per-run budgets (seconds) enforced when the engine runs scripts in worker processes
+    max_cpu_time = models.FloatField(default=1.0)
+    max_wall_time = models.FloatField(default=2.0)
+    trigger_type = models.CharField(max_length=10, choices=TRIGGER_CHOICES, default='CYCLE')
+    trigger_interval = models.FloatField(default=1.0)  # Seconds (PERIODIC)
+    trigger_cron = models.CharField(max_length=100, blank=True, default='')
     
     last_execution_status = models.CharField(max_length=50, blank=True, null=True)
     last_execution_time = models.DateTimeField(blank=True, null=True)
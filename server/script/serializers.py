@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from .models import ScriptProgram, ScriptBinding
+from .status import live_script_status
+from .triggers import CronSchedule
 
 class ScriptBindingSerializer(serializers.ModelSerializer):
     point_name = serializers.ReadOnlyField(source='point.name')
@@ -14,8 +16,35 @@ class ScriptProgramSerializer(serializers.ModelSerializer):
     class Meta:
         model = ScriptProgram
         fields = [
-            'id', 'name', 'description', 'code_text', 'is_active',
+            'id', 'name', 'description', 'code_text', 'is_active', 'max_cpu_time', 'max_wall_time',
+            'trigger_type', 'trigger_interval', 'trigger_cron',
             'last_execution_status', 'last_execution_time', 'last_execution_log',
             'created_at', 'updated_at', 'owner', 'bindings'
         ]
         read_only_fields = ['last_execution_status', 'last_execution_time', 'last_execution_log', 'created_at', 'updated_at', 'owner']
+
+    def validate(self, attrs):
+        trigger_type = attrs.get('trigger_type', getattr(self.instance, 'trigger_type', 'CYCLE'))
+        if trigger_type == 'CRON':
+            try:
+                CronSchedule(attrs.get('trigger_cron', getattr(self.instance, 'trigger_cron', '')))
+            except ValueError as e:
+                raise serializers.ValidationError({'trigger_cron': str(e)})
+        if attrs.get('trigger_interval', 1.0) < 0:
+            raise serializers.ValidationError({'trigger_interval': "Must not be negative."})
+        # A budget of 0 would have the engine kill the script's worker on every run
+        for field in ('max_cpu_time', 'max_wall_time'):
+            if field in attrs and attrs[field] <= 0:
+                raise serializers.ValidationError({field: "Must be greater than 0 seconds."})
+        return attrs
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # The engine's last run; the DB columns are only written when the status changes
+        # (a run from the API execute action is saved right away and may be newer)
+        live = live_script_status(instance.id)
+        if live is not None and (instance.last_execution_time is None or live['time'] >= instance.last_execution_time):
+            data['last_execution_status'] = live['status']
+            data['last_execution_time'] = self.fields['last_execution_time'].to_representation(live['time'])
+            data['last_execution_log'] = live['log']
+        return data
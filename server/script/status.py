@@ -0,0 +1,89 @@
+import time
+import logging
+from helper.live import live_get, live_set_many
+from .models import ScriptProgram
+
+logger = logging.getLogger(__name__)
+
+# Last execution of a script in the shared cache (see ScriptProgramSerializer)
+STATUS_KEY = 'script:status:{}'
+
+STATUS_FIELDS = ['last_execution_status', 'last_execution_time', 'last_execution_log']
+
+
+def live_script_status(script_id):
+    """The engine's last execution of a script as {'status', 'time', 'log'}, or None if not published."""
+    return live_get(STATUS_KEY.format(script_id))
+
+
+class StatusStore:
+    """
+    Last execution status / time / log of the running scripts, held in engine memory.
+
+    The engine runs every script at 10 Hz; writing the three columns each run rewrote
+    the whole row. Now `persist()` writes a script only when its status or log changed
+    since the last write, or after `heartbeat` seconds so last_execution_time stays
+    roughly current. `publish()` keeps the live cache up to date for the API.
+    """
+    def __init__(self, heartbeat=60.0, publish_ttl=30.0):
+        self.heartbeat = heartbeat
+        self.publish_ttl = publish_ttl
+        self._status = {}      # script_id: (status, time, log) of the last run
+        self._saved = {}       # script_id: ((status, time, log), written at) of the last write
+        self._published = {}   # script_id: (status, time, log) last sent to the live cache
+        self.writes = 0
+
+    def load(self, scripts):
+        """Takes over the persisted status of scripts not yet held in memory."""
+        now = time.time()
+        for script in scripts:
+            if script.id not in self._saved:
+                entry = (script.last_execution_status, script.last_execution_time, script.last_execution_log)
+                self._saved[script.id] = (entry, now)
+
+    def update(self, script_id, status, when, log):
+        self._status[script_id] = (status, when, log)
+
+    def retain(self, script_ids):
+        """Persists and forgets scripts that stopped running."""
+        gone = set(self._saved) - set(script_ids)
+        if gone:
+            self._write(gone, force=True)
+            for script_id in gone:
+                for store in (self._status, self._saved, self._published):
+                    store.pop(script_id, None)
+
+    def publish(self):
+        """Sends the status of the scripts that ran since the last publish to the live cache."""
+        pending = {}
+        for script_id, entry in self._status.items():
+            if self._published.get(script_id) != entry:
+                pending[script_id] = entry
+        mapping = {STATUS_KEY.format(script_id): {'status': status, 'time': when, 'log': log}
+                   for script_id, (status, when, log) in pending.items()}
+        if pending and live_set_many(mapping, self.publish_ttl):
+            self._published.update(pending)
+
+    def persist(self, force=False):
+        """Writes changed (or heartbeat-due) statuses. Returns the number of scripts written."""
+        return self._write(list(self._status), force=force)
+
+    def _write(self, script_ids, force=False):
+        now = time.time()
+        changed = []
+        for script_id in script_ids:
+            entry = self._status.get(script_id)
+            saved = self._saved.get(script_id)
+            if entry is None or (saved is not None and saved[0] == entry):
+                continue
+            status, when, log = entry
+            # Forced (shutdown, script stopped): whatever was not written yet
+            if force or saved is None or saved[0][::2] != (status, log) or now - saved[1] >= self.heartbeat:
+                changed.append(ScriptProgram(id=script_id, last_execution_status=status,
+                                             last_execution_time=when, last_execution_log=log))
+                self._saved[script_id] = (entry, now)
+        if changed:
+            # Only the status columns: updated_at stays the code's edit time (see script.compiled)
+            ScriptProgram.objects.bulk_update(changed, STATUS_FIELDS)
+            self.writes += len(changed)
+        return len(changed)
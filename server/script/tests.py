@@ -1,3 +1,160 @@
-from django.test import TestCase
+import time
+from datetime import datetime, timezone
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from .compiled import CompiledScript, ScriptCache
+from .models import ScriptProgram
+from .serializers import ScriptProgramSerializer
+from .status import StatusStore
+from .triggers import CronSchedule
+from .workers import ScriptPool
 
-# Create your tests here.
+LOOP = "analogue_output y;\nt = 0\nfor i in range(50000000):\n    t = t + i\ny = t\n"
+QUICK = "analogue_input a;\nanalogue_output y;\ny = a * 2\n"
+
+# Only defines `leftover` when a > 0
+LEFTOVER = """analogue_input a;
+analogue_output y;
+if a > 0:
+    leftover = a
+y = leftover
+"""
+
+
+class CompiledScriptTests(SimpleTestCase):
+    def test_runs_do_not_see_each_other(self):
+        compiled = CompiledScript(LEFTOVER)
+        self.assertEqual(compiled.run({'a': 1.0, 'y': 0.0}, ['y']), ("success", ["Execution completed successfully."], {'y': 1.0}))
+        # The variable of the previous run is gone
+        status, logs, outputs = compiled.run({'a': 0.0, 'y': 0.0}, ['y'])
+        self.assertEqual((status, outputs), ("error", {}))
+        self.assertIn("leftover", logs[0])
+        # and so is the error
+        self.assertEqual(compiled.run({'a': 2.0, 'y': 0.0}, ['y'])[2], {'y': 2.0})
+
+    def test_syntax_error_is_reported_by_every_run(self):
+        compiled = CompiledScript("analogue_output y;\ny = (\n")
+        for _ in range(2):
+            status, logs, _outputs = compiled.run({'y': 0.0}, ['y'])
+            self.assertEqual(status, "error")
+            self.assertTrue(logs)
+
+    def test_cache_keeps_the_compiled_script_while_the_code_is_unchanged(self):
+        cache = ScriptCache()
+        compiled = cache.get(1, 'saved-1', QUICK)
+        self.assertIs(cache.get(1, 'saved-2', QUICK), compiled)
+        self.assertIsNot(cache.get(1, 'saved-3', LEFTOVER), compiled)
+        self.assertEqual(cache.compiled, 2)
+
+
+class StatusStoreTests(TestCase):
+    def setUp(self):
+        self.script = ScriptProgram.objects.create(name='pump', last_execution_status='success',
+                                                   last_execution_log='Execution completed successfully.')
+        self.store = StatusStore(heartbeat=60)
+        self.store.load([self.script])
+
+    def _run(self, second, status='success', log='Execution completed successfully.'):
+        self.store.update(self.script.id, status, datetime(2026, 1, 1, 0, 0, second, tzinfo=timezone.utc), log)
+
+    def test_only_changed_statuses_are_written(self):
+        updated_at = self.script.updated_at
+        self._run(1)
+        self.assertEqual(self.store.persist(), 0)
+        self._run(2, status='error', log='Exec Error: boom')
+        self.assertEqual(self.store.persist(), 1)
+        self.assertEqual(self.store.persist(), 0)
+
+        self.script.refresh_from_db()
+        self.assertEqual(self.script.last_execution_status, 'error')
+        # Status writes leave the edit time of the code alone
+        self.assertEqual(self.script.updated_at, updated_at)
+
+    def test_unchanged_status_is_written_after_the_heartbeat(self):
+        self._run(1)
+        self.assertEqual(self.store.persist(), 0)
+        with mock.patch('script.status.time.time', return_value=time.time() + 61):
+            self.assertEqual(self.store.persist(), 1)
+        self.script.refresh_from_db()
+        self.assertEqual(self.script.last_execution_time.second, 1)
+
+    def test_stopped_script_is_written_and_forgotten(self):
+        self._run(3)
+        self.store.retain([])
+        self.script.refresh_from_db()
+        self.assertEqual(self.script.last_execution_time.second, 3)
+        self.assertEqual(self.store.persist(), 0)
+
+
+class ScriptProgramSerializerTests(TestCase):
+    def test_run_budgets_must_be_positive(self):
+        for field in ('max_cpu_time', 'max_wall_time'):
+            for value in (0, -1.5):
+                with self.subTest(field=field, value=value):
+                    serializer = ScriptProgramSerializer(data={'name': 'pump', field: value})
+                    self.assertFalse(serializer.is_valid())
+                    self.assertIn(field, serializer.errors)
+        self.assertTrue(ScriptProgramSerializer(data={'name': 'pump', 'max_cpu_time': 0.5, 'max_wall_time': 1}).is_valid())
+
+
+class ScriptPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = ScriptPool(1)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def _collect_all(self, script_ids, timeout=30.0):
+        results = {}
+        end = time.monotonic() + timeout
+        while set(results) != set(script_ids) and time.monotonic() < end:
+            results.update(self.pool.collect(wait_for=0.2))
+        return results
+
+    def test_scripts_queued_behind_a_timeout_are_reported(self):
+        # All three land on the single worker; the first one runs past its wall-time limit
+        self.pool.submit([
+            (1, LOOP, {'y': 0.0}, ['y'], 0, 0.5),
+            (2, QUICK, {'a': 1.0, 'y': 0.0}, ['y'], 0, 5.0),
+            (3, QUICK, {'a': 2.0, 'y': 0.0}, ['y'], 0, 5.0),
+        ])
+        results = self._collect_all([1, 2, 3])
+
+        self.assertEqual(set(results), {1, 2, 3})
+        self.assertIn("wall-time limit", results[1][1][0])
+        for script_id in (2, 3):
+            status, logs, outputs = results[script_id]
+            self.assertEqual(status, "error")
+            self.assertTrue(logs[0].startswith("Aborted:"))
+            self.assertFalse(self.pool.busy(script_id))
+        self.assertEqual(self.pool.stats[0]['timeouts'], 1)
+
+        # The restarted worker runs them again
+        self.pool.submit([(2, QUICK, {'a': 1.0, 'y': 0.0}, ['y'], 0, 5.0)])
+        self.assertEqual(self._collect_all([2])[2], ("success", ["Execution completed successfully."], {'y': 2.0}))
+
+    def test_scripts_of_a_crashed_worker_are_reported(self):
+        self.pool.submit([
+            (1, LOOP, {'y': 0.0}, ['y'], 0, 30.0),
+            (2, QUICK, {'a': 1.0, 'y': 0.0}, ['y'], 0, 30.0),
+        ])
+        self.pool._workers[0][0].kill()
+        results = self._collect_all([1, 2])
+        self.assertEqual(set(results), {1, 2})
+        self.assertTrue(all(logs[0].startswith("Aborted:") for _status, logs, _outputs in results.values()))
+
+
+class CronScheduleTests(SimpleTestCase):
+    def test_restricted_day_and_weekday_match_either(self):
+        schedule = CronSchedule('0 0 1 * 1')
+        self.assertTrue(schedule.matches(datetime(2026, 10, 1)))     # the 1st, a Thursday
+        self.assertTrue(schedule.matches(datetime(2026, 10, 12)))    # a Monday
+        self.assertFalse(schedule.matches(datetime(2026, 10, 8)))
+
+    def test_stepped_star_day_matches_both(self):
+        # "*/2" starts with "*": cron then requires both the day and the weekday
+        schedule = CronSchedule('0 0 */2 * 1')
+        self.assertTrue(schedule.any_day)
+        self.assertTrue(schedule.matches(datetime(2026, 10, 5)))     # odd day, Monday
+        self.assertFalse(schedule.matches(datetime(2026, 10, 3)))    # odd day, Saturday
+        self.assertFalse(schedule.matches(datetime(2026, 10, 12)))   # Monday, even day
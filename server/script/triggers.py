@@ -0,0 +1,157 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# minute hour day-of-month month day-of-week (0 = Sunday, 7 is accepted too)
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _parse_field(text, low, high):
+    values = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"invalid step in {text!r}")
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(v) for v in part.split('-', 1))
+        else:
+            start = int(part)
+            # "5/15" means from 5 to the end of the range
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"{text!r} is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    Minimal cron expression: five fields (minute hour day month weekday) with `*`,
+    lists `a,b`, ranges `a-b` and steps `*/n` / `a-b/n`. As in cron, when both day of
+    month and weekday are restricted, either one matching is enough; a field starting
+    with `*` (`*/2` too) does not count as restricted.
+    Raises ValueError for an invalid expression.
+    """
+    def __init__(self, expression):
+        fields = (expression or '').split()
+        if len(fields) != 5:
+            raise ValueError("a cron expression has 5 fields: minute hour day month weekday")
+        try:
+            parsed = [_parse_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS)]
+        except ValueError as e:
+            raise ValueError(f"invalid cron expression {expression!r}: {e}")
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2].startswith('*')
+        self.any_weekday = fields[4].startswith('*')
+
+    def matches(self, when):
+        if when.minute not in self.minutes or when.hour not in self.hours or when.month not in self.months:
+            return False
+        day = when.day in self.days
+        # datetime: Monday is 0; cron: Sunday is 0
+        weekday = (when.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+
+class ScriptTriggers:
+    """
+    When each script runs (ScriptProgram.trigger_type):
+      CYCLE      every engine cycle
+      PERIODIC   every `trigger_interval` seconds
+      ON_CHANGE  when a point bound as one of its inputs changed (see `changed()`), and once at start
+      CRON       once in every minute that matches `trigger_cron` (local time)
+    `due()` lists the scripts to run now; `ran()` moves a script to its next period.
+    A periodic script that starts a full interval late drops the missed runs.
+    """
+    def __init__(self):
+        self._trigger = {}    # script_id: (trigger_type, interval, cron expression)
+        self._next = {}       # script_id: next start time (PERIODIC)
+        self._cron = {}       # script_id: CronSchedule
+        self._last_minute = {}   # script_id: minute of the last CRON run
+        self._inputs = {}     # script_id: input point ids (ON_CHANGE)
+        self._changed = set() # ON_CHANGE scripts waiting to run
+
+    def sync(self, scripts, input_point_ids, now):
+        """Follows the active scripts; `input_point_ids` maps script id to the points it reads."""
+        seen = set()
+        for script in scripts:
+            sid = script.id
+            seen.add(sid)
+            trigger = (script.trigger_type, script.trigger_interval, script.trigger_cron)
+            self._inputs[sid] = input_point_ids.get(sid, set())
+            if self._trigger.get(sid) == trigger:
+                continue
+            self._trigger[sid] = trigger
+            self._forget(sid)
+            if script.trigger_type == 'PERIODIC':
+                self._next[sid] = now
+            elif script.trigger_type == 'ON_CHANGE':
+                self._changed.add(sid)
+            elif script.trigger_type == 'CRON':
+                try:
+                    self._cron[sid] = CronSchedule(script.trigger_cron)
+                except ValueError as e:
+                    logger.error(f"Script {script.name} does not run: {e}")
+        for sid in set(self._trigger) - seen:
+            del self._trigger[sid]
+            self._inputs.pop(sid, None)
+            self._forget(sid)
+
+    def _forget(self, sid):
+        self._next.pop(sid, None)
+        self._cron.pop(sid, None)
+        self._last_minute.pop(sid, None)
+        self._changed.discard(sid)
+
+    def changed(self, point_ids):
+        """Marks the ON_CHANGE scripts reading any of the changed points as due."""
+        if not point_ids:
+            return
+        for sid, points in self._inputs.items():
+            if sid not in self._changed and self._trigger[sid][0] == 'ON_CHANGE' and not points.isdisjoint(point_ids):
+                self._changed.add(sid)
+
+    def due(self, now, local_now):
+        """Ids of the scripts to run now; `local_now` is the local datetime for CRON schedules."""
+        minute = local_now.replace(second=0, microsecond=0)
+        due = set()
+        for sid, (trigger_type, _interval, _cron) in self._trigger.items():
+            if trigger_type == 'PERIODIC':
+                if self._next[sid] <= now:
+                    due.add(sid)
+            elif trigger_type == 'ON_CHANGE':
+                if sid in self._changed:
+                    due.add(sid)
+            elif trigger_type == 'CRON':
+                schedule = self._cron.get(sid)
+                if schedule is not None and self._last_minute.get(sid) != minute and schedule.matches(minute):
+                    due.add(sid)
+            else:
+                due.add(sid)
+        return due
+
+    def ran(self, sid, now, local_now):
+        """Advances a script that just ran to its next trigger."""
+        trigger = self._trigger.get(sid)
+        if trigger is None:
+            return
+        trigger_type, interval, _cron = trigger
+        if trigger_type == 'PERIODIC':
+            start = self._next[sid]
+            interval = max(interval or 0.0, 0.0)
+            if now - start >= interval:
+                self._next[sid] = now + interval
+            else:
+                self._next[sid] = start + interval
+        elif trigger_type == 'ON_CHANGE':
+            self._changed.discard(sid)
+        elif trigger_type == 'CRON':
+            self._last_minute[sid] = local_now.replace(second=0, microsecond=0)
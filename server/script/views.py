@@ -24,6 +24,11 @@ class ScriptProgramViewSet(BaseDuplicateViewSet):
                 description=instance.description,
                 code_text=instance.code_text,
                 is_active=instance.is_active,
+                max_cpu_time=instance.max_cpu_time,
+                max_wall_time=instance.max_wall_time,
+                trigger_type=instance.trigger_type,
+                trigger_interval=instance.trigger_interval,
+                trigger_cron=instance.trigger_cron,
                 owner=self.request.user
             )
             
@@ -0,0 +1,251 @@
+import time
+import signal
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+from .compiled import CompiledScript
+
+logger = logging.getLogger(__name__)
+
+# Nothing in this module may import Django: workers are plain Python processes.
+
+# CPU time is only limited where the platform has interval timers (not on Windows)
+CPU_LIMITS = hasattr(signal, 'setitimer')
+
+
+class CPUTimeExceeded(BaseException):
+    # BaseException so asteval does not catch it as an error of the script itself
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise CPUTimeExceeded()
+
+
+def _plain(value):
+    """Output values sent back to the engine; anything unusual goes as its text."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def worker_main(conn):
+    """
+    Worker loop. Messages from the engine:
+      ('code', script_id, code)                              compile / replace a script
+      ('drop', script_id)                                    forget a script
+      ('run', [(script_id, symbols, output_names, cpu_limit)]) run the scripts one after another,
+                                                             replying ('result', script_id, status, logs, outputs, seconds) for each
+      ('stop',)
+    """
+    scripts = {}
+    if CPU_LIMITS:
+        signal.signal(signal.SIGVTALRM, _on_cpu_limit)
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        kind = message[0]
+
+        if kind == 'code':
+            _kind, script_id, code = message
+            scripts[script_id] = CompiledScript(code)
+
+        elif kind == 'drop':
+            scripts.pop(message[1], None)
+
+        elif kind == 'run':
+            for script_id, symbols, output_names, cpu_limit in message[1]:
+                start = time.perf_counter()
+                compiled = scripts.get(script_id)
+                if compiled is None:
+                    status, logs, outputs = "error", ["Runtime Crash: script not loaded in worker"], {}
+                else:
+                    try:
+                        if CPU_LIMITS and cpu_limit:
+                            signal.setitimer(signal.ITIMER_VIRTUAL, cpu_limit)
+                        status, logs, outputs = compiled.run(symbols, output_names)
+                    except CPUTimeExceeded:
+                        status, logs, outputs = "error", [f"Timeout: CPU time limit of {cpu_limit}s exceeded"], {}
+                    finally:
+                        if CPU_LIMITS:
+                            signal.setitimer(signal.ITIMER_VIRTUAL, 0)
+                outputs = {name: _plain(value) for name, value in outputs.items()}
+                conn.send(('result', script_id, status, logs, outputs, time.perf_counter() - start))
+
+        elif kind == 'stop':
+            break
+
+
+class ScriptPool:
+    """
+    Scripts run in worker processes, away from the engine's point refresh and FBD phase.
+
+    A script always runs on the same worker (script id modulo the pool size), which
+    keeps its compiled code and warm interpreter; only the input symbols go out and the
+    status, log and output values come back. Workers run their scripts in parallel.
+
+    `submit()` hands scripts to their workers and `collect()` gathers what finished,
+    waiting at most `wait_for` seconds: a script still running stays in flight and is
+    collected on a later cycle (it is not submitted again meanwhile). A worker whose
+    script exceeds its wall-time limit is killed and restarted; that script fails
+    with a timeout and the scripts queued behind it are reported as aborted (as are
+    the scripts of a worker that crashes or cannot be reached), so every submitted
+    script gets a result. The CPU-time limit is enforced inside the worker (where
+    setitimer exists).
+    """
+    def __init__(self, size):
+        self.size = size
+        # Spawned, not forked: workers never share the engine's database connections
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = [None] * size    # (process, connection)
+        self._sent = [{} for _ in range(size)]   # per worker: script_id -> code sent
+        self._queues = [[] for _ in range(size)]   # per worker: [(script_id, wall_limit)] in flight
+        self._deadlines = [None] * size  # per worker: wall-time deadline of the running script
+        self._aborted = {}   # script_id: result of a script lost with its worker, returned by collect()
+        self.stats = [{'runs': 0, 'timeouts': 0, 'last_ms': 0.0, 'max_ms': 0.0, 'restarts': 0} for _ in range(size)]
+
+    def busy(self, script_id):
+        return any(queued == script_id for queue in self._queues for queued, _limit in queue)
+
+    def _connection(self, index):
+        worker = self._workers[index]
+        if worker is None or not worker[0].is_alive():
+            if worker is not None:
+                self.stats[index]['restarts'] += 1
+                logger.error(f"Script worker {index} died, restarting")
+                self._abort_queue(index, f"script worker {index} died")
+            parent_conn, child_conn = self._context.Pipe()
+            process = self._context.Process(target=worker_main, args=(child_conn,),
+                                            name=f"script-worker-{index}", daemon=True)
+            process.start()
+            child_conn.close()
+            self._workers[index] = (process, parent_conn)
+            self._sent[index] = {}
+            self._queues[index] = []
+        return self._workers[index][1]
+
+    def _abort_queue(self, index, reason):
+        """Reports the scripts queued on a lost worker as aborted (see collect())."""
+        for script_id, _limit in self._queues[index]:
+            self._aborted[script_id] = ("error", [f"Aborted: {reason}"], {})
+        self._queues[index] = []
+        self._deadlines[index] = None
+
+    def _kill(self, index, reason):
+        self._abort_queue(index, reason)
+        worker = self._workers[index]
+        if worker is not None:
+            worker[0].kill()
+            worker[0].join(1)
+            worker[1].close()
+        self._workers[index] = None
+        self._sent[index] = {}
+        self.stats[index]['restarts'] += 1
+
+    def submit(self, jobs):
+        """Queues [(script_id, code, symbols, output_names, cpu_limit, wall_limit)] on their workers."""
+        assigned = {}
+        for job in jobs:
+            assigned.setdefault(job[0] % self.size, []).append(job)
+
+        now = time.monotonic()
+        for index, items in assigned.items():
+            try:
+                conn = self._connection(index)
+                sent = self._sent[index]
+                queue = self._queues[index]
+                if not queue:
+                    self._deadlines[index] = now + items[0][5]
+                # Queued before sending, so a failed send reports them as aborted
+                queue.extend((job[0], job[5]) for job in items)
+                for job in items:
+                    # A new run replaces the report of one lost before it
+                    self._aborted.pop(job[0], None)
+                for script_id, code, _symbols, _outputs, _cpu, _wall in items:
+                    if sent.get(script_id) != code:
+                        conn.send(('code', script_id, code))
+                        sent[script_id] = code
+                conn.send(('run', [(script_id, symbols, outputs, cpu) for script_id, _code, symbols, outputs, cpu, _wall in items]))
+            except (OSError, EOFError) as e:
+                logger.error(f"Script worker {index} unreachable: {e}")
+                self._kill(index, f"script worker {index} unreachable")
+
+    def collect(self, wait_for=0.0):
+        """
+        Results that are ready, waiting at most `wait_for` seconds for the rest.
+        Returns {script_id: (status, logs, outputs)}.
+        """
+        results = {}
+        end = time.monotonic() + wait_for
+        while True:
+            active = {self._workers[index][1]: index for index, queue in enumerate(self._queues)
+                      if queue and self._workers[index] is not None}
+            if not active:
+                break
+            now = time.monotonic()
+            for conn, index in list(active.items()):
+                if self._deadlines[index] is not None and now >= self._deadlines[index] and not conn.poll():
+                    script_id, limit = self._queues[index][0]
+                    logger.error(f"Script {script_id} exceeded its wall-time limit ({limit}s), restarting worker {index}")
+                    results[script_id] = ("error", [f"Timeout: wall-time limit of {limit}s exceeded"], {})
+                    self.stats[index]['timeouts'] += 1
+                    self._queues[index].pop(0)
+                    self._kill(index, f"script worker restarted after script {script_id} timed out")
+                    del active[conn]
+            if not active:
+                continue
+            timeout = min([end] + [self._deadlines[index] for index in active.values()]) - now
+            ready = wait(list(active), max(0.0, timeout))
+            if not ready and time.monotonic() >= end:
+                break
+            for conn in ready:
+                index = active[conn]
+                try:
+                    _kind, script_id, status, logs, outputs, elapsed = conn.recv()
+                except (OSError, EOFError) as e:
+                    logger.error(f"Script worker {index} failed: {e}")
+                    self._kill(index, f"script worker {index} crashed")
+                    continue
+                results[script_id] = (status, logs, outputs)
+                queue = self._queues[index]
+                if queue and queue[0][0] == script_id:
+                    queue.pop(0)
+                self._deadlines[index] = time.monotonic() + queue[0][1] if queue else None
+                stats = self.stats[index]
+                stats['runs'] += 1
+                stats['last_ms'] = elapsed * 1000
+                stats['max_ms'] = max(stats['max_ms'], stats['last_ms'])
+
+        # Scripts lost with their worker (behind a timed-out script, crash, failed send)
+        results.update(self._aborted)
+        self._aborted = {}
+        return results
+
+    def retain(self, script_ids):
+        """Drops scripts that stopped running from their worker."""
+        script_ids = set(script_ids)
+        for index, sent in enumerate(self._sent):
+            gone = set(sent) - script_ids
+            if not gone or self._workers[index] is None:
+                continue
+            try:
+                for script_id in gone:
+                    self._workers[index][1].send(('drop', script_id))
+                    del sent[script_id]
+            except (OSError, EOFError):
+                self._kill(index, f"script worker {index} unreachable")
+
+    def close(self):
+        for index, worker in enumerate(self._workers):
+            if worker is None:
+                continue
+            try:
+                worker[1].send(('stop',))
+            except (OSError, EOFError):
+                pass
+            worker[0].join(1)
+            if worker[0].is_alive():
+                worker[0].kill()
+            self._workers[index] = None
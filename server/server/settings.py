@@ -181,6 +181,29 @@ DEFAULT_FROM_EMAIL = 'Rovid Smarty <rovidghana@gmail.com>'
 
 SMS_API_KEY='4d94779e03f1a55e06b849bb42710b568c2f3779781788425994bb8916b33f21'
 
+# ----------------------------------------------------------------------------------------------------------------------
+# Live Data (shared between the engine and the API processes)
+# ----------------------------------------------------------------------------------------------------------------------
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'live': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+        # Fail fast: every caller falls back to the database when Redis is down
+        'OPTIONS': {'socket_connect_timeout': 0.2, 'socket_timeout': 0.2},
+    },
+}
+
+# ----------------------------------------------------------------------------------------------------------------------
+# FBD Task Classes (see fbd/scheduling.py)
+# ----------------------------------------------------------------------------------------------------------------------
+
+# Cycle period in seconds of FBDProgram.task_class FAST / NORMAL / SLOW (EVENT runs on input changes)
+FBD_TASK_PERIODS = {'FAST': 0.02, 'NORMAL': 0.1, 'SLOW': 1.0}
+
 # ----------------------------------------------------------------------------------------------------------------------
 # AI & Celery Configuration
 # ----------------------------------------------------------------------------------------------------------------------